@@ -0,0 +1,178 @@
+import numpy as np
+
+
+class MomentAccumulator:
+    """
+        Running count, mean, sum of squared deviations, minimum and maximum for a numeric column.
+        Chunks are folded in with Welford/Chan updates, so two accumulators built over
+        different parts of the data can be merged without revisiting the rows.
+    """
+
+    def __init__(self, track_log=False):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.nan
+        self.max = np.nan
+        self.track_log = track_log
+        self.log_sum = 0.0
+
+    def update(self, values):
+        """
+            Fold a batch of values into the accumulator. Missing values are skipped.
+            Args:
+                values (array-like): The new values.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return self
+
+        batch = MomentAccumulator(self.track_log)
+        batch.count = values.size
+        batch.mean = float(values.mean())
+        batch.m2 = float(np.square(values - batch.mean).sum())
+        batch.min, batch.max = float(values.min()), float(values.max())
+        if self.track_log:
+            with np.errstate(invalid="ignore", divide="ignore"):
+                batch.log_sum = float(np.log(values).sum())
+        return self.merge(batch)
+
+    def merge(self, other):
+        """
+            Combine another accumulator into this one (Chan et al. parallel update).
+            Args:
+                other (MomentAccumulator): The accumulator to merge.
+        """
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            self.min, self.max = other.min, other.max
+            self.log_sum = other.log_sum
+            return self
+
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / total
+        self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.count = total
+        self.min, self.max = float(np.fmin(self.min, other.min)), float(np.fmax(self.max, other.max))
+        self.log_sum += other.log_sum
+        return self
+
+    @property
+    def variance(self):
+        # Population variance, matching np.var's default ddof=0
+        if self.count == 0:
+            return np.nan
+        return self.m2 / self.count
+
+    @property
+    def standard_deviation(self):
+        return np.sqrt(self.variance)
+
+
+def column_moments(values, track_log=False):
+    """
+        Build one MomentAccumulator per column of a 2D float array in a single vectorized pass.
+        Missing values are skipped column by column.
+        Args:
+            values (np.ndarray): A (rows, columns) float array.
+            track_log (bool): Also accumulate the sum of logarithms.
+    """
+    mask = ~np.isnan(values)
+    counts = mask.sum(axis=0)
+    filled = np.where(mask, values, 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = filled.sum(axis=0) / counts
+        m2 = np.square(np.where(mask, values - means, 0.0)).sum(axis=0)
+        log_sums = np.log(np.where(mask, values, 1.0)).sum(axis=0) if track_log else None
+    minimums = np.where(mask, values, np.inf).min(axis=0, initial=np.inf)
+    maximums = np.where(mask, values, -np.inf).max(axis=0, initial=-np.inf)
+
+    accumulators = []
+    for i in range(values.shape[1]):
+        accumulator = MomentAccumulator(track_log)
+        if counts[i]:
+            accumulator.count = int(counts[i])
+            accumulator.mean = float(means[i])
+            accumulator.m2 = float(m2[i])
+            accumulator.min, accumulator.max = float(minimums[i]), float(maximums[i])
+            if track_log:
+                accumulator.log_sum = float(log_sums[i])
+        accumulators.append(accumulator)
+    return accumulators
+
+
+class CoMomentAccumulator:
+    """
+        Running co-moment of two numeric columns, over the rows where both are present.
+        Mergeable like MomentAccumulator, so a correlation can be kept up to date as rows are appended.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean_x = 0.0
+        self.mean_y = 0.0
+        self.m2_x = 0.0
+        self.m2_y = 0.0
+        self.c_xy = 0.0
+
+    def update(self, x, y):
+        """
+            Fold a batch of value pairs into the accumulator. Pairs with a missing value are skipped.
+            Args:
+                x (array-like): The new values of the first column.
+                y (array-like): The new values of the second column.
+        """
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        keep = ~(np.isnan(x) | np.isnan(y))
+        x, y = x[keep], y[keep]
+        if x.size == 0:
+            return self
+
+        batch = CoMomentAccumulator()
+        batch.count = x.size
+        batch.mean_x, batch.mean_y = float(x.mean()), float(y.mean())
+        dx, dy = x - batch.mean_x, y - batch.mean_y
+        batch.m2_x, batch.m2_y, batch.c_xy = float(dx @ dx), float(dy @ dy), float(dx @ dy)
+        return self.merge(batch)
+
+    def merge(self, other):
+        """
+            Combine another accumulator into this one.
+            Args:
+                other (CoMomentAccumulator): The accumulator to merge.
+        """
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.__dict__.update(other.__dict__)
+            return self
+
+        total = self.count + other.count
+        delta_x = other.mean_x - self.mean_x
+        delta_y = other.mean_y - self.mean_y
+        weight = self.count * other.count / total
+        self.mean_x += delta_x * other.count / total
+        self.mean_y += delta_y * other.count / total
+        self.m2_x += other.m2_x + delta_x * delta_x * weight
+        self.m2_y += other.m2_y + delta_y * delta_y * weight
+        self.c_xy += other.c_xy + delta_x * delta_y * weight
+        self.count = total
+        return self
+
+    @property
+    def covariance(self):
+        # Population covariance, like MomentAccumulator.variance
+        if self.count == 0:
+            return np.nan
+        return self.c_xy / self.count
+
+    @property
+    def correlation(self):
+        if self.count < 2 or self.m2_x == 0 or self.m2_y == 0:
+            return np.nan
+        return self.c_xy / np.sqrt(self.m2_x * self.m2_y)
@@ -0,0 +1,426 @@
+import argparse
+import contextlib
+import inspect
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from DataSet import DataSet
+from DataAnalyzer import DataAnalyzer
+
+# Datasets above this many rows are only generated on disk and benchmarked through the streaming paths
+IN_MEMORY_LIMIT = 10 ** 7
+GENERATION_CHUNK = 10 ** 6
+
+# Arguments used for each statistic and plot on the synthetic frames (see make_frame)
+STATISTIC_ARGS = {
+    "calculate_correlation": ("x", "y"),
+    "calculate_correlation_matrix": (),
+    "top_correlations": (),
+    "summarize": (),
+    "group_stats": ("category", "x"),
+    "histogram": ("x",),
+    "detect_outliers": (["x", "y", "z"],),
+}
+# Statistics that work on a streaming dataset without materializing it
+STREAMING_STATISTICS = ("calculate_mean", "calculate_standard_deviation", "calculate_variance",
+                        "calculate_log_sum", "calculate_median", "calculate_quartiles", "calculate_mode",
+                        "histogram", "detect_outliers")
+PLOT_ARGS = {
+    "histogram": ("x",),
+    "scatter": ("x", "y"),
+    "line": ("time", "y"),
+    "bar_chart": ("category", "x"),
+    "pie": ("category",),
+    "heatmap": (),
+    "pair": (["x", "y", "z"],),
+    "violin": ("category", "x"),
+    "density": ("x",),
+    "bar": ("category", "x"),
+    "time_series": ("time", "y"),
+    "scatter_3d": ("x", "y", "z"),
+    "scatter_matrix": (["x", "y", "z"],),
+    "boxen": ("category", "x"),
+}
+# Plots that draw every row (seaborn pair plots, pie wedges) are skipped above these sizes
+PLOT_MAX_ROWS = {"pair": 10 ** 5, "scatter_matrix": 10 ** 6, "pie": 10 ** 6}
+
+
+def _best_of(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def _peak_memory(function):
+    # Peak Python and NumPy heap allocated during one run, as seen by tracemalloc
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def make_frame(rows, nan_density=0.0, cardinality=100, seed=0, offset=0):
+    """
+        Build a synthetic frame with mixed column types.
+        Args:
+            rows (int): Number of rows.
+            nan_density (float): Fraction of missing values in the float columns.
+            cardinality (int): Number of distinct values of the categorical column.
+            seed (int): Random seed.
+            offset (int): Index of the first row, so that frames generated in chunks continue the time column.
+        Returns:
+            pd.DataFrame: Float columns "x" (positive, lognormal), "y" and "z", integer "count",
+            boolean "flag", categorical "category" and datetime "time".
+    """
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({
+        "x": rng.lognormal(size=rows),
+        "y": rng.normal(size=rows),
+        "z": rng.random(rows),
+        "count": rng.integers(0, 1000, rows),
+        "flag": rng.random(rows) < 0.5,
+        "category": pd.Categorical.from_codes(rng.integers(0, cardinality, rows),
+                                              [f"k{i}" for i in range(cardinality)]),
+        "time": pd.date_range("2020-01-01", periods=rows, freq="s") + pd.Timedelta(seconds=offset),
+    })
+    if nan_density:
+        for name in ("x", "y", "z"):
+            frame.loc[rng.random(rows) < nan_density, name] = np.nan
+    return frame
+
+
+def write_csv(path, rows, nan_density=0.0, cardinality=100, seed=0):
+    """
+        Write a synthetic CSV file chunk by chunk, so that files larger than memory can be generated.
+    """
+    for index, start in enumerate(range(0, rows, GENERATION_CHUNK)):
+        frame = make_frame(min(GENERATION_CHUNK, rows - start), nan_density, cardinality, seed + index, start)
+        frame.to_csv(path, mode="w" if index == 0 else "a", header=index == 0, index=False)
+
+
+def _analyzer(dataset):
+    # Statistics are benchmarked uncached, otherwise every repetition after the first is a cache hit
+    analyzer = DataAnalyzer(dataset)
+    analyzer.cache = None
+    return analyzer
+
+
+def _statistic_names():
+    names = [name for name, _ in inspect.getmembers(DataAnalyzer, inspect.isfunction)
+             if name.startswith("calculate_")]
+    return names + [name for name in STATISTIC_ARGS if not name.startswith("calculate_")]
+
+
+def _load_cases(context):
+    directory, csv_path, rows = context["directory"], context["csv"], context["rows"]
+    cases = {}
+    if rows <= IN_MEMORY_LIMIT:
+        cases["load_data_from_csv"] = lambda: DataSet().load_data_from_csv(csv_path)
+        cases["load_data_from_csv(columns)"] = lambda: DataSet().load_data_from_csv(csv_path, columns=["x", "y"])
+        cases["load_data_from_csv(cache hit)"] = lambda: DataSet().load_data_from_csv(csv_path, use_cache=True)
+        cases["load_data_from_csv(optimize)"] = lambda: DataSet().load_data_from_csv(csv_path, optimize=True)
+        cases["load_directory"] = lambda: DataSet().load_directory(context["parts"], "*.csv")
+        # Readers whose optional dependencies are missing are reported as skipped, with the reason
+        cases["load_data_from_excel"] = ((lambda: DataSet().load_data_from_excel(context["excel"], 0))
+                                         if context["excel"] else "openpyxl is not installed")
+        cases["load_data_from_png"] = ((lambda: DataSet().load_data_from_png(context["png"]))
+                                       if context["png"] else "Tesseract is not installed")
+    cases["load_data_from_csv(stream)"] = lambda: sum(len(chunk) for chunk in context["stream"].iter_chunks(["x"]))
+    return cases
+
+
+def _statistic_cases(context):
+    streaming = context["rows"] > IN_MEMORY_LIMIT
+    dataset = context["stream"] if streaming else context["dataset"]
+    cases = {}
+    for name in _statistic_names():
+        if streaming and name not in STREAMING_STATISTICS:
+            continue
+        args = STATISTIC_ARGS.get(name, ("x",))
+        cases[name] = (lambda name=name, args=args: getattr(_analyzer(dataset), name)(*args))
+    if streaming:
+        moments = [stat for stat in DataAnalyzer.MOMENT_STATISTICS if stat != "geometric_mean"]
+        cases["summarize(moments)"] = lambda: _analyzer(dataset).summarize(["x", "y", "z"], moments)
+    return cases
+
+
+def _plot_cases(context):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from DataVisualization import Visualization
+    from ReportRenderer import PLOTS
+
+    rows = context["rows"]
+    output = os.path.join(context["directory"], "plot.png")
+    cases = {}
+    for plot, args in PLOT_ARGS.items():
+        if rows > min(PLOT_MAX_ROWS.get(plot, IN_MEMORY_LIMIT), IN_MEMORY_LIMIT):
+            continue
+
+        def draw(plot=plot, args=args):
+            plt.close("all")
+            visualizer = Visualization(context["dataset"], _analyzer(context["dataset"]))
+            visualizer.output_path = output
+            getattr(visualizer, PLOTS[plot])(*args)
+
+        cases[plot] = draw
+    return cases
+
+
+GROUPS = {"load": _load_cases, "stats": _statistic_cases, "plots": _plot_cases}
+
+
+def _prepare(directory, rows, nan_density, cardinality):
+    context = {"directory": directory, "rows": rows, "csv": os.path.join(directory, "data.csv")}
+    if rows <= IN_MEMORY_LIMIT:
+        frame = make_frame(rows, nan_density, cardinality)
+        frame.to_csv(context["csv"], index=False)
+    else:
+        write_csv(context["csv"], rows, nan_density, cardinality)
+    context["stream"] = DataSet()
+    context["stream"].load_data_from_csv(context["csv"], chunksize=GENERATION_CHUNK)
+    if rows <= IN_MEMORY_LIMIT:
+        context["dataset"] = DataSet()
+        context["dataset"].data = frame
+        DataSet().load_data_from_csv(context["csv"], use_cache=True)  # writes the columnar cache
+        context["parts"] = os.path.join(directory, "parts")
+        os.makedirs(context["parts"])
+        for index, part in enumerate(np.array_split(np.arange(rows), 8)):
+            frame.iloc[part].to_csv(os.path.join(context["parts"], f"part{index}.csv"), index=False)
+        try:
+            context["excel"] = os.path.join(directory, "data.xlsx")
+            frame.head(10 ** 6).to_excel(context["excel"], index=False)
+        except ImportError:
+            context["excel"] = None
+        context["png"] = None
+        if shutil.which("tesseract"):
+            context["png"] = _table_image(os.path.join(directory, "table.png"), frame.head(50))
+    return context
+
+
+def _table_image(path, frame):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    figure = plt.figure(figsize=(8, 0.25 * (len(frame) + 1)))
+    figure.text(0, 0, frame[["x", "y", "count"]].round(3).to_string(index=False), family="monospace")
+    figure.savefig(path, dpi=150, bbox_inches="tight")
+    plt.close(figure)
+    return path
+
+
+def run_benchmarks(rows=(10 ** 4, 10 ** 5), groups=("load", "stats", "plots"), nan_densities=(0.0,),
+                   cardinalities=(100,), repeat=3, memory=True):
+    """
+        Run the benchmark suite on synthetic data.
+        Args:
+            rows (list of int): Dataset sizes, e.g. 10**4 up to 10**8. Sizes above IN_MEMORY_LIMIT are
+                written to disk in chunks and only the streaming loaders and statistics are measured.
+            groups (list of str): Any of "load", "stats" and "plots".
+            nan_densities (list of float): Fractions of missing values to generate.
+            cardinalities (list of int): Numbers of distinct categories to generate.
+            repeat (int): Number of timed runs per case; the best time is reported.
+            memory (bool): Also measure peak memory, with one extra run per case under tracemalloc.
+        Returns:
+            dict: {case key: {"seconds": ..., "peak_memory": bytes or None, "skipped": reason or None,
+            "error": printed error or None}},
+            keyed by "group/case@rows/nan=...,card=...".
+    """
+    results = {}
+    for size in rows:
+        for nan_density in nan_densities:
+            for cardinality in cardinalities:
+                variant = f"{size}/nan={nan_density:g},card={cardinality}"
+                with tempfile.TemporaryDirectory() as directory:
+                    context = _prepare(directory, size, nan_density, cardinality)
+                    for group in groups:
+                        for name, case in GROUPS[group](context).items():
+                            key = f"{group}/{name}@{variant}"
+                            if isinstance(case, str):
+                                results[key] = {"seconds": None, "peak_memory": None, "skipped": case, "error": None}
+                                print(f"{key:70s} skipped ({results[key]['skipped']})", flush=True)
+                                continue
+                            # The methods report failures by printing, so keep that as the case error
+                            messages = io.StringIO()
+                            with contextlib.redirect_stdout(messages):
+                                seconds = _best_of(case, repeat)
+                                peak = _peak_memory(case) if memory else None
+                            error = next((line for line in messages.getvalue().splitlines()
+                                          if line.startswith("Error")), None)
+                            results[key] = {"seconds": seconds, "peak_memory": peak, "skipped": None, "error": error}
+                            print(_format(key, results[key]), flush=True)
+    return results
+
+
+def compare(results, baseline, tolerance=0.2, min_seconds=0.005):
+    """
+        Compare benchmark results with a stored baseline.
+        Args:
+            results (dict): Results from run_benchmarks.
+            baseline (dict): A baseline written by save_baseline.
+            tolerance (float): Relative slowdown (or memory growth) flagged as a regression, e.g. 0.2 for 20%.
+            min_seconds (float): Absolute slowdowns below this are treated as noise.
+        Returns:
+            list of dict: One entry per case present in both, with the time and memory ratios and a
+            status of "regression", "improvement" or "ok".
+    """
+    report = []
+    for key, result in results.items():
+        old = baseline.get("results", {}).get(key)
+        if result["seconds"] is None or not old or old.get("seconds") is None:
+            continue
+        time_ratio = result["seconds"] / old["seconds"]
+        memory_ratio = (result["peak_memory"] / old["peak_memory"]
+                        if result["peak_memory"] and old.get("peak_memory") else None)
+        slower = time_ratio > 1 + tolerance and result["seconds"] - old["seconds"] > min_seconds
+        larger = memory_ratio is not None and memory_ratio > 1 + tolerance
+        faster = time_ratio < 1 - tolerance and old["seconds"] - result["seconds"] > min_seconds
+        status = "regression" if slower or larger else "improvement" if faster else "ok"
+        report.append({"case": key, "time_ratio": time_ratio, "memory_ratio": memory_ratio, "status": status})
+    return report
+
+
+def save_baseline(results, path):
+    baseline = {"environment": _environment(), "results": results}
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(baseline, file, indent=2)
+
+
+def load_baseline(path):
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def _environment():
+    return {"python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__,
+            "machine": platform.machine(), "processor": platform.processor(), "cpus": os.cpu_count()}
+
+
+def _format(key, result):
+    memory = f"{result['peak_memory'] / 2 ** 20:9.1f} MiB" if result["peak_memory"] is not None else ""
+    error = f"  {result['error']}" if result["error"] else ""
+    return f"{key:70s} {result['seconds'] * 1000:10.2f} ms {memory}{error}"
+
+
+def benchmark_summarize(rows=1_000_000, columns=8, repeat=3):
+    """
+        Compare DataAnalyzer.summarize against calling the individual calculate_* methods in a loop.
+        Args:
+            rows (int): Number of rows in the synthetic dataset.
+            columns (int): Number of numeric columns.
+            repeat (int): Number of runs; the best time is reported.
+    """
+    rng = np.random.default_rng(0)
+    dataset = DataSet()
+    dataset.data = pd.DataFrame(rng.lognormal(size=(rows, columns)), columns=[f"c{i}" for i in range(columns)])
+    analyzer = _analyzer(dataset)
+    names = dataset.get_column_names()
+
+    def individual():
+        for name in names:
+            analyzer.calculate_mean(name)
+            analyzer.calculate_standard_deviation(name)
+            analyzer.calculate_variance(name)
+            analyzer.calculate_median(name)
+            analyzer.calculate_quartiles(name)
+            analyzer.calculate_mode(name)
+            analyzer.calculate_log_sum(name)
+            analyzer.calculate_geometric_mean(name)
+
+    stats = ["mean", "std_deviation", "variance", "median", "quartiles", "mode", "log_sum", "geometric_mean"]
+    loop_time = _best_of(individual, repeat)
+    summarize_time = _best_of(lambda: analyzer.summarize(names, stats), repeat)
+    print(f"{rows} rows x {columns} columns")
+    print(f"calculate_* loop: {loop_time:.3f}s")
+    print(f"summarize:        {summarize_time:.3f}s ({loop_time / summarize_time:.1f}x)")
+    return {"loop": loop_time, "summarize": summarize_time}
+
+
+def benchmark_parallel_summarize(rows=10_000, columns=3000, workers=None, repeat=3):
+    """
+        Compare summarizing a wide table serially with the thread and process pools of summarize.
+        Args:
+            rows (int): Number of rows in the synthetic dataset.
+            columns (int): Number of numeric columns.
+            workers (int, optional): Number of threads or processes. Defaults to the CPU count.
+            repeat (int): Number of runs; the best time is reported.
+    """
+    workers = workers or os.cpu_count()
+    rng = np.random.default_rng(0)
+    dataset = DataSet()
+    dataset.data = pd.DataFrame(rng.lognormal(size=(rows, columns)), columns=[f"c{i}" for i in range(columns)])
+    analyzer = _analyzer(dataset)
+    stats = ["mean", "std_deviation", "quartiles", "mode", "geometric_mean"]
+    serial_time = _best_of(lambda: analyzer.summarize(stats=stats, workers=1), repeat)
+    thread_time = _best_of(lambda: analyzer.summarize(stats=stats, workers=workers), repeat)
+    process_time = _best_of(lambda: analyzer.summarize(stats=stats, workers=workers, use_processes=True), repeat)
+    print(f"{rows} rows x {columns} columns, {workers} workers")
+    print(f"serial:    {serial_time:.3f}s")
+    print(f"threads:   {thread_time:.3f}s ({serial_time / thread_time:.1f}x)")
+    print(f"processes: {process_time:.3f}s ({serial_time / process_time:.1f}x)")
+    return {"serial": serial_time, "threads": thread_time, "processes": process_time}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark loaders, statistics and plots on synthetic data.")
+    parser.add_argument("--rows", nargs="+", type=lambda text: int(float(text)), default=[10 ** 4, 10 ** 5],
+                        help="Dataset sizes, e.g. 1e4 1e6 1e8.")
+    parser.add_argument("--groups", nargs="+", choices=sorted(GROUPS), default=["load", "stats", "plots"])
+    parser.add_argument("--nan-density", nargs="+", type=float, default=[0.0])
+    parser.add_argument("--cardinality", nargs="+", type=int, default=[100])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-memory", action="store_true", help="Skip the peak memory runs.")
+    parser.add_argument("--baseline", help="Compare against this baseline file.")
+    parser.add_argument("--save-baseline", help="Store the results as a baseline file.")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--output", help="Write the results (and comparison) to this JSON file.")
+    parser.add_argument("--summarize", action="store_true", help="Only run the summarize comparison.")
+    parser.add_argument("--parallel", action="store_true",
+                        help="Only compare serial and column-parallel summarize on a wide table.")
+    parser.add_argument("--workers", type=int, help="Workers for --parallel. Defaults to the CPU count.")
+    args = parser.parse_args(argv)
+
+    if args.summarize:
+        benchmark_summarize()
+        return 0
+    if args.parallel:
+        benchmark_parallel_summarize(workers=args.workers)
+        return 0
+
+    results = run_benchmarks(args.rows, args.groups, args.nan_density, args.cardinality, args.repeat,
+                             not args.no_memory)
+    comparison = []
+    if args.baseline:
+        comparison = compare(results, load_baseline(args.baseline), args.tolerance)
+        for entry in comparison:
+            if entry["status"] != "ok":
+                memory = f", memory x{entry['memory_ratio']:.2f}" if entry["memory_ratio"] else ""
+                print(f"{entry['status'].upper():12s} {entry['case']}: time x{entry['time_ratio']:.2f}{memory}")
+        print(f"{sum(entry['status'] == 'regression' for entry in comparison)} regressions "
+              f"in {len(comparison)} compared cases")
+    if args.save_baseline:
+        save_baseline(results, args.save_baseline)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump({"environment": _environment(), "results": results, "comparison": comparison}, file, indent=2)
+    return 1 if any(entry["status"] == "regression" for entry in comparison) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+import math
+
+import numpy as np
+
+
+class HistogramBins:
+    """
+        Histogram counts of a numeric column on a grid anchored at zero, with a power-of-two bin width.
+        Values outside the current bins extend the grid, and the bins are coarsened (pairs merged)
+        whenever there would be more than `max_bins`. Because every histogram uses the same kind of
+        grid, histograms built over different chunks or files can be merged exactly.
+    """
+
+    def __init__(self, max_bins=1024):
+        self.max_bins = max_bins
+        self.width = None
+        self.start = 0  # grid index of the first bin
+        self.counts = np.zeros(0)
+        self.count = 0
+
+    def update(self, values):
+        """
+            Add a batch of values. Missing and infinite values are skipped.
+            Args:
+                values (array-like): The new values.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values)]
+        if values.size == 0:
+            return self
+        if self.width is None:
+            span = values.max() - values.min()
+            self.width = 2.0 ** math.ceil(math.log2(span / self.max_bins)) if span > 0 else 1.0
+            self.start = int(np.floor(values.min() / self.width))
+
+        indices = np.floor(values / self.width).astype(np.int64)
+        low, high = min(self.start, int(indices.min())), max(self.stop, int(indices.max()) + 1)
+        while high - low > self.max_bins:
+            self._coarsen()
+            indices = np.floor_divide(indices, 2)
+            low, high = min(self.start, int(indices.min())), max(self.stop, int(indices.max()) + 1)
+        self._extend(low, high)
+        self.counts += np.bincount(indices - self.start, minlength=self.counts.size)
+        self.count += values.size
+        return self
+
+    def merge(self, other):
+        """
+            Add the counts of another histogram into this one.
+            Args:
+                other (HistogramBins): The histogram to merge.
+        """
+        if other.width is None:
+            return self
+        other = other.copy()
+        if self.width is None:
+            self.width, self.start, self.counts, self.count = other.width, other.start, other.counts, other.count
+            return self
+        while self.width < other.width:
+            self._coarsen()
+        while other.width < self.width:
+            other._coarsen()
+        self._extend(min(self.start, other.start), max(self.stop, other.stop))
+        while self.counts.size > self.max_bins:
+            self._coarsen()
+            other._coarsen()
+            self._extend(min(self.start, other.start), max(self.stop, other.stop))
+        offset = other.start - self.start
+        self.counts[offset:offset + other.counts.size] += other.counts
+        self.count += other.count
+        return self
+
+    def copy(self):
+        bins = HistogramBins(self.max_bins)
+        bins.width, bins.start, bins.counts, bins.count = self.width, self.start, self.counts.copy(), self.count
+        return bins
+
+    @property
+    def stop(self):
+        return self.start + self.counts.size
+
+    @property
+    def edges(self):
+        return (self.start + np.arange(self.counts.size + 1)) * (self.width or 1.0)
+
+    def _extend(self, low, high):
+        if low < self.start or high > self.stop:
+            counts = np.zeros(high - low)
+            counts[self.start - low:self.stop - low] = self.counts
+            self.start, self.counts = low, counts
+
+    def _coarsen(self):
+        # Merge pairs of bins; with the grid anchored at zero, bin i becomes bin i // 2
+        low = self.start - (self.start % 2)
+        counts = np.zeros(self.stop - low + ((self.stop - low) % 2))
+        counts[self.start - low:self.stop - low] = self.counts
+        self.counts = counts.reshape(-1, 2).sum(axis=1)
+        self.start = low // 2
+        self.width *= 2
+
+    def coarsened(self, bins=20):
+        """
+            Return (counts, edges) with about `bins` bins, for display.
+            Args:
+                bins (int): The wanted number of bins.
+        """
+        factor = max(1, math.ceil(self.counts.size / bins))
+        size = math.ceil(self.counts.size / factor) * factor
+        counts = np.zeros(size)
+        counts[:self.counts.size] = self.counts
+        edges = (self.start + np.arange(0, size + 1, factor)) * (self.width or 1.0)
+        return counts.reshape(-1, factor).sum(axis=1), edges
+
+    def mean(self):
+        centres = (self.edges[:-1] + self.edges[1:]) / 2
+        return float(np.average(centres, weights=self.counts)) if self.count else np.nan
+
+    def std(self):
+        if not self.count:
+            return np.nan
+        centres = (self.edges[:-1] + self.edges[1:]) / 2
+        return float(np.sqrt(np.average((centres - self.mean()) ** 2, weights=self.counts)))
+
+    def kde(self, bandwidth=None):
+        """
+            Gaussian kernel density estimate computed from the bins with an FFT convolution,
+            in O(bins log bins) instead of O(rows x grid).
+            Args:
+                bandwidth (float, optional): Kernel standard deviation. Defaults to Scott's rule.
+            Returns:
+                tuple: (grid points, density values).
+        """
+        if bandwidth is None:
+            bandwidth = 1.06 * self.std() * max(self.count, 1) ** -0.2
+        return binned_kde(self.counts, self.edges, bandwidth)
+
+    def to_dict(self):
+        return {"max_bins": self.max_bins, "width": self.width, "start": self.start,
+                "counts": self.counts.tolist(), "count": self.count}
+
+    @classmethod
+    def from_dict(cls, state):
+        bins = cls(state["max_bins"])
+        bins.width, bins.start, bins.count = state["width"], state["start"], state["count"]
+        bins.counts = np.asarray(state["counts"], dtype=np.float64)
+        return bins
+
+
+def binned_kde(counts, edges, bandwidth):
+    """
+        Smooth histogram counts with a Gaussian kernel using an FFT convolution, returning a
+        normalized density on the bin centres, padded by three bandwidths on each side.
+        Args:
+            counts (np.ndarray): The bin counts.
+            edges (np.ndarray): The evenly spaced bin edges.
+            bandwidth (float): Kernel standard deviation, in data units.
+    """
+    counts = np.asarray(counts, dtype=np.float64)
+    width = edges[1] - edges[0]
+    total = counts.sum()
+    sigma = bandwidth / width if bandwidth and bandwidth > 0 else 0.0
+    radius = int(math.ceil(3 * sigma))
+    padded = np.concatenate((np.zeros(radius), counts, np.zeros(radius)))
+    centres = edges[0] + width * (np.arange(padded.size) - radius + 0.5)
+    if sigma == 0 or total == 0:
+        return centres, padded / max(total * width, 1e-300)
+
+    offsets = np.arange(-radius, radius + 1)
+    kernel = np.exp(-0.5 * (offsets / sigma) ** 2)
+    kernel /= kernel.sum()
+    size = padded.size + kernel.size - 1
+    smoothed = np.fft.irfft(np.fft.rfft(padded, size) * np.fft.rfft(kernel, size), size)
+    smoothed = np.maximum(smoothed[radius:radius + padded.size], 0.0)
+    return centres, smoothed / (total * width)
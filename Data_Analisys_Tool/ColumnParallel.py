@@ -0,0 +1,78 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+def column_blocks(count, workers, blocks_per_worker=4):
+    """
+        Split `count` columns into contiguous (start, stop) blocks, a few per worker so that
+        workers finishing early pick up the remaining blocks.
+    """
+    if count == 0:
+        return []
+    size = max(1, math.ceil(count / (workers * blocks_per_worker)))
+    return [(start, min(start + size, count)) for start in range(0, count, size)]
+
+
+def map_column_blocks(values, kernel, workers=None, use_processes=False):
+    """
+        Apply a per-column kernel to blocks of columns of a 2-D array in parallel and join the results.
+        Threads suit kernels made of NumPy calls that release the GIL (sorting, partitioning, reductions);
+        with `use_processes` the array is copied once into shared memory and every worker process
+        reads its columns from there instead of receiving a pickled copy.
+        Args:
+            values (np.ndarray): Rows x columns array.
+            kernel (callable): Takes a rows x block array and returns {name: one value per column}.
+                It must be picklable (a module-level function or a functools.partial of one) for processes.
+            workers (int, optional): Number of threads or processes. Defaults to the CPU count.
+            use_processes (bool): Use a process pool with shared memory instead of a thread pool.
+        Returns:
+            dict: {name: list with one value per column of `values`}.
+    """
+    workers = workers or os.cpu_count()
+    blocks = column_blocks(values.shape[1], workers)
+    if workers == 1 or len(blocks) <= 1:
+        return {name: list(column) for name, column in kernel(values).items()}
+
+    # Column-major storage keeps every block contiguous
+    values = np.asfortranarray(values)
+    if use_processes:
+        memory = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+        try:
+            shared = np.ndarray(values.shape, dtype=values.dtype, buffer=memory.buf, order="F")
+            shared[:] = values
+            del shared
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                parts = list(executor.map(_run_shared, [memory.name] * len(blocks), [values.shape] * len(blocks),
+                                          [values.dtype.str] * len(blocks), blocks, [kernel] * len(blocks)))
+        finally:
+            memory.close()
+            memory.unlink()
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            parts = list(executor.map(lambda block: kernel(values[:, block[0]:block[1]]), blocks))
+
+    joined = {}
+    for part in parts:
+        for name, column in part.items():
+            joined.setdefault(name, []).extend(column)
+    return joined
+
+
+def _run_shared(name, shape, dtype, block, kernel):
+    memory = shared_memory.SharedMemory(name=name)
+    values = None
+    try:
+        values = np.ndarray(shape, dtype=np.dtype(dtype), buffer=memory.buf, order="F")[:, block[0]:block[1]]
+        return kernel(values)
+    finally:
+        # The view must be gone before the shared memory can be closed
+        del values
+        try:
+            memory.close()
+        except BufferError:
+            # Still referenced by the traceback of a failed kernel; the mapping goes with the process
+            pass
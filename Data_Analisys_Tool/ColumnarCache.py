@@ -0,0 +1,199 @@
+import hashlib
+import json
+import os
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.feather as feather
+except ImportError:
+    pa = None
+    pc = None
+    feather = None
+
+
+def is_available():
+    return pa is not None
+
+
+def cache_paths(source_path, key=""):
+    """
+        Return the (data, metadata) paths of the cache file kept next to a source file.
+        Args:
+            source_path (str): The path of the source file.
+            key (str): Distinguishes several caches of one file, e.g. one per Excel sheet.
+    """
+    directory, name = os.path.split(os.path.abspath(source_path))
+    suffix = f".{hashlib.sha1(key.encode()).hexdigest()[:8]}" if key else ""
+    base = os.path.join(directory, f".{name}{suffix}.cache")
+    return base + ".feather", base + ".json"
+
+
+def file_hash(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _signature(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+
+
+def is_fresh(source_path, key="", verify_hash=False):
+    """
+        Check whether the cache of a source file can be used.
+        The cache is stale when the source size changes, or when its modification time changes
+        and the content hash no longer matches.
+        Args:
+            source_path (str): The path of the source file.
+            key (str): The cache key used when writing.
+            verify_hash (bool): Always compare the content hash, even if size and mtime match.
+    """
+    data_path, meta_path = cache_paths(source_path, key)
+    if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+        return False
+    try:
+        with open(meta_path) as file:
+            meta = json.load(file)
+    except (OSError, ValueError):
+        return False
+
+    signature = _signature(source_path)
+    if signature["size"] != meta.get("size"):
+        return False
+    if signature["mtime"] == meta.get("mtime") and not verify_hash:
+        return True
+    if file_hash(source_path) != meta.get("hash"):
+        return False
+    # Touched but unchanged: remember the new mtime so the hash is not recomputed next time
+    meta.update(signature)
+    _write_meta(meta_path, meta)
+    return True
+
+
+def read(source_path, key="", columns=None, filters=None):
+    """
+        Read a cached frame back through a memory map, touching only the requested columns.
+        Args:
+            source_path (str): The path of the source file.
+            key (str): The cache key used when writing.
+            columns (list of str, optional): Only read these columns.
+            filters (list of tuple, optional): (column, operator, value) row predicates, applied to the
+                Arrow table before it is converted to pandas. The filter columns must be read.
+    """
+    data_path, _ = cache_paths(source_path, key)
+    table = feather.read_table(data_path, columns=columns, memory_map=True)
+    if filters:
+        table = table.filter(_expression(filters))
+    return table.to_pandas()
+
+
+def read_schema(source_path, key=""):
+    """
+        Return the column names of a cached frame without reading its rows.
+    """
+    data_path, _ = cache_paths(source_path, key)
+    return pa.ipc.open_file(pa.memory_map(data_path)).schema.names
+
+
+def _expression(filters):
+    # Keep pandas semantics: NaN is not equal to anything, so it passes "!=" and "not in"
+    expression = None
+    for column, operator, value in filters:
+        field = pc.field(column)
+        if operator == "==":
+            term = field == value
+        elif operator == "!=":
+            term = (field != value) | field.is_null()
+        elif operator == "<":
+            term = field < value
+        elif operator == "<=":
+            term = field <= value
+        elif operator == ">":
+            term = field > value
+        elif operator == ">=":
+            term = field >= value
+        elif operator == "in":
+            term = field.isin(list(value))
+        elif operator == "not in":
+            term = ~field.isin(list(value)) | field.is_null()
+        elif operator == "notnull":
+            term = field.is_valid()
+        elif operator == "isnull":
+            term = field.is_null()
+        else:
+            raise ValueError(f"Unknown operator '{operator}'")
+        expression = term if expression is None else expression & term
+    return expression
+
+
+def write(source_path, frame, key=""):
+    """
+        Write a frame to the cache of a source file, uncompressed so that it can be memory-mapped.
+        Args:
+            source_path (str): The path of the source file.
+            frame (pd.DataFrame): The parsed contents of the source file.
+            key (str): Distinguishes several caches of one file.
+    """
+    data_path, meta_path = cache_paths(source_path, key)
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    feather.write_feather(table, data_path, compression="uncompressed")
+    meta = _signature(source_path)
+    meta["hash"] = file_hash(source_path)
+    _write_meta(meta_path, meta)
+
+
+def write_frame(path, frame):
+    """
+        Write a frame, index included, to a standalone uncompressed file, e.g. to spill a dataset
+        out of memory. Unlike `write`, the file is not tied to a source file.
+    """
+    table = pa.Table.from_pandas(frame)
+    feather.write_feather(table, path, compression="uncompressed")
+
+
+def read_frame(path, columns=None):
+    """
+        Read a frame written by `write_frame` back, with its index and column types.
+    """
+    # Not memory-mapped: the file is overwritten when the dataset is spilled again after a change
+    return feather.read_table(path, columns=columns, memory_map=False).to_pandas()
+
+
+def read_num_rows(path):
+    """
+        Return the number of rows of a frame written by `write_frame` without reading them.
+    """
+    reader = pa.ipc.open_file(pa.memory_map(path))
+    return sum(reader.get_batch(index).num_rows for index in range(reader.num_record_batches))
+
+
+def cached_read(source_path, reader, key="", columns=None):
+    """
+        Return the contents of a source file from its columnar cache, parsing it with `reader`
+        and writing the cache first when it is missing or stale.
+        Args:
+            source_path (str): The path of the source file.
+            reader (callable): Parses the whole source file into a DataFrame.
+            key (str): Distinguishes several caches of one file.
+            columns (list of str, optional): Only return these columns.
+        Returns:
+            tuple: (DataFrame, whether the cache was used).
+    """
+    if is_fresh(source_path, key):
+        return read(source_path, key, columns), True
+
+    frame = reader()
+    try:
+        write(source_path, frame, key)
+    except (OSError, pa.ArrowException) as e:
+        print(f"Warning: Could not write columnar cache for '{source_path}': {str(e)}")
+    return (frame if columns is None else frame[columns]), False
+
+
+def _write_meta(meta_path, meta):
+    with open(meta_path, "w") as file:
+        json.dump(meta, file)
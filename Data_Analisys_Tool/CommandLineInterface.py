@@ -1,53 +1,142 @@
-from matplotlib import pyplot as plt
+import argparse
+import io
+import json
+import os
+import sys
 
+import Profiler
 from DataSet import DataSet
-from DataAnalyzer import DataAnalyzer
-from DataVisualization import Visualization
+from Jobs import JobManager
+from Pipeline import PipelineRunner, call, load_dataset, load_pipelines
+from Workspace import DEFAULT_MEMORY_BUDGET, Workspace
 
-dataset = DataSet()
-analyzer = DataAnalyzer(dataset)
-visualizer = Visualization(dataset)
+# Every loaded dataset is kept under its name, with its own analyzer and visualizer
+workspace = Workspace(memory_budget=DEFAULT_MEMORY_BUDGET)
+
+
+def report_job(job):
+    # Called from the worker thread as soon as a job finishes, so results show up while the user types
+    if job.status == "done" and job.then is not None:
+        message = "ready, press Enter to show it"
+    elif job.status == "done":
+        message = job.result
+    elif job.status == "failed":
+        message = f"Error: {job.error}"
+    else:
+        message = job.status
+    print(f"\n[Job #{job.id} {job.description}] {message}")
+
+
+jobs = JobManager(on_finished=report_job)
+
+
+def locked(entry, function):
+    # Jobs hold the dataset's lock while they run, so the budget never spills it from under them
+    def run(*args, **kwargs):
+        with entry.lock:
+            return function(*args, **kwargs)
+    return run
+
+
+def render_plot(entry, plot, *args):
+    # Runs in the worker: the figure is drawn off-screen into PNG bytes, so only showing it is left
+    image = io.BytesIO()
+    with entry.lock:
+        visualizer = entry.visualizer
+        visualizer.output_path = image
+        try:
+            _, error = call(getattr(visualizer, plot), *args)
+        finally:
+            visualizer.output_path = None
+    return error or image.getvalue() or "Error: No figure drawn"
+
+
+def show_plot(image):
+    # Runs on the main thread: opens the rendered figure in the image viewer without waiting for it
+    if isinstance(image, str):
+        print(image)
+        return
+    from PIL import Image
+    Image.open(io.BytesIO(image)).show()
 
 
 def load_data():
-    source = input("Enter data source (csv, excel, png): ")
+    source = input("Enter data source (csv, excel, png, directory): ")
     file_path = input("Enter data file path: ")
+    if source not in ("csv", "excel", "png", "directory"):
+        return "Invalid data source provided."
+    default_name = os.path.splitext(os.path.basename(os.path.normpath(file_path)))[0]
+    name = input(f"Enter a name for the dataset [{default_name}]: ") or default_name
+    # Only added to the workspace once loaded, so no other job sees the dataset half-loaded
+    dataset = DataSet()
     if source == "csv":
-        dataset.load_data_from_csv(file_path)
-        return "CSV data loaded successfully."
+        def load():
+            dataset.load_data_from_csv(file_path)
+            return "CSV data loaded successfully."
     elif source == "excel":
         sheet_name = input("Enter Excel sheet name: ")
-        dataset.load_data_from_excel(file_path, sheet_name)
-        return f"Excel data from sheet '{sheet_name}' loaded successfully."
+
+        def load():
+            dataset.load_data_from_excel(file_path, sheet_name)
+            return f"Excel data from sheet '{sheet_name}' loaded successfully."
     elif source == "png":
-        dataset.load_data_from_png(file_path)
-        return "PNG data loaded successfully."
-    else:
-        return "Invalid data source provided."
+        def load():
+            dataset.load_data_from_png(file_path)
+            return "PNG data loaded successfully."
+    elif source == "directory":
+        pattern = input("Enter file name pattern (e.g. *.csv): ") or "*"
+
+        def load():
+            dataset.load_directory(file_path, pattern)
+            report = dataset.metadata.get("load_report", [])
+            lines = [f"  {entry['file']}: {entry['error'] or str(entry['rows']) + ' rows'} ({entry['seconds']:.2f}s)"
+                     for entry in report]
+            loaded = sum(1 for entry in report if entry["error"] is None)
+            return "\n".join(lines + [f"Loaded {loaded} of {len(report)} files from '{file_path}'."])
+
+    def load_within_budget():
+        result = load()
+        if dataset.data is None and not dataset.is_streaming():
+            return f"Error: No data loaded from '{file_path}'"
+        # Adding it may push the workspace over its memory budget; older datasets are spilled
+        workspace.add(name, dataset)
+        return result
+
+    job = jobs.submit(f"load {source} '{file_path}' as '{name}'", load_within_budget)
+    return f"Started job #{job.id}."
 
 
 def analyze_data():
+    entry = workspace.get()
+    if entry is None:
+        return "No data available. Please load data first."
+    analyzer = entry.analyzer
     column_name = input("Enter the name of the column for analysis: ")
     action = input("Choose the analysis action (mean, std_deviation, median, correlation): ")
 
     if action == "mean":
-        result = analyzer.calculate_mean(column_name)
+        job = jobs.submit(f"mean of '{column_name}' in '{entry.name}'",
+                          locked(entry, analyzer.calculate_mean), column_name)
     elif action == "std_deviation":
-        result = analyzer.calculate_standard_deviation(column_name)
+        job = jobs.submit(f"std_deviation of '{column_name}' in '{entry.name}'",
+                          locked(entry, analyzer.calculate_standard_deviation), column_name)
     elif action == "median":
-        result = analyzer.calculate_median(column_name)
+        job = jobs.submit(f"median of '{column_name}' in '{entry.name}'",
+                          locked(entry, analyzer.calculate_median), column_name)
     elif action == "correlation":
         column1 = input("Enter the name of the first column: ")
         column2 = input("Enter the name of the second column: ")
-        result = analyzer.calculate_correlation(column1, column2)
+        job = jobs.submit(f"correlation of '{column1}' and '{column2}' in '{entry.name}'",
+                          locked(entry, analyzer.calculate_correlation), column1, column2)
     else:
-        result = "Invalid analysis action."
+        return "Invalid analysis action."
 
-    return result
+    return f"Started job #{job.id}."
 
 
 def visualize_data():
-    column_names = dataset.get_column_names()
+    entry = workspace.get()
+    column_names = entry.dataset.get_column_names() if entry is not None else []
     if not column_names:
         print("No data available. Please load data first.")
         return
@@ -69,23 +158,15 @@ def visualize_data():
             print("Error: One or both columns not found")
             return
 
-        plt.scatter(dataset.data[x_column], dataset.data[y_column])
-        plt.xlabel(x_column)
-        plt.ylabel(y_column)
-        plt.title(f"Scatter Plot: {x_column} vs {y_column}")
-
-        plt.show()
-        return "Data visualization completed successfully."
+        # Plots are rendered in the background; the main thread only shows the finished image
+        job = jobs.submit(f"scatter plot of '{y_column}' against '{x_column}' in '{entry.name}'",
+                          render_plot, entry, "scatter_plot", x_column, y_column, then=show_plot)
+        return f"Started job #{job.id}."
 
     elif plot_type == "histogram":
-        data = dataset.data[column_name]
-        plt.hist(data, bins=20)
-        plt.xlabel(column_name)
-        plt.ylabel("Frequency")
-        plt.title(f"Histogram of {column_name}")
-
-        plt.show()
-        return "Data visualization completed successfully."
+        job = jobs.submit(f"histogram of '{column_name}' in '{entry.name}'",
+                          render_plot, entry, "plot_histogram", column_name, then=show_plot)
+        return f"Started job #{job.id}."
 
     elif plot_type == "line":
         x_column = input("Enter the name of the x-axis column: ")
@@ -95,27 +176,52 @@ def visualize_data():
             print("Error: One or both columns not found")
             return
 
-        # Line plot
-        plt.plot(dataset.data[x_column], dataset.data[y_column])
-        plt.xlabel(x_column)
-        plt.ylabel(y_column)
-        plt.title(f"Line Plot of {x_column} vs. {y_column}")
-
-        # Show the line plot
-        plt.show()
-        return "Data visualization completed successfully."
+        job = jobs.submit(f"line plot of '{y_column}' against '{x_column}' in '{entry.name}'",
+                          render_plot, entry, "line_plot", x_column, y_column, then=show_plot)
+        return f"Started job #{job.id}."
 
     else:
         return "Invalid plot type."
 
 
+def switch_dataset():
+    if not workspace.names():
+        return "No datasets loaded."
+    print(workspace.describe())
+    name = input("Enter the name of the dataset to use: ")
+    if workspace.use(name) is None:
+        return "Invalid dataset name."
+    return f"Using dataset '{name}'."
+
+
+def show_jobs():
+    if not jobs.jobs:
+        return "No jobs."
+    return "\n".join(job.describe() for job in jobs.jobs.values())
+
+
+def cancel_job():
+    job_id = input("Enter the number of the job to cancel: ")
+    if not job_id.isdigit() or not jobs.cancel(int(job_id)):
+        return "Invalid job number."
+    return f"Cancelling job #{job_id}."
+
+
 def main():
+    # Figures are rendered off-screen on the job thread (see render_plot)
+    import matplotlib
+    matplotlib.use("Agg")
     while True:
+        # Show the plots rendered since the last prompt
+        jobs.run_ready()
         print("Choose an action:")
         print("1. Load Data")
         print("2. Analyze Data")
         print("3. Visualize Data")
-        print("4. Exit")
+        print("4. Switch Dataset")
+        print("5. Show Jobs")
+        print("6. Cancel Job")
+        print("7. Exit")
 
         choice = input("Enter the number of the action you want to perform: ")
 
@@ -126,10 +232,119 @@ def main():
         elif choice == "3":
             print(visualize_data())
         elif choice == "4":
+            print(switch_dataset())
+        elif choice == "5":
+            print(show_jobs())
+        elif choice == "6":
+            print(cancel_job())
+        elif choice == "7":
+            jobs.shutdown()
+            workspace.close()
             break
+        elif choice == "":
+            continue
         else:
             print("Invalid choice. Please enter a valid option.")
 
 
+def batch_main(argv):
+    """
+        Non-interactive entry point: run pipeline files, or one pipeline described by arguments,
+        in this process and print the results as JSON.
+        Args:
+            argv (list of str): The command-line arguments, e.g.
+                ["run", "daily.yaml", "weekly.json"] or
+                ["analyze", "sales.csv", "--stat", "mean:price", "--plot", "histogram:price"].
+    """
+    parser = argparse.ArgumentParser(prog="CommandLineInterface.py",
+                                     description="Run data analysis pipelines without prompts.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="Run the pipelines of one or more YAML/JSON files.")
+    run.add_argument("files", nargs="+")
+    analyze = commands.add_parser("analyze", help="Load one file and compute statistics and plots.")
+    analyze.add_argument("path")
+    analyze.add_argument("--source", choices=["csv", "excel", "png", "directory"])
+    analyze.add_argument("--sheet-name", default=None)
+    analyze.add_argument("--stat", action="append", default=[],
+                         help="statistic:column[,column...], e.g. mean:price or correlation:price,size")
+    analyze.add_argument("--plot", action="append", default=[],
+                         help="plot:column[,column...], e.g. histogram:price or scatter:size,price")
+    analyze.add_argument("--output-dir", default=".")
+    serve = commands.add_parser("serve", help="Serve statistics and plots of warm datasets over local HTTP.")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--workers", type=int, help="Statistics threads. Defaults to the CPU count.")
+    serve.add_argument("--load", action="append", default=[], metavar="NAME=PATH",
+                       help="Load a dataset before serving, e.g. sales=sales.csv.")
+    serve.add_argument("--memory-budget", type=float,
+                       help="MiB the loaded datasets may use; least recently used ones are spilled to disk.")
+    for name in (run, analyze):
+        name.add_argument("--output", help="Write the JSON results to this file instead of stdout.")
+        name.add_argument("--profile", help="Write per-call spans and timing summaries to this JSON file.")
+        name.add_argument("--trace", help="Write per-call spans to this file in Chrome trace format.")
+        name.add_argument("--trace-memory", action="store_true", help="Also record peak memory per call.")
+        name.add_argument("--memory-budget", type=float,
+                          help="MiB the loaded datasets may use; least recently used ones are spilled to disk.")
+    args = parser.parse_args(argv)
+    if args.command == "serve":
+        return _serve(args)
+    if args.profile or args.trace:
+        Profiler.enable(trace_memory=args.trace_memory)
+
+    if args.command == "run":
+        pipelines = []
+        for path in args.files:
+            pipelines.extend(load_pipelines(path))
+    else:
+        load = {"path": args.path}
+        if args.source:
+            load["source"] = args.source
+        if args.sheet_name is not None:
+            load["sheet_name"] = args.sheet_name
+        pipelines = [{"name": args.path, "load": load, "output_dir": args.output_dir,
+                      "stats": [_parse_step("statistic", text) for text in args.stat],
+                      "plots": [_parse_step("plot", text) for text in args.plot]}]
+
+    runner = PipelineRunner(memory_budget=None if args.memory_budget is None else int(args.memory_budget * 1024 ** 2))
+    results = runner.run_all(pipelines)
+    runner.workspace.close()
+    if Profiler.is_enabled():
+        Profiler.disable()
+        if args.profile:
+            Profiler.write_json(args.profile)
+        if args.trace:
+            Profiler.write_chrome_trace(args.trace)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+    return 0 if not any(result["errors"] or any(plot["error"] for plot in result["plots"])
+                        for result in results) else 1
+
+
+def _serve(args):
+    from Service import AnalysisService
+    budget = None if args.memory_budget is None else int(args.memory_budget * 1024 ** 2)
+    service = AnalysisService(Workspace(memory_budget=budget), workers=args.workers)
+    for text in args.load:
+        name, _, path = text.partition("=")
+        try:
+            service.workspace.add(name, load_dataset({"path": path}))
+        except Exception as e:
+            print(f"Error loading '{path}': {str(e)}")
+            return 1
+    service.run(args.host, args.port)
+    return 0
+
+
+def _parse_step(kind, text):
+    name, _, columns = text.partition(":")
+    return {kind: name, "args": [column for column in columns.split(",") if column]}
+
+
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(batch_main(sys.argv[1:]))
     main()
@@ -0,0 +1,120 @@
+import heapq
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+
+def _prepare(frame, method):
+    """
+        Turn the numeric columns of a frame into a float matrix, ranked for Spearman.
+        Returns the column names, the values with missing entries zeroed, and the presence mask.
+    """
+    numeric = frame.select_dtypes(include=np.number)
+    if method == "spearman":
+        numeric = numeric.rank()
+    elif method != "pearson":
+        raise ValueError(f"Unknown correlation method '{method}'")
+    values = numeric.to_numpy(dtype=np.float64)
+    mask = ~np.isnan(values)
+    # Centering does not change correlations but avoids cancellation in the sum formulas
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.where(mask, values, 0.0).sum(axis=0) / mask.sum(axis=0)
+    values = values - np.nan_to_num(means)
+    return numeric.columns.tolist(), np.where(mask, values, 0.0), mask.astype(np.float64)
+
+
+def _block(values, squares, mask, rows, columns, min_periods):
+    """
+        Pearson correlation of the column blocks `rows` x `columns` over pairwise-complete
+        observations, using only matrix products:
+        n = M'M, sum x = (XM)'M, sum x^2 = (X^2 M)'M and sum xy = X'Y with X zeroed where missing.
+    """
+    x, y = values[:, rows], values[:, columns]
+    mx, my = mask[:, rows], mask[:, columns]
+    n = mx.T @ my
+    sum_x = x.T @ my
+    sum_y = mx.T @ y
+    sum_xx = squares[:, rows].T @ my
+    sum_yy = mx.T @ squares[:, columns]
+    sum_xy = x.T @ y
+    with np.errstate(invalid="ignore", divide="ignore"):
+        covariance = n * sum_xy - sum_x * sum_y
+        variance = (n * sum_xx - sum_x ** 2) * (n * sum_yy - sum_y ** 2)
+        correlation = covariance / np.sqrt(variance)
+    correlation[n < max(min_periods, 2)] = np.nan
+    return np.clip(correlation, -1.0, 1.0)
+
+
+def _tiles(size, block_size):
+    return [slice(start, min(start + block_size, size)) for start in range(0, size, block_size)]
+
+
+def correlation_matrix(frame, method="pearson", block_size=256, workers=None, min_periods=1):
+    """
+        Compute the correlation matrix of the numeric columns of a frame.
+        Missing values are handled pairwise (each pair uses the rows where both are present), and
+        the matrix is assembled from tiles computed with BLAS matrix products on a thread pool.
+        For Spearman, each column is ranked once over its own present values, which matches
+        pandas exactly when there are no missing values.
+        Args:
+            frame (pd.DataFrame): The data. Non-numeric columns are ignored.
+            method (str): "pearson" or "spearman".
+            block_size (int): Number of columns per tile.
+            workers (int, optional): Number of threads. Defaults to the CPU count.
+            min_periods (int): Minimum number of complete pairs for a result; NaN otherwise.
+    """
+    names, values, mask = _prepare(frame, method)
+    squares = values ** 2
+    tiles = _tiles(len(names), block_size)
+    pairs = [(rows, columns) for i, rows in enumerate(tiles) for columns in tiles[i:]]
+    result = np.empty((len(names), len(names)))
+
+    def compute(pair):
+        rows, columns = pair
+        block = _block(values, squares, mask, rows, columns, min_periods)
+        result[rows, columns] = block
+        result[columns, rows] = block.T
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        list(executor.map(compute, pairs))
+    np.fill_diagonal(result, np.where(mask.sum(axis=0) >= max(min_periods, 2), 1.0, np.nan))
+    return pd.DataFrame(result, index=names, columns=names)
+
+
+def top_correlated_pairs(frame, k=10, method="pearson", block_size=256, workers=None, min_periods=1):
+    """
+        Find the k most strongly correlated pairs of numeric columns (by absolute value)
+        without materializing the full correlation matrix; only one tile per thread is held at a time.
+        Args:
+            frame (pd.DataFrame): The data. Non-numeric columns are ignored.
+            k (int): Number of pairs to return.
+            method (str): "pearson" or "spearman".
+            block_size (int): Number of columns per tile.
+            workers (int, optional): Number of threads. Defaults to the CPU count.
+            min_periods (int): Minimum number of complete pairs for a result.
+        Returns:
+            pd.DataFrame: Columns "column1", "column2" and "correlation", strongest first.
+    """
+    names, values, mask = _prepare(frame, method)
+    squares = values ** 2
+    tiles = _tiles(len(names), block_size)
+    pairs = [(rows, columns) for i, rows in enumerate(tiles) for columns in tiles[i:]]
+
+    def compute(pair):
+        rows, columns = pair
+        block = _block(values, squares, mask, rows, columns, min_periods)
+        i, j = np.meshgrid(np.arange(rows.start, rows.stop), np.arange(columns.start, columns.stop), indexing="ij")
+        keep = (i < j) & ~np.isnan(block)
+        strengths, i, j, block = np.abs(block[keep]), i[keep], j[keep], block[keep]
+        if strengths.size > k:
+            best = np.argpartition(-strengths, k - 1)[:k]
+            strengths, i, j, block = strengths[best], i[best], j[best], block[best]
+        return list(zip(strengths.tolist(), i.tolist(), j.tolist(), block.tolist()))
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        candidates = [candidate for tile in executor.map(compute, pairs) for candidate in tile]
+    best = heapq.nlargest(k, candidates)
+    return pd.DataFrame([(names[i], names[j], value) for _, i, j, value in best],
+                        columns=["column1", "column2", "correlation"])
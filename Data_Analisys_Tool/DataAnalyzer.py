@@ -1,27 +1,61 @@
+import functools
+import warnings
+
 import numpy as np
+import pandas as pd
 
-from scipy.stats import stats
+import ColumnParallel
+import Correlation
+import Outliers
+import Profiler
+import TimeSeries
+import Transforms
+from Accumulators import CoMomentAccumulator, MomentAccumulator, column_moments
+from Binning import HistogramBins
+from Sketches import FrequentItemsSketch, QuantileSketch
+from StatisticsCache import StatisticsCache, cached_statistic
 
 
 class DataAnalyzer:
-    def __init__(self, dataset):
+    MOMENT_STATISTICS = ("count", "mean", "std_deviation", "variance", "log_sum", "geometric_mean")
+    ORDER_STATISTICS = ("min", "max", "median", "quartiles", "mode")
+
+    def __init__(self, dataset, cache=None):
         self.dataset = dataset
+        self.cache = cache if cache is not None else StatisticsCache()
+        # Columns computed on demand from the raw ones (see derive)
+        self.derived = Transforms.DerivedColumns(dataset, self.cache) if dataset is not None else None
+        # Statistics kept up to date as rows are appended (see track)
+        self._trackers = {}
+        self._pair_trackers = {}
+        self._tracked_version = None
 
+    @Profiler.profiled("statistic")
+    @cached_statistic
     def calculate_mean(self, column_name):
         if self.dataset is not None:
             try:
-                column = self.dataset.data[column_name]
+                tracker = self._tracker(column_name)
+                if tracker is not None:
+                    return tracker["moments"].mean
+                if self.dataset.is_streaming():
+                    return self._accumulate(column_name).mean
+                column = self._column(column_name)
                 # Check if the column contains numeric data
-                if np.issubdtype(column.dtype, np.number):
+                if pd.api.types.is_numeric_dtype(column.dtype):
                     mean_value = np.mean(column)
                     return mean_value
                 else:
-                    return "Error: Column '{column_name}' does not contain numeric data."
+                    return f"Error: Column '{column_name}' does not contain numeric data."
             except KeyError:
                 print(f"Error: Column '{column_name}' not found")
+            except TypeError as e:
+                return f"Error: {str(e)}"
         else:
             return "Error: No dataset Provided"
 
+    @Profiler.profiled("statistic")
+    @cached_statistic
     def calculate_standard_deviation(self, column_name):
         """
             Calculate the standard deviation of a specified column in the dataset.
@@ -30,28 +64,47 @@ class DataAnalyzer:
         """
         if self.dataset is not None:
             try:
-                std_deviation = np.std(self.dataset.data[column_name])
+                tracker = self._tracker(column_name)
+                if tracker is not None:
+                    return tracker["moments"].standard_deviation
+                if self.dataset.is_streaming():
+                    return self._accumulate(column_name).standard_deviation
+                std_deviation = np.std(self._column(column_name))
                 return std_deviation
             except KeyError:
                 print(f"Error: Column '{column_name}' not found")
         else:
             return "Error: No dataset Provided"
 
-    def calculate_median(self, column_name):
+    @Profiler.profiled("statistic")
+    @cached_statistic
+    def calculate_median(self, column_name, approximate=False, epsilon=0.01):
+        """
+            Calculate the median of a specified column in the dataset.
+            Args:
+                column_name (str): The name of the column.
+                approximate (bool): Estimate the median from a mergeable quantile sketch instead of
+                    sorting the whole column. Always used for streaming datasets.
+                epsilon (float): Rank error allowed for the approximate median.
+        """
         if self.dataset is not None:
             try:
-                column = self.dataset.data[column_name]
+                if approximate or self.dataset.is_streaming():
+                    return self.quantile_sketch(column_name, epsilon).quantile(0.5)
+                column = self._column(column_name)
                 # Check if the column contains numeric data
-                if np.issubdtype(column.dtype, np.number):
+                if pd.api.types.is_numeric_dtype(column.dtype):
                     median_value = np.median(column)
                     return median_value
                 else:
-                    return "Error: Column '{column_name}' does not contain numeric data."
+                    return f"Error: Column '{column_name}' does not contain numeric data."
             except KeyError:
                 print(f"Error: Column '{column_name}' not found")
         else:
             return "Error: No dataset Provided"
 
+    @Profiler.profiled("statistic")
+    @cached_statistic
     def calculate_correlation(self, column1, column2):
         """
             Calculate the correlation between two columns in the dataset.
@@ -61,14 +114,69 @@ class DataAnalyzer:
         """
         if self.dataset is not None:
             try:
-                correlation = np.corrcoef(self.dataset.data[column1], self.dataset.data[column2])[0, 1]
+                tracker = self._pair_tracker(column1, column2)
+                if tracker is not None:
+                    return tracker.correlation
+                if self.dataset.is_streaming():
+                    # One pass over the chunks with the same co-moment accumulator as track_correlation
+                    return self._build_pair_tracker(column1, column2).correlation
+                correlation = np.corrcoef(self._column(column1), self._column(column2))[0, 1]
                 return correlation
 
             except KeyError:
                 print(f"Error: One or both columns not found")
+            except TypeError as e:
+                return f"Error: {str(e)}"
+        else:
+            return "Error: No dataset provided"
+
+    @Profiler.profiled("statistic")
+    @cached_statistic
+    def calculate_correlation_matrix(self, columns=None, method="pearson", workers=None):
+        """
+            Calculate the correlation matrix of the numeric columns in the dataset, handling
+            missing values pairwise and computing column tiles in parallel.
+            Args:
+                columns (list of str, optional): The columns to include. Defaults to all numeric columns.
+                method (str): "pearson" or "spearman".
+                workers (int, optional): Number of threads. Defaults to the CPU count.
+        """
+        if self.dataset is not None:
+            try:
+                frame = self._frame(columns)
+                return Correlation.correlation_matrix(frame, method=method, workers=workers)
+            except KeyError:
+                print(f"Error: One or more columns not found")
+            except ValueError as e:
+                return f"Error: {str(e)}"
+        else:
+            return "Error: No dataset provided"
+
+    @Profiler.profiled("statistic")
+    @cached_statistic
+    def top_correlations(self, k=10, columns=None, method="pearson", workers=None):
+        """
+            Find the k most strongly correlated pairs of numeric columns without building the
+            full correlation matrix.
+            Args:
+                k (int): Number of pairs to return.
+                columns (list of str, optional): The columns to include. Defaults to all numeric columns.
+                method (str): "pearson" or "spearman".
+                workers (int, optional): Number of threads. Defaults to the CPU count.
+        """
+        if self.dataset is not None:
+            try:
+                frame = self._frame(columns)
+                return Correlation.top_correlated_pairs(frame, k=k, method=method, workers=workers)
+            except KeyError:
+                print(f"Error: One or more columns not found")
+            except ValueError as e:
+                return f"Error: {str(e)}"
         else:
             return "Error: No dataset provided"
 
+    @Profiler.profiled("statistic")
+    @cached_statistic
     def calculate_variance(self, column_name):
         """
             Calculate the variance of a specified column in the dataset
@@ -78,57 +186,130 @@ class DataAnalyzer:
 
         if self.dataset is not None:
             try:
-                variance_value = np.var(self.dataset.data[column_name])
+                tracker = self._tracker(column_name)
+                if tracker is not None:
+                    return tracker["moments"].variance
+                if self.dataset.is_streaming():
+                    return self._accumulate(column_name).variance
+                variance_value = np.var(self._column(column_name))
                 return variance_value
             except KeyError:
                 print(f"Error: Column '{column_name}' not found")
         else:
             return "Error: No database provided"
 
-    def calculate_quartiles(self, column_name):
+    @Profiler.profiled("statistic")
+    @cached_statistic
+    def calculate_quartiles(self, column_name, approximate=False, epsilon=0.01):
         """
             Calculate the quartiles (25,th,50th, and 75th percentiles) of specified column in the dataset
             Args:
                 column_name (str): The name of the column for which to calculate the quartiles.
+                approximate (bool): Estimate the quartiles from a mergeable quantile sketch.
+                    Always used for streaming datasets.
+                epsilon (float): Rank error allowed for the approximate quartiles.
         """
         if self.dataset is not None:
             try:
-                quartiles = np.percentile(self.dataset.data[column_name], [25, 50, 75])
+                if approximate or self.dataset.is_streaming():
+                    return self.quantile_sketch(column_name, epsilon).quantile([0.25, 0.5, 0.75])
+                quartiles = np.percentile(self._column(column_name), [25, 50, 75])
                 return quartiles
             except KeyError:
                 print(f"Error: Column '{column_name}' not found")
         else:
             return "Error: No dataset provided"
 
-    def calculate_mode(self, column_name):
+    @Profiler.profiled("statistic")
+    @cached_statistic
+    def calculate_mode(self, column_name, approximate=False, epsilon=0.001):
         """
             Calculate the mode of a specified column in the dataset.
             Args:
                 column_name (str): The name of the column for which to calculate the mode.
+                approximate (bool): Estimate the mode from a mergeable heavy-hitters summary.
+                    Always used for streaming datasets.
+                epsilon (float): Largest error of the estimated counts, as a fraction of all values.
         """
         if self.dataset is not None:
             try:
-                mode_value = self.dataset.data[column_name].mode()[0]
+                if approximate or self.dataset.is_streaming():
+                    return self.frequency_sketch(column_name, epsilon).mode()
+                mode_value = self._column(column_name).mode()[0]
                 return mode_value
             except KeyError:
                 print(f"Error: Column '{column_name}' not found")
         else:
             return "Error: No dataset provided"
 
+    @Profiler.profiled("statistic")
     def log_transform(self, column_name):
         """
-            Apply a natural logarithm (log) transformation to a specified column.
+            Define the natural logarithm of a column as the derived column "log_<column_name>".
+            The original values are kept; the logarithms are computed when first used (see derive).
             Args:
                 column_name (str): The name of the column to transform.
         """
-        if self.dataset is not None:
-            try:
-                self.dataset.data[column_name] = np.log(self.dataset.data[column_name])
-                print(f"Log-transformed '{column_name}' column")
-            except KeyError:
-                print(f"Error: Column '{column_name}' not found")
-        return "Error: No dataset provided"
+        return self.derive(f"log_{column_name}", "log", column_name)
 
+    def derive(self, name, function, column_name, **params):
+        """
+            Define a derived column: a transform of a column, or of another derived column, computed on demand
+            and never written back to the dataset. Every statistic of the analyzer accepts its name.
+            Args:
+                name (str): The name of the derived column.
+                function (str): A name from Transforms.TRANSFORMS: "log", "log1p", "sqrt", "exp", "abs",
+                    "standardize", "clip" (with lower and/or upper) or "bin" (with bins, a number of
+                    equal-width bins or a list of edges).
+                column_name (str): The column to transform.
+                **params: Parameters of the transform.
+            Returns:
+                str: The name of the derived column.
+        """
+        if self.dataset is None:
+            return "Error: No dataset provided"
+        try:
+            transform = self.derived.define(name, function, column_name, **params)
+            print(f"Derived column '{name}' = {transform!r}")
+            return name
+        except KeyError:
+            print(f"Error: Column '{column_name}' not found")
+        except (ValueError, TypeError) as e:
+            return f"Error: {str(e)}"
+
+    def derived_columns(self):
+        """
+            Return the derived columns and their expressions.
+        """
+        if self.dataset is None:
+            return {}
+        return {name: repr(transform) for name, transform in self.derived.expressions.items()}
+
+    @Profiler.profiled("statistic")
+    def derived_values(self, name):
+        """
+            Compute the values of a derived column, as a read-only array.
+            A column asked for again under the same dataset version is served from the statistics cache.
+            Args:
+                name (str): The name of the derived column.
+        """
+        if self.dataset is None:
+            return "Error: No dataset provided"
+        try:
+            return self.derived.values(name)
+        except KeyError:
+            print(f"Error: Derived column '{name}' not found")
+        except TypeError as e:
+            return f"Error: {str(e)}"
+
+    def cache_stats(self):
+        """
+            Report the statistics cache hit/miss counters and its current size.
+        """
+        return self.cache.stats()
+
+    @Profiler.profiled("statistic")
+    @cached_statistic
     def calculate_log_sum(self, column_name):
         """
             Calculate the sum of logarithms  of values in a specified column
@@ -137,13 +318,23 @@ class DataAnalyzer:
         """
         if self.dataset is not None:
             try:
-                log_sum = np.sum(np.log(self.dataset.data[column_name]))
-                return log_sum
+                if self.dataset.is_streaming():
+                    return self._accumulate(column_name, track_log=True).log_sum
+                # The logarithms are shared with log_transform and the "log" derived columns of the column
+                logs = self.derived.values(self.derived.expression("log", column_name))
+                # A value with no logarithm is negative: the sum is undefined, as in summarize
+                if np.count_nonzero(~np.isnan(logs)) != self._column(column_name).count():
+                    return np.nan
+                return np.nansum(logs)
             except KeyError:
                 print(f"Error: Column '{column_name}' not found")
+            except TypeError as e:
+                return f"Error: {str(e)}"
         else:
             return "Error: No dataset provided"
 
+    @Profiler.profiled("statistic")
+    @cached_statistic
     def calculate_geometric_mean(self, column_name):
         """
             Calculate the geometric mean of a specified column in the dataset
@@ -152,9 +343,705 @@ class DataAnalyzer:
         """
         if self.dataset is not None:
             try:
-                geometric_mean = stats.gmean(self.dataset.data[column_name])
-                return geometric_mean
+                if self.dataset.is_streaming():
+                    accumulator = self._accumulate(column_name, track_log=True)
+                    return np.exp(accumulator.log_sum / accumulator.count) if accumulator.count else np.nan
+                # exp(mean(log x)), from the cached log sum instead of taking the logarithms again
+                log_sum = self.calculate_log_sum(column_name)
+                if log_sum is None or isinstance(log_sum, str):
+                    return log_sum
+                count = self._column(column_name).count()
+                return np.exp(log_sum / count) if count else np.nan
             except KeyError:
                 print(f"Error: Column '{column_name}' not found")
+            except TypeError as e:
+                return f"Error: {str(e)}"
         else:
             return "Error: No dataset provided"
+
+    @Profiler.profiled("statistic")
+    def track(self, *column_names, epsilon=0.01):
+        """
+            Keep the count, mean, variance, minimum, maximum and approximate quartiles of numeric columns
+            up to date as rows are appended to the dataset (see DataSet.append). The columns are read
+            once here; after that each append only folds in the new rows.
+            Args:
+                *column_names (str): The columns to track.
+                epsilon (float): Rank error allowed for the tracked quartiles.
+        """
+        if self.dataset is None:
+            return "Error: No dataset provided"
+        try:
+            self._refresh_trackers()
+            for column_name in column_names:
+                if column_name not in self._trackers:
+                    self._trackers[column_name] = self._build_tracker(column_name, epsilon)
+            self.dataset.add_append_listener(self._on_append)
+        except KeyError as e:
+            print(f"Error: Column {e} not found")
+        except TypeError as e:
+            return f"Error: {str(e)}"
+
+    @Profiler.profiled("statistic")
+    def track_correlation(self, column1, column2):
+        """
+            Keep the Pearson correlation of two numeric columns up to date as rows are appended.
+            Args:
+                column1 (str): The name of the first column.
+                column2 (str): The name of the second column.
+        """
+        if self.dataset is None:
+            return "Error: No dataset provided"
+        try:
+            self._refresh_trackers()
+            if (column1, column2) not in self._pair_trackers:
+                self._pair_trackers[(column1, column2)] = self._build_pair_tracker(column1, column2)
+            self.dataset.add_append_listener(self._on_append)
+        except KeyError:
+            print(f"Error: One or both columns not found")
+        except TypeError as e:
+            return f"Error: {str(e)}"
+
+    def tracked_statistics(self):
+        """
+            Return the current values of the tracked statistics, without reading the data again.
+            Returns:
+                dict: {column: {statistic: value}}, plus {(column1, column2): {"correlation": value}}
+                for tracked correlations.
+        """
+        self._refresh_trackers()
+        result = {}
+        for column_name, tracker in self._trackers.items():
+            moments = tracker["moments"]
+            result[column_name] = {"count": moments.count, "mean": moments.mean if moments.count else np.nan,
+                                   "std_deviation": moments.standard_deviation, "variance": moments.variance,
+                                   "min": moments.min, "max": moments.max,
+                                   "quartiles": tracker["quantiles"].quantile([0.25, 0.5, 0.75])}
+        for pair, tracker in self._pair_trackers.items():
+            result[pair] = {"count": tracker.count, "correlation": tracker.correlation}
+        return result
+
+    def _on_append(self, new_rows):
+        # Only fold the new rows in if the trackers were current before this append; otherwise they
+        # are rebuilt from the whole dataset the next time they are read
+        if self._tracked_version != self.dataset.version - 1:
+            return
+        for column_name, tracker in self._trackers.items():
+            tracker["moments"].update(new_rows[column_name])
+            tracker["quantiles"].update(new_rows[column_name])
+        for (column1, column2), tracker in self._pair_trackers.items():
+            tracker.update(new_rows[column1], new_rows[column2])
+        self._tracked_version = self.dataset.version
+
+    def _refresh_trackers(self):
+        if self._tracked_version == self.dataset.version:
+            return
+        for column_name, tracker in self._trackers.items():
+            self._trackers[column_name] = self._build_tracker(column_name, tracker["quantiles"].epsilon)
+        for column1, column2 in self._pair_trackers:
+            self._pair_trackers[(column1, column2)] = self._build_pair_tracker(column1, column2)
+        self._tracked_version = self.dataset.version
+
+    def _tracker(self, column_name):
+        # The tracker of a column, or None when it is not tracked or the data changed in another way
+        tracker = self._trackers.get(column_name)
+        if tracker is not None and tracker["moments"].count and self._tracked_version == self.dataset.version:
+            return tracker
+        return None
+
+    def _pair_tracker(self, column1, column2):
+        if (column1, column2) in self._pair_trackers and self._tracked_version == self.dataset.version:
+            return self._pair_trackers[(column1, column2)]
+        return None
+
+    def _build_tracker(self, column_name, epsilon):
+        tracker = {"moments": MomentAccumulator(), "quantiles": QuantileSketch(epsilon, seed=0)}
+        for chunk in self._iter_chunks([column_name]):
+            column = chunk[column_name]
+            if not pd.api.types.is_numeric_dtype(column.dtype):
+                raise TypeError(f"Column '{column_name}' does not contain numeric data.")
+            tracker["moments"].update(column)
+            tracker["quantiles"].update(column)
+        return tracker
+
+    def _build_pair_tracker(self, column1, column2):
+        tracker = CoMomentAccumulator()
+        for chunk in self._iter_chunks([column1, column2]):
+            self._numeric_block(chunk, [column1, column2])
+            tracker.update(chunk[column1], chunk[column2])
+        return tracker
+
+    def _accumulate(self, column_name, track_log=False):
+        """
+            Compute the moments of a column in a single pass over the dataset chunks.
+            Args:
+                column_name (str): The name of the column.
+                track_log (bool): Also accumulate the sum of logarithms.
+        """
+        accumulator = MomentAccumulator(track_log)
+        for chunk in self._iter_chunks([column_name]):
+            column = chunk[column_name]
+            if not pd.api.types.is_numeric_dtype(column.dtype):
+                raise TypeError(f"Column '{column_name}' does not contain numeric data.")
+            accumulator.update(column)
+        if accumulator.count == 0:
+            accumulator.mean = np.nan
+        return accumulator
+
+    @Profiler.profiled("statistic")
+    @cached_statistic
+    def quantile_sketch(self, column_name, epsilon=0.01):
+        """
+            Build a KLL quantile sketch of a column, one chunk at a time, merging the per-chunk sketches.
+            Args:
+                column_name (str): The name of the column.
+                epsilon (float): Target normalized rank error.
+        """
+        sketch = QuantileSketch(epsilon, seed=0)
+        for chunk in self._iter_chunks([column_name]):
+            column = chunk[column_name]
+            if not pd.api.types.is_numeric_dtype(column.dtype):
+                raise TypeError(f"Column '{column_name}' does not contain numeric data.")
+            sketch.merge(QuantileSketch(epsilon, seed=0).update(column))
+        return sketch
+
+    @Profiler.profiled("statistic")
+    @cached_statistic
+    def frequency_sketch(self, column_name, epsilon=0.001):
+        """
+            Build a heavy-hitters summary of a column, one chunk at a time, merging the per-chunk summaries.
+            Args:
+                column_name (str): The name of the column.
+                epsilon (float): Largest error of the estimated counts, as a fraction of all values.
+        """
+        sketch = FrequentItemsSketch(epsilon)
+        for chunk in self._iter_chunks([column_name]):
+            sketch.merge(FrequentItemsSketch(epsilon).update(chunk[column_name]))
+        return sketch
+
+    @Profiler.profiled("statistic")
+    @cached_statistic
+    def summarize(self, columns=None, stats=None, workers=None, use_processes=False):
+        """
+            Calculate several statistics for several columns at once.
+            The moment statistics share one vectorized pass over the data and the order
+            statistics share one partition/sort per column, instead of rescanning each column
+            once per statistic. For in-memory data the columns are split into blocks that are
+            summarized in parallel, which pays off for wide tables.
+            Args:
+                columns (list of str, optional): The columns to summarize. Defaults to every numeric column.
+                stats (list of str, optional): The statistics to calculate, taken from MOMENT_STATISTICS
+                    and ORDER_STATISTICS. Defaults to all of them.
+                workers (int, optional): Number of threads (or processes). Defaults to the CPU count.
+                use_processes (bool): Summarize the column blocks in a process pool reading the data
+                    from shared memory, instead of in threads.
+            Returns:
+                pd.DataFrame: One row per column and one column per statistic; "quartiles" expands
+                to "q25", "q50" and "q75".
+        """
+        if self.dataset is None:
+            return "Error: No dataset provided"
+
+        stats = list(stats) if stats else list(self.MOMENT_STATISTICS + self.ORDER_STATISTICS)
+        unknown = [stat for stat in stats if stat not in self.MOMENT_STATISTICS + self.ORDER_STATISTICS]
+        if unknown:
+            return f"Error: Unknown statistic '{unknown[0]}'"
+
+        if columns is None:
+            columns = self._numeric_column_names()
+        columns = list(columns)
+        moment_stats = [stat for stat in stats if stat in self.MOMENT_STATISTICS]
+        order_stats = [stat for stat in stats if stat in self.ORDER_STATISTICS]
+        track_log = "log_sum" in moment_stats or "geometric_mean" in moment_stats
+
+        try:
+            if self.dataset.is_streaming() and not order_stats:
+                accumulators = None
+                for chunk in self._iter_chunks(columns):
+                    chunk_accumulators = column_moments(self._numeric_block(chunk, columns), track_log)
+                    if accumulators is None:
+                        accumulators = chunk_accumulators
+                    else:
+                        accumulators = [a.merge(b) for a, b in zip(accumulators, chunk_accumulators)]
+                result = self._moment_table(accumulators, moment_stats) if accumulators is not None else {}
+            else:
+                values = self._numeric_block(self._frame(columns), columns)
+                kernel = functools.partial(_summary_block, moment_stats, order_stats, track_log)
+                result = ColumnParallel.map_column_blocks(values, kernel, workers, use_processes)
+        except KeyError as e:
+            print(f"Error: Column {e} not found")
+            return None
+        except TypeError as e:
+            return f"Error: {str(e)}"
+
+        ordered = []
+        for stat in stats:
+            ordered.extend(["q25", "q50", "q75"] if stat == "quartiles" else [stat])
+        return pd.DataFrame(result, index=columns)[ordered]
+
+    @Profiler.profiled("statistic")
+    @cached_statistic
+    def histogram(self, column_name, max_bins=1024):
+        """
+            Count a numeric column in fine, mergeable histogram bins, one chunk at a time.
+            Histograms and density plots are drawn from these cached bins instead of the raw rows.
+            Args:
+                column_name (str): The name of the column.
+                max_bins (int): Largest number of bins kept.
+        """
+        if self.dataset is not None:
+            try:
+                bins = HistogramBins(max_bins)
+                for chunk in self._iter_chunks([column_name]):
+                    column = chunk[column_name]
+                    if not pd.api.types.is_numeric_dtype(column.dtype):
+                        return f"Error: Column '{column_name}' does not contain numeric data."
+                    bins.merge(HistogramBins(max_bins).update(column))
+                return bins
+            except KeyError:
+                print(f"Error: Column '{column_name}' not found")
+        else:
+            return "Error: No dataset provided"
+
+    @Profiler.profiled("statistic")
+    @cached_statistic
+    def group_stats(self, by, value, stats=("count", "mean", "std_deviation")):
+        """
+            Calculate per-group aggregates of a numeric column with a single hash-based group-by.
+            Args:
+                by (str or list of str): The column(s) to group by.
+                value (str): The numeric column to aggregate.
+                stats (list of str): Any of count, sum, mean, std_deviation, variance, min, max,
+                    median, ci (half-width of the normal 95% confidence interval of the mean) and
+                    qNN for the NN-th percentile, e.g. "q25" or "q6.25".
+            Returns:
+                pd.DataFrame: One row per group and one column per statistic.
+        """
+        if self.dataset is None:
+            return "Error: No dataset provided"
+        keys = [by] if isinstance(by, str) else list(by)
+        try:
+            frame = self._frame(keys + [value])
+        except KeyError:
+            print(f"Error: One or more columns not found")
+            return None
+        if not pd.api.types.is_numeric_dtype(frame[value].dtype):
+            return f"Error: Column '{value}' does not contain numeric data."
+
+        grouped = frame.groupby(keys if len(keys) > 1 else keys[0], sort=True, observed=True)[value]
+        table = {}
+        quantiles = [stat for stat in stats if stat.startswith("q")]
+        if quantiles:
+            levels = [float(stat[1:]) / 100 for stat in quantiles]
+            values = grouped.quantile(levels).unstack()
+            for stat, level in zip(quantiles, levels):
+                table[stat] = values[level]
+        for stat in stats:
+            if stat == "count":
+                table[stat] = grouped.count()
+            elif stat == "sum":
+                table[stat] = grouped.sum()
+            elif stat == "mean":
+                table[stat] = grouped.mean()
+            elif stat == "std_deviation":
+                table[stat] = grouped.std(ddof=0)
+            elif stat == "variance":
+                table[stat] = grouped.var(ddof=0)
+            elif stat == "min":
+                table[stat] = grouped.min()
+            elif stat == "max":
+                table[stat] = grouped.max()
+            elif stat == "median":
+                table[stat] = grouped.median()
+            elif stat == "ci":
+                table[stat] = 1.96 * grouped.std(ddof=1) / np.sqrt(grouped.count())
+            elif stat not in quantiles:
+                return f"Error: Unknown statistic '{stat}'"
+        return pd.DataFrame(table)[list(stats)]
+
+    @Profiler.profiled("statistic")
+    @cached_statistic
+    def group_histograms(self, by, value, bins=64):
+        """
+            Count a numeric column in shared bins for every group at once.
+            Args:
+                by (str): The column to group by.
+                value (str): The numeric column to count.
+                bins (int): Number of bins spanning the whole column.
+            Returns:
+                tuple: (bin edges, pd.DataFrame of counts with one row per group).
+        """
+        if self.dataset is None:
+            return "Error: No dataset provided"
+        try:
+            frame = self._frame([by, value]).dropna()
+        except KeyError:
+            print(f"Error: One or more columns not found")
+            return None
+        codes, groups = pd.factorize(frame[by], sort=True)
+        values = frame[value].to_numpy(dtype=np.float64)
+        low, high = (values.min(), values.max()) if values.size else (0.0, 1.0)
+        edges = np.linspace(low, high if high > low else low + 1, bins + 1)
+        counts, _, _ = np.histogram2d(codes, values, bins=[np.arange(len(groups) + 1) - 0.5, edges])
+        return edges, pd.DataFrame(counts, index=groups)
+
+    @Profiler.profiled("statistic")
+    @cached_statistic
+    def resample(self, time_column, value_column, interval=None, stats=("mean",), buckets=None):
+        """
+            Aggregate a numeric column over fixed time intervals, one chunk at a time, so that series far
+            larger than memory come out as one row per interval.
+            Args:
+                time_column (str): The time column: datetimes, date text, or numbers.
+                value_column (str): The numeric column to aggregate.
+                interval (str or number, optional): Width of an interval, e.g. "15min" or "1D" for datetimes,
+                    or a number for a numeric time column.
+                buckets (int, optional): Instead of `interval`, split the whole time range into this many
+                    intervals starting at the first time (this reads the time column once more).
+                stats (list of str): Any of count, sum, mean, std_deviation, variance, min, max, first and last.
+            Returns:
+                pd.DataFrame: One row per non-empty interval, indexed by the interval start.
+        """
+        if self.dataset is None:
+            return "Error: No dataset provided"
+        if (interval is None) == (buckets is None):
+            return "Error: Give either an interval or a number of buckets"
+        columns = [time_column] if time_column == value_column else [time_column, value_column]
+        try:
+            if buckets is not None:
+                low, high, is_datetime = np.inf, -np.inf, False
+                for chunk in self._iter_chunks([time_column]):
+                    times, is_datetime, missing = TimeSeries.time_values(chunk[time_column])
+                    if (~missing).any():
+                        low, high = min(low, times[~missing].min()), max(high, times[~missing].max())
+                if low > high:
+                    return pd.DataFrame(columns=list(stats))
+                step = (high - low) / buckets if high > low else 1
+                step = max(int(np.ceil(step)), 1) if is_datetime else step
+            resampler = None
+            for chunk in self._iter_chunks(columns):
+                if not pd.api.types.is_numeric_dtype(chunk[value_column].dtype):
+                    return f"Error: Column '{value_column}' does not contain numeric data."
+                times, is_datetime, missing = TimeSeries.time_values(chunk[time_column])
+                if resampler is None and buckets is not None:
+                    # Anchored at the first time, so that the range splits into exactly `buckets` intervals
+                    resampler = TimeSeries.Resampler(step, is_datetime, origin=low, buckets=buckets)
+                elif resampler is None:
+                    resampler = TimeSeries.Resampler(TimeSeries.time_step(interval, is_datetime), is_datetime)
+                resampler.update(times[~missing], chunk[value_column].to_numpy(dtype=np.float64)[~missing])
+            if resampler is None:
+                return pd.DataFrame(columns=list(stats))
+            table = resampler.result(stats)
+            table.index.name = time_column
+            return table
+        except KeyError:
+            print(f"Error: One or more columns not found")
+        except (ValueError, TypeError) as e:
+            return f"Error: {str(e)}"
+
+    @Profiler.profiled("statistic")
+    @cached_statistic
+    def rolling(self, column_name, window, stats=("mean",), time_column=None, quantile=0.5, min_periods=1):
+        """
+            Calculate rolling-window statistics of a numeric column, one chunk at a time.
+            Count, sum, mean, variance and standard deviation (population, like calculate_standard_deviation)
+            come from cumulative sums and cost O(1) per row whatever the window length; min, max and
+            quantile use pandas' sliding-window kernels.
+            Args:
+                column_name (str): The numeric column.
+                window (int or str): Number of rows, or with `time_column` a duration such as "15min"
+                    (a number for a numeric time column); the window of a row then covers (t - window, t].
+                stats (list of str): Any of count, sum, mean, std_deviation, variance, min, max and quantile.
+                time_column (str, optional): The sorted time column for a time-based window.
+                quantile (float): The quantile calculated for "quantile", e.g. 0.95.
+                min_periods (int): Fewest values a window needs for a result; NaN otherwise.
+            Returns:
+                pd.DataFrame: One row per row of the dataset and one column per statistic, indexed by
+                the time column when one is given.
+        """
+        if self.dataset is None:
+            return "Error: No dataset provided"
+        columns = [column_name] + ([time_column] if time_column not in (None, column_name) else [])
+        try:
+            roller = None
+            parts, index = [], []
+            for chunk in self._iter_chunks(columns):
+                if not pd.api.types.is_numeric_dtype(chunk[column_name].dtype):
+                    return f"Error: Column '{column_name}' does not contain numeric data."
+                times = None
+                if time_column is not None:
+                    times, is_datetime, missing = TimeSeries.time_values(chunk[time_column])
+                    if missing.any():
+                        return f"Error: Column '{time_column}' has missing times"
+                    index.append(pd.to_datetime(times, unit="ns") if is_datetime else times)
+                else:
+                    index.append(chunk.index.to_numpy())
+                if roller is None:
+                    span = TimeSeries.time_step(window, is_datetime) if time_column is not None else window
+                    roller = TimeSeries.RollingWindow(span, stats, quantile, min_periods)
+                parts.append(roller.update(chunk[column_name].to_numpy(dtype=np.float64), times))
+            if roller is None:
+                return pd.DataFrame(columns=list(stats))
+            table = pd.DataFrame({stat: np.concatenate([part[stat] for part in parts]) for stat in stats},
+                                 index=np.concatenate(index))
+            table.index.name = time_column
+            return table
+        except KeyError:
+            print(f"Error: One or more columns not found")
+        except (ValueError, TypeError) as e:
+            return f"Error: {str(e)}"
+
+    @Profiler.profiled("statistic")
+    @cached_statistic
+    def ewma(self, column_name, span=None, alpha=None, halflife=None, com=None):
+        """
+            Calculate the exponentially weighted moving average of a numeric column, one chunk at a time.
+            The recursion runs as a linear filter in C; missing values keep the previous average.
+            Args:
+                column_name (str): The numeric column.
+                span, alpha, halflife, com (float): Exactly one of them sets the smoothing factor,
+                    as in pandas: alpha = 2 / (span + 1), 1 - 0.5 ** (1 / halflife) or 1 / (1 + com).
+            Returns:
+                pd.Series: One value per row.
+        """
+        if self.dataset is None:
+            return "Error: No dataset provided"
+        try:
+            average = TimeSeries.ExponentialAverage(TimeSeries.smoothing_factor(span, alpha, halflife, com))
+            parts, index = [], []
+            for chunk in self._iter_chunks([column_name]):
+                if not pd.api.types.is_numeric_dtype(chunk[column_name].dtype):
+                    return f"Error: Column '{column_name}' does not contain numeric data."
+                parts.append(average.update(chunk[column_name].to_numpy(dtype=np.float64)))
+                index.append(chunk.index.to_numpy())
+            if not parts:
+                return pd.Series(dtype=np.float64, name=column_name)
+            return pd.Series(np.concatenate(parts), index=np.concatenate(index), name=column_name)
+        except KeyError:
+            print(f"Error: Column '{column_name}' not found")
+        except ValueError as e:
+            return f"Error: {str(e)}"
+
+    @Profiler.profiled("statistic")
+    @cached_statistic
+    def outlier_bounds(self, columns=None, method="iqr", threshold=None, approximate=False, epsilon=0.01):
+        """
+            Calculate the bounds outside which values count as outliers, for several numeric columns at once.
+            The quartiles come from summarize; the medians and median absolute deviations from one
+            vectorized pass over the columns. Streaming datasets use quantile sketches for them, built
+            chunk by chunk (the MAD needs a second pass, once the medians are known).
+            Args:
+                columns (list of str, optional): The columns. Defaults to every numeric column.
+                method (str): "iqr", "zscore" or "mad" (see Outliers.DEFAULT_THRESHOLDS).
+                threshold (float, optional): The threshold of the method. Defaults to 1.5, 3 and 3.5 respectively.
+                approximate (bool): Estimate the quantiles from sketches. Always used for streaming datasets.
+                epsilon (float): Rank error allowed for the approximate quantiles.
+            Returns:
+                pd.DataFrame: "lower" and "upper" bounds, one row per column.
+        """
+        if self.dataset is None:
+            return "Error: No dataset provided"
+        if method not in Outliers.METHODS or method == "rolling":
+            return f"Error: Unknown outlier method '{method}'"
+        threshold = Outliers.DEFAULT_THRESHOLDS[method] if threshold is None else threshold
+        columns = self._numeric_column_names() if columns is None else list(columns)
+        approximate = approximate or self.dataset.is_streaming()
+        try:
+            if method == "zscore" or (method == "iqr" and not approximate):
+                table = self.summarize(columns, ["mean", "std_deviation"] if method == "zscore" else ["quartiles"])
+                if not isinstance(table, pd.DataFrame):
+                    return table
+                names = ["mean", "std_deviation"] if method == "zscore" else ["q25", "q75"]
+                first, second = table[names[0]].to_numpy(), table[names[1]].to_numpy()
+            elif approximate:
+                sketches = self._column_sketches(columns, epsilon)
+                if method == "iqr":
+                    first, second = np.array([sketch.quantile([0.25, 0.75]) for sketch in sketches]).reshape(-1, 2).T
+                else:
+                    first = np.array([sketch.quantile(0.5) for sketch in sketches])
+                    second = np.array([sketch.quantile(0.5) for sketch in self._column_sketches(columns, epsilon, first)])
+            else:
+                values = self._numeric_block(self._frame(columns), columns)
+                with warnings.catch_warnings():
+                    # All-missing columns get NaN bounds and flag nothing
+                    warnings.simplefilter("ignore", RuntimeWarning)
+                    first = np.nanmedian(values, axis=0)
+                    second = np.nanmedian(np.abs(values - first), axis=0)
+        except KeyError as e:
+            print(f"Error: Column {e} not found")
+            return None
+        except TypeError as e:
+            return f"Error: {str(e)}"
+        lower, upper = Outliers.fences(method, threshold, first, second)
+        return pd.DataFrame({"lower": lower, "upper": upper}, index=columns)
+
+    @Profiler.profiled("statistic")
+    @cached_statistic
+    def detect_outliers(self, columns=None, method="iqr", threshold=None, output="indices", window=20,
+                        min_periods=None, approximate=False):
+        """
+            Flag outliers in several numeric columns at once, one chunk at a time.
+            Each chunk is tested as one rows x columns block against per-column bounds (see outlier_bounds),
+            or, with the "rolling" method, against the mean and standard deviation of the preceding rows.
+            Only the flags are kept, never copies of the flagged rows.
+            Args:
+                columns (list of str, optional): The columns. Defaults to every numeric column.
+                method (str): "iqr", "zscore", "mad" or "rolling".
+                threshold (float, optional): The threshold of the method (see Outliers.DEFAULT_THRESHOLDS).
+                output (str): "indices" for {column: index labels of its outliers}, "rows" for the labels of the
+                    rows with any outlier, "mask" for a boolean DataFrame, "counts" for the outliers per column.
+                window (int): Number of preceding rows for the "rolling" method.
+                min_periods (int, optional): Fewest preceding values the "rolling" method needs to test a value.
+                    Defaults to `window`.
+                approximate (bool): Estimate the quantiles from sketches. Always used for streaming datasets.
+        """
+        if self.dataset is None:
+            return "Error: No dataset provided"
+        if method not in Outliers.METHODS:
+            return f"Error: Unknown outlier method '{method}'"
+        columns = self._numeric_column_names() if columns is None else list(columns)
+        try:
+            collector = Outliers.OutlierCollector(columns, output)
+            if method == "rolling":
+                test = Outliers.RollingDetector(len(columns), window, threshold, min_periods).update
+            else:
+                bounds = self.outlier_bounds(columns, method, threshold, approximate)
+                if not isinstance(bounds, pd.DataFrame):
+                    return bounds
+                lower, upper = bounds["lower"].to_numpy(), bounds["upper"].to_numpy()
+                test = functools.partial(Outliers.flag, lower=lower, upper=upper)
+            for chunk in self._iter_chunks(columns):
+                collector.add(test(self._numeric_block(chunk, columns)), chunk.index)
+            return collector.result()
+        except KeyError as e:
+            print(f"Error: Column {e} not found")
+        except (ValueError, TypeError) as e:
+            return f"Error: {str(e)}"
+
+    def _column_sketches(self, columns, epsilon, center=None):
+        # One quantile sketch per column from a single pass; with `center`, of the distances |x - center|
+        sketches = [QuantileSketch(epsilon, seed=0) for _ in columns]
+        for chunk in self._iter_chunks(columns):
+            values = self._numeric_block(chunk, columns)
+            if center is not None:
+                values = np.abs(values - center)
+            for sketch, column in zip(sketches, values.T):
+                sketch.merge(QuantileSketch(epsilon, seed=0).update(column))
+        return sketches
+
+    def _iter_chunks(self, columns=None):
+        # Chunks of the dataset, with any derived columns asked for computed alongside
+        return self.derived.iter_chunks(columns)
+
+    def _column(self, column_name):
+        # An in-memory column by name, raw or derived
+        if column_name in self.derived.expressions:
+            return pd.Series(self.derived.values(column_name), index=self.dataset.data.index, name=column_name)
+        return self.dataset.data[column_name]
+
+    def _frame(self, columns=None):
+        # The requested columns as one in-memory frame, reading streaming datasets chunk by chunk
+        chunks = list(self._iter_chunks(None if columns is None else list(columns)))
+        if not chunks:
+            return pd.DataFrame()
+        return chunks[0] if len(chunks) == 1 else pd.concat(chunks, ignore_index=True)
+
+    def _numeric_column_names(self):
+        if self.dataset.data is not None:
+            frame = self.dataset.data
+        else:
+            frame = next(self._iter_chunks(), pd.DataFrame())
+        return [name for name in frame.columns if pd.api.types.is_numeric_dtype(frame[name].dtype)]
+
+    @staticmethod
+    def _numeric_block(frame, columns):
+        for name in columns:
+            if not pd.api.types.is_numeric_dtype(frame[name].dtype):
+                raise TypeError(f"Column '{name}' does not contain numeric data.")
+        return frame[columns].to_numpy(dtype=np.float64)
+
+    @staticmethod
+    def _moment_table(accumulators, moment_stats):
+        table = {}
+        with np.errstate(invalid="ignore", divide="ignore"):
+            for stat in moment_stats:
+                if stat == "count":
+                    table[stat] = [a.count for a in accumulators]
+                elif stat == "mean":
+                    table[stat] = [a.mean if a.count else np.nan for a in accumulators]
+                elif stat == "std_deviation":
+                    table[stat] = [a.standard_deviation for a in accumulators]
+                elif stat == "variance":
+                    table[stat] = [a.variance for a in accumulators]
+                elif stat == "log_sum":
+                    table[stat] = [a.log_sum for a in accumulators]
+                elif stat == "geometric_mean":
+                    table[stat] = [np.exp(a.log_sum / a.count) if a.count else np.nan for a in accumulators]
+        return table
+
+    @staticmethod
+    def _order_table(values, order_stats):
+        counts = (~np.isnan(values)).sum(axis=0)
+        quantiles = []
+        if "median" in order_stats:
+            quantiles.append(0.5)
+        if "quartiles" in order_stats:
+            quantiles.extend([0.25, 0.5, 0.75])
+        positions = {q: q * np.maximum(counts - 1, 0) for q in quantiles}
+
+        if "mode" in order_stats or not (counts == values.shape[0]).all() or values.shape[0] == 0:
+            ordered = np.sort(values, axis=0)
+        else:
+            # No missing values and no mode: a partition around the needed ranks is enough
+            ranks = {0, values.shape[0] - 1}
+            for position in positions.values():
+                ranks.update(np.floor(position).astype(int).tolist())
+                ranks.update(np.ceil(position).astype(int).tolist())
+            ordered = np.partition(values, sorted(ranks), axis=0)
+        if values.shape[0] == 0:
+            ordered = np.full((1, values.shape[1]), np.nan)
+
+        def take(index):
+            index = np.clip(index, 0, max(values.shape[0] - 1, 0)).astype(int)
+            taken = np.take_along_axis(ordered, index[np.newaxis, :], axis=0)[0]
+            return np.where(counts > 0, taken, np.nan)
+
+        def quantile(q):
+            position = positions[q]
+            lower = np.floor(position)
+            fraction = position - lower
+            low, high = take(lower), take(np.ceil(position))
+            return low + (high - low) * fraction
+
+        table = {}
+        for stat in order_stats:
+            if stat == "min":
+                table[stat] = take(np.zeros_like(counts))
+            elif stat == "max":
+                table[stat] = take(counts - 1)
+            elif stat == "median":
+                table[stat] = quantile(0.5)
+            elif stat == "quartiles":
+                table["q25"], table["q50"], table["q75"] = quantile(0.25), quantile(0.5), quantile(0.75)
+            elif stat == "mode":
+                modes = []
+                for i, count in enumerate(counts):
+                    column = ordered[:count, i]
+                    if count == 0:
+                        modes.append(np.nan)
+                        continue
+                    starts = np.concatenate(([0], np.flatnonzero(column[1:] != column[:-1]) + 1))
+                    lengths = np.diff(np.append(starts, count))
+                    modes.append(column[starts[np.argmax(lengths)]])
+                table[stat] = modes
+        return table
+
+
+def _summary_block(moment_stats, order_stats, track_log, values):
+    # Statistics of one block of columns; a module-level function so that worker processes can unpickle it
+    table = {}
+    if moment_stats:
+        table.update(DataAnalyzer._moment_table(column_moments(values, track_log), moment_stats))
+    if order_stats:
+        table.update(DataAnalyzer._order_table(values, order_stats))
+    return table
@@ -1,23 +1,107 @@
+import fnmatch
 import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
 import pandas as pd
-import pytesseract
-from PIL import Image
+
+import ColumnarCache
+import Jobs
+import MemoryOptimizer
+import OcrPipeline
+import Profiler
+from Query import Query
 
 
 class DataSet:
     def __init__(self):
-        self.data = None
+        # Identifies the dataset across processes, so that cached results stay valid when it is pickled
+        self.uid = uuid.uuid4().hex
+        self.version = 0
+        # In-memory data is kept as a list of frames so that appends do not copy the existing rows
+        self._chunks = []
+        self._appended = []
+        self._append_listeners = []
+        # Columnar file holding the rows while they are spilled out of memory (see spill)
+        self._spill_path = None
+        self._spilled_copy = None
         self.metadata = {}
+        self.source_path = None
+        self.chunksize = None
+        self.partitions = None
+        self._columns = []
+
+    @property
+    def data(self):
+        if self._spill_path is not None:
+            self.restore()
+        if len(self._chunks) > 1:
+            # Appended chunks are only concatenated when the whole frame is asked for
+            self._chunks = [pd.concat(self._chunks)]
+        return self._chunks[0] if self._chunks else None
 
-    def load_data_from_csv(self, file_path: str):
+    @data.setter
+    def data(self, value):
+        self._chunks = [] if value is None else [value]
+        self._appended = []
+        self._spill_path = None
+        self.mark_modified()
+
+    def mark_modified(self):
+        """
+            Record that the data has changed, so that results cached for the previous
+            version are no longer used. Call this after modifying `data` in place.
+        """
+        self.version += 1
+
+    def __getstate__(self):
+        # Append listeners belong to objects in this process and are not shipped to worker processes
+        state = self.__dict__.copy()
+        state["_append_listeners"] = []
+        return state
+
+    @Profiler.profiled("load")
+    def load_data_from_csv(self, file_path: str, chunksize: int = None, columns: list = None,
+                           use_cache: bool = False, optimize: bool = False):
         """
         Load data from a CSV file
         Args:
             file_path (str): The path to the CSV file.
+            chunksize (int, optional): If given, keep a lazy handle on the file instead of
+                reading it into memory; the rows are then read back `chunksize` at a time.
+            columns (list of str, optional): Only load these columns.
+            use_cache (bool): Keep a columnar copy of the parsed file next to it and read that
+                back on later loads, as long as the CSV file has not changed. Not with `chunksize`.
+            optimize (bool): Shrink the column types after loading, see `optimize_memory`.
+                Not with `chunksize`.
         """
         try:
-            self.data = pd.read_csv(file_path)
+            if chunksize:
+                if use_cache or optimize:
+                    print("Error: use_cache and optimize need the data in memory and cannot be used with chunksize")
+                    return None
+                columns = pd.read_csv(file_path, nrows=0, usecols=columns).columns.tolist()
+                self.data = None
+                self._reset_stream()
+                self._columns = columns
+                self.source_path = file_path
+                self.chunksize = chunksize
+                self.metadata["source"] = "CSV"
+                self.metadata["streaming"] = True
+                return self.data
+
+            if Jobs.current_job() is not None and not use_cache:
+                # In a background job, read in chunks so that progress can be shown and the load cancelled
+                self.data = _read_csv_with_progress(file_path, columns)
+            else:
+                self.data = self._read(file_path, lambda: pd.read_csv(file_path), columns, use_cache,
+                                       lambda: pd.read_csv(file_path, usecols=columns))
+            self._reset_stream()
             self.metadata["source"] = "CSV"
+            if optimize:
+                self.optimize_memory()
             return self.data
 
         except FileNotFoundError:
@@ -25,42 +109,176 @@ class DataSet:
         except Exception as e:
             print(f"Error loading data from CSV : {str(e)}")
 
-    def load_data_from_excel(self, file_path: str, sheet_name: str):
+    @Profiler.profiled("load")
+    def load_data_from_excel(self, file_path: str, sheet_name: str, columns: list = None,
+                             use_cache: bool = False, optimize: bool = False):
         """
         Load data from an  Excel file
         Args:
             file_path (str): The path to the Excel file.
             sheet_name (str): The name of the sheet to load.
+            columns (list of str, optional): Only load these columns.
+            use_cache (bool): Keep a columnar copy of the parsed sheet next to the workbook and
+                read that back on later loads, as long as the workbook has not changed.
+            optimize (bool): Shrink the column types after loading, see `optimize_memory`.
         """
 
         try:
-            self.data = pd.read_excel(file_path, sheet_name=sheet_name)
+            self.data = self._read(file_path, lambda: pd.read_excel(file_path, sheet_name=sheet_name),
+                                   columns, use_cache,
+                                   lambda: pd.read_excel(file_path, sheet_name=sheet_name, usecols=columns),
+                                   key=f"sheet={sheet_name}")
+            self._reset_stream()
             self.metadata["source"] = "Excel"
+            if optimize:
+                self.optimize_memory()
             return self.data
         except FileNotFoundError:
             print(f"Error: File '{file_path}' not found")
         except Exception as e:
             print(f"Error loading data from Excel : {str(e)} ")
 
-    def load_data_from_png(self, image_path):
+    @Profiler.profiled("load")
+    def load_data_from_png(self, image_path, scale=None, binarize=False, regions=None, use_cache=False,
+                           optimize=False):
         """
            Load data from a PNG image
            Args:
                image_path (str): The path to the PNG image.
+               scale (float, optional): Resize factor applied before OCR, e.g. 0.5.
+               binarize (bool): Convert the image to black and white before OCR.
+               regions (list of tuple, optional): (left, top, right, bottom) boxes to OCR instead
+                   of the whole image.
+               use_cache (bool): Reuse the OCR output of previously seen images.
+               optimize (bool): Shrink the column types after loading, see `optimize_memory`.
         """
         try:
-            image = Image.open(image_path)
-            text_data = pytesseract.image_to_data(image)
-            data = [line.split('\t') for line in text_data.split('\n')]
-            df = pd.DataFrame(data[1:], columns=data[0])
+            df = OcrPipeline.ocr_image(image_path, scale=scale, binarize=binarize, regions=regions,
+                                       cache_dir=OcrPipeline.DEFAULT_CACHE_DIR if use_cache else None)
             self.data = df
+            self._reset_stream()
             self.metadata["source"] = "PNG"
+            if optimize:
+                self.optimize_memory()
             return self.data
         except FileNotFoundError:
             print(f"Error: File '{image_path}' not found")
         except Exception as e:
             print(f"Error loading data from PNG : {str(e)}")
 
+    @Profiler.profiled("load")
+    def load_data_from_pngs(self, image_paths, workers=None, scale=None, binarize=False, regions=None,
+                            use_cache=True, source_column="image", optimize=False):
+        """
+            Load data from many PNG images, running OCR in a process pool.
+            Args:
+                image_paths (list of str): The paths to the PNG images.
+                workers (int, optional): Number of worker processes. Defaults to the CPU count.
+                scale (float, optional): Resize factor applied before OCR, e.g. 0.5.
+                binarize (bool): Convert the images to black and white before OCR.
+                regions (list of tuple, optional): (left, top, right, bottom) boxes to OCR instead
+                    of the whole images.
+                use_cache (bool): Reuse the OCR output of previously seen images.
+                source_column (str, optional): Add a column holding the name of each row's image.
+                optimize (bool): Shrink the column types after loading, see `optimize_memory`.
+        """
+        results = OcrPipeline.ocr_images(image_paths, workers=workers, scale=scale, binarize=binarize,
+                                         regions=regions,
+                                         cache_dir=OcrPipeline.DEFAULT_CACHE_DIR if use_cache else None)
+        return self._combine(results, "PNG", False, source_column, optimize)
+
+    @Profiler.profiled("load")
+    def load_directory(self, directory_path, pattern="*", workers=None, sheet_name=0,
+                       use_processes=False, partitioned=False, source_column=None, optimize=False):
+        """
+            Load every matching CSV, Excel and PNG file of a directory in parallel.
+            The reader is picked from the file extension, and the frames are combined with
+            their columns reconciled: missing columns are filled with NaN, and a column whose
+            type differs between files is widened to a common type.
+            Args:
+                directory_path (str): The path to the directory.
+                pattern (str): Glob pattern the file names must match, e.g. "*.csv".
+                workers (int, optional): Number of parallel readers. Defaults to the CPU count.
+                sheet_name (str or int): The sheet to load from Excel files.
+                use_processes (bool): Read in a process pool instead of a thread pool.
+                partitioned (bool): Keep one partition per file instead of concatenating them;
+                    the dataset is then processed partition by partition like a streamed file.
+                source_column (str, optional): Add a column holding the name of each row's file.
+                optimize (bool): Shrink the column types after loading, see `optimize_memory`.
+            Returns:
+                pd.DataFrame or None: The combined data (None when partitioned). Per-file timings
+                and errors are stored in metadata["load_report"].
+        """
+        files = self.list_files(directory_path)
+        paths = [os.path.join(directory_path, name) for name in sorted(files or [])
+                 if fnmatch.fnmatch(name, pattern) and os.path.splitext(name)[1].lower() in READERS]
+        if not paths:
+            print(f"Error: No matching files in '{directory_path}'")
+            return None
+
+        executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        with executor_class(max_workers=workers or os.cpu_count()) as executor:
+            results = []
+            for result in executor.map(_timed_read, paths, [sheet_name] * len(paths)):
+                results.append(result)
+                Jobs.report(rows=0 if result[1] is None else len(result[1]), done=len(results), total=len(paths))
+        return self._combine(results, "Directory", partitioned, source_column, optimize)
+
+    def _combine(self, results, source, partitioned, source_column, optimize=False):
+        report = []
+        frames = []
+        for path, frame, seconds, error in results:
+            report.append({"file": path, "rows": 0 if frame is None else len(frame),
+                           "seconds": seconds, "error": error})
+            if frame is not None:
+                if source_column:
+                    frame[source_column] = os.path.basename(path)
+                frames.append(frame)
+
+        frames = reconcile_schemas(frames)
+        if partitioned:
+            self.data = None
+            self._reset_stream()
+            self.partitions = frames
+            self._columns = frames[0].columns.tolist() if frames else []
+            self.metadata["streaming"] = True
+        else:
+            self.data = pd.concat(frames, ignore_index=True) if frames else None
+            self._reset_stream()
+        self.metadata["source"] = source
+        self.metadata["load_report"] = report
+        if optimize:
+            self.optimize_memory()
+        return self.data
+
+    @Profiler.profiled("types")
+    def optimize_memory(self, categorical_threshold=0.5):
+        """
+            Shrink the column types of the loaded data: numeric text becomes numeric, numbers are
+            downcast to the smallest type that holds them exactly, and text columns with few
+            distinct values become categoricals. The memory footprint before and after is stored
+            in metadata["memory_before"] and metadata["memory_after"] (bytes).
+            Args:
+                categorical_threshold (float): Largest ratio of distinct values to rows for a text
+                    column to become categorical.
+        """
+        if self.partitions is not None:
+            before = sum(MemoryOptimizer.memory_usage(partition) for partition in self.partitions)
+            self.partitions = [MemoryOptimizer.optimize_dtypes(partition, categorical_threshold)
+                               for partition in self.partitions]
+            after = sum(MemoryOptimizer.memory_usage(partition) for partition in self.partitions)
+            self.mark_modified()
+        elif self.data is not None:
+            before = MemoryOptimizer.memory_usage(self.data)
+            self.data = MemoryOptimizer.optimize_dtypes(self.data, categorical_threshold)
+            after = MemoryOptimizer.memory_usage(self.data)
+        else:
+            print("Error: No data loaded")
+            return None
+        self.metadata["memory_before"] = before
+        self.metadata["memory_after"] = after
+        return self.data
+
     @staticmethod
     def list_files(directory_path):
         """
@@ -78,7 +296,261 @@ class DataSet:
             print(f"Error listing files: {str(e)}")
 
     def get_column_names(self):
-        if self.data is not None:
-            return self.data.columns.tolist()
+        if self._chunks:
+            return self._chunks[0].columns.tolist()
+        elif self.is_streaming() or self._spill_path is not None:
+            return list(self._columns)
         else:
             return []
+
+    def is_streaming(self):
+        return not self._chunks and (self.chunksize is not None or self.partitions is not None)
+
+    def num_rows(self):
+        if self._spill_path is not None:
+            return ColumnarCache.read_num_rows(self._spill_path)
+        if self.is_streaming():
+            return sum(len(chunk) for chunk in self.iter_chunks(self.get_column_names()[:1]))
+        return sum(len(chunk) for chunk in self._chunks)
+
+    @Profiler.profiled("load")
+    def append(self, new_data, **read_options):
+        """
+            Add rows to the dataset without copying the rows already loaded.
+            The new rows are kept as a separate chunk, and analyzers that track statistics of this
+            dataset (see DataAnalyzer.track) update them from the new rows only.
+            Args:
+                new_data (pd.DataFrame or str): The new rows, or the path of a CSV/Excel/PNG file holding them.
+                **read_options: Passed on to the file reader, e.g. sheet_name for Excel files.
+        """
+        try:
+            if self._spill_path is not None:
+                self.restore()
+            if isinstance(new_data, str):
+                extension = os.path.splitext(new_data)[1].lower()
+                new_data = READERS[extension](new_data, read_options.get("sheet_name", 0))
+            if not self._chunks and not self.is_streaming():
+                self.data = new_data
+                self.metadata["source"] = "Append"
+                self._notify_append(new_data)
+                return new_data
+
+            columns = self.get_column_names()
+            extra = [name for name in new_data.columns if name not in columns]
+            if extra:
+                print(f"Warning: Ignoring columns not in the dataset: {extra}")
+            new_data = new_data.reindex(columns=columns)
+            if self.is_streaming():
+                self._appended.append(new_data)
+            else:
+                start = sum(len(chunk) for chunk in self._chunks)
+                new_data.index = pd.RangeIndex(start, start + len(new_data))
+                self._chunks.append(new_data)
+            self.mark_modified()
+            self._notify_append(new_data)
+            return new_data
+        except FileNotFoundError:
+            print(f"Error: File '{new_data}' not found")
+        except KeyError:
+            print(f"Error: Unsupported file type '{new_data}'")
+        except Exception as e:
+            print(f"Error appending data: {str(e)}")
+
+    def add_append_listener(self, listener):
+        """
+            Register a callable that receives every appended chunk of rows.
+            Args:
+                listener (callable): Called as listener(new_rows) after each append.
+        """
+        if listener not in self._append_listeners:
+            self._append_listeners.append(listener)
+
+    def _notify_append(self, new_rows):
+        for listener in self._append_listeners:
+            listener(new_rows)
+
+    def memory_usage(self):
+        """
+            Return the bytes held in memory by the rows of the dataset (0 while it is spilled).
+        """
+        frames = self._chunks + self._appended + (self.partitions or [])
+        return sum(MemoryOptimizer.memory_usage(frame) for frame in frames)
+
+    def spill(self, path):
+        """
+            Move the in-memory rows to a columnar file and release them. They are read back
+            transparently on the next access, with the same version, so statistics cached for the
+            dataset stay valid. Streaming and partitioned datasets are not spilled.
+            Args:
+                path (str): The file to write; an existing file is reused when it already holds
+                    this version of the data.
+            Returns:
+                bool: Whether the rows were spilled.
+        """
+        if not self._chunks or not ColumnarCache.is_available():
+            return False
+        # Spilling again without changes since the last spill reuses the file written then
+        if self._spilled_copy != (path, self.version) or not os.path.exists(path):
+            ColumnarCache.write_frame(path, self.data)
+        self._columns = self.get_column_names()
+        self._spilled_copy = (path, self.version)
+        self._spill_path = path
+        self._chunks = []
+        return True
+
+    def restore(self):
+        """
+            Read spilled rows back into memory. Does nothing when the dataset is not spilled.
+        """
+        if self._spill_path is None:
+            return
+        with Profiler.span("DataSet.restore", "load"):
+            self._chunks = [ColumnarCache.read_frame(self._spill_path)]
+        self._spill_path = None
+        self._columns = []
+
+    def is_spilled(self):
+        return self._spill_path is not None
+
+    def query(self):
+        """
+            Start a lazy query over this dataset (see Query): only the columns the query needs are
+            read and filters run chunk by chunk, when a result is asked for.
+        """
+        return Query(self)
+
+    @staticmethod
+    def scan(file_path, sheet_name=0, chunksize=100_000, use_cache=False):
+        """
+            Start a lazy query over a CSV or Excel file without loading it. Column projection and row
+            filters are pushed down into the CSV reader (or the columnar cache with `use_cache`).
+            Args:
+                file_path (str): The path of the CSV or Excel file.
+                sheet_name (str or int): The sheet to read from an Excel file.
+                chunksize (int): Number of CSV rows read at a time.
+                use_cache (bool): Read the file through its columnar cache.
+        """
+        return Query(file_path=file_path, sheet_name=sheet_name, chunksize=chunksize, use_cache=use_cache)
+
+    def iter_chunks(self, columns=None):
+        """
+            Iterate over the dataset as a sequence of DataFrames.
+            In streaming mode the source file is re-read `chunksize` rows at a time, so
+            memory use depends on the chunk size and not on the size of the file.
+            Args:
+                columns (list of str, optional): Only read these columns.
+        """
+        if columns is not None:
+            missing = [column for column in columns if column not in self.get_column_names()]
+            if missing:
+                raise KeyError(missing[0])
+
+        if self.partitions is not None:
+            start = 0
+            for index, partition in enumerate(self.partitions):
+                Profiler.add(rows=len(partition))
+                Jobs.report(rows=len(partition), chunks=1, done=index + 1, total=len(self.partitions))
+                chunk = partition if columns is None else partition[columns]
+                # Each file numbers its rows from 0; like the chunks of a streamed file, rows are
+                # labelled by their position in the whole dataset (as in a non-partitioned load)
+                yield chunk.set_axis(pd.RangeIndex(start, start + len(chunk)))
+                start += len(chunk)
+        elif self.is_streaming():
+            yield from _read_csv_chunks(self.source_path, self.chunksize,
+                                        self._columns if columns is None else columns)
+        elif self._spill_path is not None:
+            self.restore()
+        for chunk in self._chunks or self._appended:
+            Profiler.add(rows=len(chunk))
+            Jobs.report(rows=len(chunk), chunks=1)
+            yield chunk if columns is None else chunk[columns]
+
+    def _read(self, file_path, reader, columns, use_cache, projected_reader, key=""):
+        if use_cache and ColumnarCache.is_available():
+            if not os.path.exists(file_path):
+                raise FileNotFoundError(file_path)
+            with Profiler.span("DataSet.parse", "parse", cached=True) as span:
+                frame, hit = ColumnarCache.cached_read(file_path, reader, key=key, columns=columns)
+                if span is not None:
+                    span.attributes["cache"] = "hit" if hit else "miss"
+            self.metadata["cache"] = "hit" if hit else "miss"
+            return frame
+
+        if use_cache:
+            print("Warning: pyarrow is not installed, loading without the columnar cache")
+        self.metadata.pop("cache", None)
+        with Profiler.span("DataSet.parse", "parse"):
+            return projected_reader() if columns is not None else reader()
+
+    def _reset_stream(self):
+        self.source_path = None
+        self.chunksize = None
+        self.partitions = None
+        self._columns = []
+        self._appended = []
+        self.metadata.pop("streaming", None)
+
+
+READERS = {
+    ".csv": lambda path, sheet_name: pd.read_csv(path),
+    ".xlsx": lambda path, sheet_name: pd.read_excel(path, sheet_name=sheet_name),
+    ".xls": lambda path, sheet_name: pd.read_excel(path, sheet_name=sheet_name),
+    ".png": lambda path, sheet_name: OcrPipeline.ocr_image(path),
+}
+
+
+def _read_csv_chunks(file_path, chunksize, columns=None):
+    # Reading through an open handle lets the byte position serve as progress for an ETA
+    with open(file_path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        position = 0
+        for chunk in pd.read_csv(file, chunksize=chunksize, usecols=columns):
+            Profiler.add(rows=len(chunk), bytes=file.tell() - position)
+            position = file.tell()
+            Jobs.report(rows=len(chunk), chunks=1, done=position, total=size)
+            yield chunk
+
+
+def _read_csv_with_progress(file_path, columns=None, chunksize=100_000):
+    chunks = list(_read_csv_chunks(file_path, chunksize, columns))
+    return pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+
+
+def _timed_read(path, sheet_name):
+    start = time.perf_counter()
+    try:
+        frame = READERS[os.path.splitext(path)[1].lower()](path, sheet_name)
+        return path, frame, time.perf_counter() - start, None
+    except Exception as e:
+        return path, None, time.perf_counter() - start, f"{type(e).__name__}: {str(e)}"
+
+
+def reconcile_schemas(frames):
+    """
+        Give a list of frames the same columns in the same order and with the same types.
+        Missing columns are added as NaN; numeric columns with different types are widened to a
+        common numeric type, and columns mixing numeric and non-numeric types become objects.
+        Args:
+            frames (list of pd.DataFrame): The frames to reconcile.
+    """
+    columns = []
+    dtypes = {}
+    for frame in frames:
+        for name in frame.columns:
+            if name not in dtypes:
+                columns.append(name)
+                dtypes[name] = []
+            dtypes[name].append(frame[name].dtype)
+
+    targets = {}
+    for name, types in dtypes.items():
+        missing = len(types) < len(frames)
+        if all(isinstance(t, np.dtype) and np.issubdtype(t, np.number) for t in types):
+            # Files without the column contribute NaN, which needs a float type
+            targets[name] = np.result_type(*types, *([np.float64] if missing else []))
+        elif len(set(map(str, types))) == 1 and not (missing and types[0] == np.bool_):
+            targets[name] = types[0]
+        else:
+            targets[name] = object
+
+    return [frame.reindex(columns=columns).astype(targets) for frame in frames]
@@ -1,11 +1,27 @@
 import matplotlib.pyplot as plt
+from matplotlib.colors import LogNorm
+import numpy as np
+import pandas as pd
 import seaborn as sns
 
+import Binning
+import Profiler
+import Rendering
+import TimeSeries
+from DataAnalyzer import DataAnalyzer
+
 
 class Visualization:
-    def __init__(self, dataset):
+    def __init__(self, dataset, analyzer=None):
         self.dataset = dataset
+        # Group aggregates are computed (and cached) by the analyzer, the plots only draw them
+        self.analyzer = analyzer if analyzer is not None else DataAnalyzer(dataset)
+        # Above this many rows, scatter and line plots are drawn from aggregates instead of raw points
+        self.large_data_threshold = 100_000
+        # When set, figures are written to this path or file object (or a list of them) instead of being shown
+        self.output_path = None
 
+    @Profiler.profiled("plot")
     def plot_histogram(self, column_name):
         """
             Create a histogram plot for a specified column in the dataset
@@ -14,17 +30,29 @@ class Visualization:
         """
         if self.dataset is not None:
             try:
-                data = self.dataset.data[column_name]
-                plt.hist(data, bins=20, edgecolor='k')
+                bins = self.analyzer.histogram(column_name)
+                if bins is None:
+                    raise KeyError(column_name)
+                if isinstance(bins, str):
+                    # Text columns: one bar per value, for the 20 most frequent values
+                    counts = self._value_counts(column_name).head(20)
+                    plt.bar(counts.index.astype(str), counts.to_numpy(), edgecolor='k')
+                    plt.xticks(rotation=45)
+                else:
+                    counts, edges = bins.coarsened(20)
+                    plt.bar(edges[:-1], counts, width=np.diff(edges), align="edge", edgecolor='k')
                 plt.xlabel(column_name)
                 plt.ylabel("Frequency")
                 plt.title(f"Histogram of {column_name}")
-                plt.show()
+                self._show()
             except KeyError:
                 print(f"Error: Column '{column_name}' not found ")
+            except Exception as e:
+                print(f"Error creating histogram: {str(e)}")
         else:
             print("Error: No dataset provided")
 
+    @Profiler.profiled("plot")
     def scatter_plot(self, x_column, y_column):
         """
             Create a scatter plot for two columns in the dataset
@@ -35,16 +63,24 @@ class Visualization:
 
         if self.dataset is not None:
             try:
-                plt.scatter(self.dataset.data[x_column], self.dataset.data[y_column])
+                x, y = self.dataset.data[x_column], self.dataset.data[y_column]
+                if len(x) > self.large_data_threshold:
+                    self._density_image(x, y)
+                else:
+                    plt.scatter(x, y)
                 plt.xlabel(x_column)
                 plt.ylabel(y_column)
                 plt.title(f'Scatter Plot: {x_column} vs. {y_column}')
-                plt.show()
+                self._show()
             except KeyError:
                 print(f"Error: One or both columns not found")
+            except (ValueError, TypeError) as e:
+                # E.g. a text column that is not dates in the large-data raster
+                print(f"Error creating scatter plot: {str(e)}")
         else:
             print("Error: No dataset provided")
 
+    @Profiler.profiled("plot")
     def line_plot(self, x_column, y_column):
         """
             Create a line plot for two columns in the dataset
@@ -55,16 +91,19 @@ class Visualization:
         """
         if self.dataset is not None:
             try:
-                plt.plot(self.dataset.data[x_column], self.dataset.data[y_column])
+                self._line(self.dataset.data[x_column], self.dataset.data[y_column])
                 plt.xlabel(x_column)
                 plt.ylabel(y_column)
                 plt.title(f"Line Plot : {y_column} over {x_column}")
-                plt.show()
+                self._show()
             except KeyError:
                 print(f"Error: One or both columns not found")
+            except (ValueError, TypeError) as e:
+                print(f"Error creating line plot: {str(e)}")
         else:
             print("Error: No dataset provided")
 
+    @Profiler.profiled("plot")
     def bar_chart(self, x_column, y_column):
         """
             Create a bar chart for two columns in the dataset.
@@ -75,17 +114,23 @@ class Visualization:
 
         if self.dataset is not None:
             try:
-                sns.barplot(x=self.dataset.data[x_column], y=self.dataset.data[y_column])
+                summary = self._group_stats(x_column, y_column, ["mean", "ci"])
+                positions = np.arange(len(summary))
+                plt.bar(positions, summary["mean"], yerr=summary["ci"], capsize=3)
+                plt.xticks(positions, summary.index.astype(str))
                 plt.xlabel(x_column)
                 plt.ylabel(y_column)
                 plt.title(f'Bar Chart: {y_column} by {x_column}')
                 plt.xticks(rotation=45)
-                plt.show()
+                self._show()
             except KeyError:
                 print(f"Error: One or both columns not found")
+            except Exception as e:
+                print(f"Error creating bar chart: {str(e)}")
         else:
             print("Error: No dataset provided")
 
+    @Profiler.profiled("plot")
     def pie_chart(self, column_name):
         """
             Create a pie chart to visualize the distribution of categories in a column.
@@ -98,28 +143,35 @@ class Visualization:
                 plt.pie(counts, labels=counts.index, autopct="%1.1f%%", startangle=140)
                 plt.axis("equal")
                 plt.title(f"Pie Chart: {column_name} Distribution")
-                plt.show()
+                self._show()
             except KeyError:
                 print(f"Error: One or both columns not found")
         else:
             print("Error: No dataset provided")
 
+    @Profiler.profiled("plot")
     def heatmap(self):
         """
             Create a heatmap to visualize the correlation matrix of numeric data.
             Heatmaps are useful for identifying patterns in data.
+            Non-numeric columns are left out; cells are only annotated for small matrices.
         """
         if self.dataset is not None and self.dataset.data is not None:
             try:
-                correlation_matrix = self.dataset.data.corr()
-                sns.heatmap(correlation_matrix, annot=True, cmap="cool-warm", linewidths=0.5)
+                # From the analyzer, so the matrix is shared with calculate_correlation_matrix through its cache
+                correlation_matrix = self.analyzer.calculate_correlation_matrix()
+                if isinstance(correlation_matrix, str):
+                    raise ValueError(correlation_matrix)
+                small = len(correlation_matrix) <= 20
+                sns.heatmap(correlation_matrix, annot=small, cmap="coolwarm", linewidths=0.5 if small else 0)
                 plt.title("Correlation Heatmap")
-                plt.show()
+                self._show()
             except Exception as e:
                 print(f"Error creating heatmap: {str(e)}")
         else:
             print("Error: No dataset provided.")
 
+    @Profiler.profiled("plot")
     def pair_plot(self, columns):
         """
             Create pair plots (scatter matrix) for multiple numeric columns to visualize pairwise
@@ -129,14 +181,17 @@ class Visualization:
         """
         if self.dataset is not None and self.dataset.data is not None:
             try:
-                sns.palplot(self.dataset.data[columns])
-                plt.title('Pair Plot')
-                plt.show()
+                grid = sns.pairplot(self.dataset.data[columns])
+                grid.figure.suptitle('Pair Plot', y=1.02)
+                self._show()
+            except KeyError:
+                print("Error: One or more columns not found")
             except Exception as e:
-                print(f"Error creating heatmap: {str(e)}")
+                print(f"Error creating pair plot: {str(e)}")
         else:
             print("Error: No dataset provided.")
 
+    @Profiler.profiled("plot")
     def violin_plot(self, x_column, y_column):
         """
             Create a violin plot to visualize the distribution of data similar to box plots
@@ -147,12 +202,30 @@ class Visualization:
         """
         if self.dataset is not None and self.dataset.data is not None:
             try:
-                sns.violinplot(x=self.dataset.data[x_column], y=self.dataset.data[y_column])
+                summary = self._group_stats(x_column, y_column, ["count", "mean", "median", "min", "max",
+                                                                  "std_deviation"])
+                # Groups with no values have no density to draw (and no histogram row)
+                summary = summary[summary["count"] > 0]
+                if summary.empty:
+                    print(f"Error: Column '{y_column}' has no values to plot")
+                    return
+                edges, counts = self.analyzer.group_histograms(x_column, y_column)
+                vpstats = []
+                for group, row in summary.iterrows():
+                    # Scott's rule bandwidth, applied to the binned counts
+                    bandwidth = 1.06 * row["std_deviation"] * max(row["count"], 1) ** -0.2
+                    coords, density = Binning.binned_kde(counts.loc[group].to_numpy(), edges, bandwidth)
+                    vpstats.append({"coords": coords, "vals": density,
+                                    "mean": row["mean"], "median": row["median"],
+                                    "min": row["min"], "max": row["max"]})
+                positions = np.arange(len(vpstats))
+                plt.gca().violin(vpstats, positions=positions, showmedians=True)
+                plt.xticks(positions, summary.index.astype(str))
                 plt.xlabel(x_column)
                 plt.ylabel(y_column)
                 plt.title(f"Violin Plot: {y_column} by {x_column}")
                 plt.xticks(rotation=45)
-                plt.show()
+                self._show()
             except KeyError:
                 print(f"Error: One or both columns not found")
             except Exception as e:
@@ -160,6 +233,7 @@ class Visualization:
         else:
             print("Error: No dataset provided")
 
+    @Profiler.profiled("plot")
     def density_plot(self, column_name):
         """
             Create a density plot (kernel density estimate) to visualize the probability density function
@@ -169,10 +243,13 @@ class Visualization:
         """
         if self.dataset is not None and self.dataset.data is not None:
             try:
-                sns.kdeplot(self.dataset.data[column_name], shade=True)
+                grid, density = self._histogram(column_name).kde()
+                plt.fill_between(grid, density, alpha=0.25)
+                plt.plot(grid, density)
+                plt.ylabel("Density")
                 plt.xlabel(column_name)
                 plt.title(f"Density Plot: {column_name}")
-                plt.show()
+                self._show()
             except KeyError:
                 print(f"Error: One or both columns not found")
             except Exception as e:
@@ -180,6 +257,7 @@ class Visualization:
         else:
             print("Error: No dataset provided")
 
+    @Profiler.profiled("plot")
     def bar_plot(self, x_column, y_column, hue_column=None, stacked=False):
         """
             Create a bar plot to compare categories across multiple subgroups.
@@ -192,16 +270,20 @@ class Visualization:
         if self.dataset is not None and self.dataset.data is not None:
             try:
                 if hue_column:
-                    sns.barplot(data=self.dataset.data, x=x_column, y=y_column, hue=hue_column)
+                    summary = self._group_stats([x_column, hue_column], y_column, ["mean", "ci"])
+                    means, errors = summary["mean"].unstack(), summary["ci"].unstack()
                 else:
-                    sns.barplot(data=self.dataset.data, x=x_column, y=y_column)
+                    summary = self._group_stats(x_column, y_column, ["mean", "ci"])
+                    means, errors = summary[["mean"]], summary[["ci"]].rename(columns={"ci": "mean"})
+                means.plot(kind="bar", yerr=None if stacked else errors, stacked=stacked,
+                           legend=bool(hue_column), ax=plt.gca(), capsize=3)
                 plt.xlabel(x_column)
                 plt.ylabel(y_column)
                 plt.title(f"Bar Plot: {y_column} by {x_column}")
                 if stacked:
                     plt.legend(title=hue_column)
                 plt.xticks(rotation=45)
-                plt.show()
+                self._show()
             except KeyError:
                 print(f"Error: One or both columns not found")
             except Exception as e:
@@ -209,29 +291,56 @@ class Visualization:
         else:
             print("Error: No dataset provided")
 
-    def time_series_plot(self, x_column, y_column):
+    @Profiler.profiled("plot")
+    def time_series_plot(self, x_column, y_column, interval=None, outliers=None):
         """
             Visualize time series data with specific attention to trends, seasonality, and anomalies.
+            A series with more rows than the figure has pixel columns (or a streamed one) is drawn from
+            the analyzer's resampled aggregates: the mean of each interval as a line and its min-max range
+            as a band, so that spikes stay visible.
             Args:
                 x_column (str): The name of the x-axis column (usually time or date).
                 y_column (str): The name of the y-axis column (numeric).
+                interval (str or number, optional): Resample to this interval (e.g. "1h") instead of one
+                    interval per pixel column.
+                outliers (str, optional): Mark the values the analyzer flags with this method
+                    ("iqr", "zscore", "mad" or "rolling", see DataAnalyzer.detect_outliers).
         """
-        if self.dataset is not None and self.dataset.data is not None:
+        if self.dataset is not None and (self.dataset.is_streaming() or self.dataset.data is not None):
             try:
-                plt.plot(self.dataset.data[x_column], self.dataset.data[y_column])
+                width, _ = self._pixel_size()
+                if interval is not None or self.dataset.is_streaming() or len(self.dataset.data) > 2 * width:
+                    table = self.analyzer.resample(x_column, y_column, interval=interval,
+                                                   buckets=None if interval is not None else width,
+                                                   stats=("mean", "min", "max"))
+                    if table is None:
+                        raise KeyError(x_column)
+                    if isinstance(table, str):
+                        raise ValueError(table)
+                    plt.fill_between(table.index, table["min"], table["max"], alpha=0.3, label="min-max")
+                    plt.plot(table.index, table["mean"], label="mean")
+                    resampled = True
+                else:
+                    self._line(self.dataset.data[x_column], self.dataset.data[y_column])
+                    resampled = False
+                if outliers is not None:
+                    self._mark_outliers(x_column, y_column, outliers, resampled)
+                if resampled or outliers is not None:
+                    plt.legend()
                 plt.xlabel(x_column)
                 plt.ylabel(y_column)
                 plt.title(f"Time Series Plot: {y_column} over {x_column}")
                 plt.xticks(rotation=45)
-                plt.show()
+                self._show()
 
             except KeyError:
                 print(f"Error: One or both columns not found")
             except Exception as e:
-                print(f"Error creating violin plot: {str(e)}")
+                print(f"Error creating time series plot: {str(e)}")
         else:
             print("Error: No dataset provided")
 
+    @Profiler.profiled("plot")
     def scatter_3d_plot(self, x_column, y_column, z_column):
         """
             Create a 3D scatter plot for three-dimensional data visualization.
@@ -244,11 +353,19 @@ class Visualization:
             try:
                 fig = plt.figure()
                 ax = fig.add_subplot(111, projection='3d')
-                ax.scatter(self.dataset.data[x_column], self.dataset.data[y_column], self.dataset.data[z_column])
+                x, y, z = self.dataset.data[x_column], self.dataset.data[y_column], self.dataset.data[z_column]
+                if len(x) > self.large_data_threshold:
+                    # One marker per occupied voxel, coloured by the number of points in it
+                    x, y, z, counts = Rendering.voxel_counts(x, y, z)
+                    points = ax.scatter(x, y, z, c=np.log1p(counts), cmap="viridis", s=4)
+                    fig.colorbar(points, ax=ax, label="log(1 + count)")
+                else:
+                    ax.scatter(x, y, z)
                 ax.set_xlabel(x_column)
                 ax.set_ylabel(y_column)
                 ax.set_zlabel(z_column)
                 plt.title(f'3D Scatter Plot: {x_column} vs. {y_column} vs. {z_column}')
+                self._show()
             except KeyError:
                 print(f"Error: One or both columns not found")
             except Exception as e:
@@ -256,6 +373,7 @@ class Visualization:
         else:
             print("Error: No dataset provided")
 
+    @Profiler.profiled("plot")
     def pairwise_scatter_matrix(self, columns):
         """
             Create a grid of scatter plots for pairwise relationships between columns.
@@ -264,9 +382,9 @@ class Visualization:
         """
         if self.dataset is not None and self.dataset.data is not None:
             try:
-                sns.palplot(self.dataset.data[columns])
-                plt.title("Pairwise Scatter Matrix")
-                plt.show()
+                pd.plotting.scatter_matrix(self.dataset.data[columns], figsize=(8, 8))
+                plt.suptitle("Pairwise Scatter Matrix")
+                self._show()
             except KeyError:
                 print("Error: One or more columns not found")
             except Exception as e:
@@ -274,6 +392,7 @@ class Visualization:
         else:
             print(f"Error: No dataset provided")
 
+    @Profiler.profiled("plot")
     def boxen_plot(self, x_column, y_column):
         """
             Create a boxen plot to visualize the distribution of data.
@@ -283,14 +402,111 @@ class Visualization:
         """
         if self.dataset is not None and self.dataset.data is not None:
             try:
-                sns.boxenplot(x=self.dataset.data[x_column], y=self.dataset.data[y_column])
+                counts = self._group_stats(x_column, y_column, ["count"])["count"]
+                # Letter values: nested boxes at the 1/4, 1/8, 1/16, ... tails of each group
+                depth = int(max(1, min(6, np.log2(max(counts.min(), 2)) - 3)))
+                tails = [0.5 ** (level + 1) for level in range(1, depth + 1)]
+                stats = [f"q{100 * tail:g}" for tail in tails] + [f"q{100 * (1 - tail):g}" for tail in tails]
+                summary = self._group_stats(x_column, y_column, stats + ["median"])
+                positions = np.arange(len(summary))
+                axes = plt.gca()
+                for level, tail in reversed(list(enumerate(tails))):
+                    lower = summary[f"q{100 * tail:g}"]
+                    upper = summary[f"q{100 * (1 - tail):g}"]
+                    axes.bar(positions, upper - lower, bottom=lower, width=0.8 * (1 - level / (depth + 1)),
+                             color=plt.cm.Blues(0.9 - 0.6 * level / depth), edgecolor="k", linewidth=0.5)
+                axes.hlines(summary["median"], positions - 0.4, positions + 0.4, colors="k")
+                plt.xticks(positions, summary.index.astype(str))
                 plt.xlabel(x_column)
                 plt.ylabel(y_column)
                 plt.title(f"Boxen Plot: {y_column} by {x_column}")
-                plt.show()
+                self._show()
             except KeyError:
                 print("Error: One or more columns not found")
             except Exception as e:
                 print(f"Error creating pairwise scatter matrix: {str(e)}")
         else:
             print(f"Error: No dataset provided")
+
+    def _show(self):
+        if self.output_path is None:
+            plt.show()
+            return
+        # A single path or file object (e.g. io.BytesIO for PNG bytes), or a list of them
+        single = isinstance(self.output_path, str) or hasattr(self.output_path, "write")
+        paths = [self.output_path] if single else self.output_path
+        # Timed separately so that drawing and file encoding show up apart from the computation
+        with Profiler.span("Visualization.render", "render"):
+            for path in paths:
+                plt.savefig(path, bbox_inches="tight")
+        plt.close("all")
+
+    def _mark_outliers(self, x_column, y_column, method, resampled):
+        # Only the flagged rows are read back, by their index labels
+        rows = self.analyzer.detect_outliers([y_column], method=method, output="rows")
+        if rows is None:
+            raise KeyError(y_column)
+        if isinstance(rows, str):
+            raise ValueError(rows)
+        if self.dataset.is_streaming():
+            chunks = [chunk[chunk.index.isin(rows)] for chunk in self.dataset.iter_chunks([x_column, y_column])]
+            points = pd.concat(chunks) if chunks else pd.DataFrame(columns=[x_column, y_column])
+        else:
+            points = self.dataset.data.loc[rows, [x_column, y_column]]
+        x = points[x_column]
+        if resampled:
+            # On the time axis of the resampled aggregates
+            times, is_datetime, _ = TimeSeries.time_values(x)
+            x = pd.to_datetime(times, unit="ns") if is_datetime else times
+        plt.scatter(x, points[y_column], color="red", s=12, zorder=3, label=f"outliers ({method})")
+
+    def _pixel_size(self):
+        figure = plt.gcf()
+        width, height = figure.get_size_inches() * figure.dpi
+        return int(width), int(height)
+
+    def _density_image(self, x, y):
+        # Draw a point cloud as a fixed-resolution count raster
+        width, height = self._pixel_size()
+        counts, extent = Rendering.density_raster(x, y, width, height)
+        image = plt.imshow(np.ma.masked_equal(counts, 0), origin="lower", extent=extent, aspect="auto",
+                           cmap="viridis", norm=LogNorm(), interpolation="nearest")
+        plt.colorbar(image, label="Points")
+
+    def _line(self, x, y, method="minmax"):
+        # Draw a line, keeping only the rows that are visible at the figure's pixel width
+        if len(x) > self.large_data_threshold:
+            width, _ = self._pixel_size()
+            if method == "lttb":
+                rows = Rendering.lttb_indices(x, y, 2 * width)
+            else:
+                rows = Rendering.minmax_indices(x, y, width)
+            x, y = x.iloc[rows], y.iloc[rows]
+        plt.plot(x, y)
+
+    def _value_counts(self, column_name):
+        # Counts of every value of a column, summed chunk by chunk for streamed datasets
+        counts = None
+        for chunk in self.dataset.iter_chunks([column_name]):
+            chunk_counts = chunk[column_name].value_counts()
+            counts = chunk_counts if counts is None else counts.add(chunk_counts, fill_value=0)
+        if counts is None:
+            return pd.Series(dtype=np.int64)
+        return counts.sort_values(ascending=False, kind="stable")
+
+    def _histogram(self, column_name):
+        bins = self.analyzer.histogram(column_name)
+        if bins is None:
+            raise KeyError(column_name)
+        if isinstance(bins, str):
+            raise ValueError(bins)
+        return bins
+
+    def _group_stats(self, by, value, stats):
+        summary = self.analyzer.group_stats(by, value, stats)
+        if summary is None:
+            raise KeyError(value)
+        if isinstance(summary, str):
+            raise ValueError(summary)
+        return summary
+
@@ -0,0 +1,212 @@
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+_local = threading.local()
+
+
+class JobCancelled(BaseException):
+    """
+        Raised inside a job when it has been cancelled. It derives from BaseException so that the
+        `except Exception` handlers of the loaders do not swallow it.
+    """
+
+
+class Job:
+    """
+        A load, statistic or plot running in the background, with its progress and result.
+    """
+
+    def __init__(self, job_id, description, then=None):
+        self.id = job_id
+        self.description = description
+        self.then = then
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.rows = 0
+        self.chunks = 0
+        self.done = None
+        self.total = None
+        self.started = None
+        self.finished = None
+        self.future = None
+        self._cancelled = threading.Event()
+
+    def progress(self, rows=0, chunks=0, done=None, total=None):
+        """
+            Record progress; called from inside the job, where it also checks for cancellation.
+            Args:
+                rows (int): Rows processed since the last call.
+                chunks (int): Chunks processed since the last call.
+                done (float, optional): Work done so far, in any unit (bytes, files, ...).
+                total (float, optional): Total work, in the same unit as `done`.
+        """
+        self.rows += rows
+        self.chunks += chunks
+        if done is not None:
+            self.done, self.total = done, total
+        if self._cancelled.is_set():
+            raise JobCancelled()
+
+    def cancel(self):
+        """
+            Cancel the job: a queued job never starts, a running one stops at its next chunk or file.
+        """
+        self._cancelled.set()
+        if self.future is not None and self.future.cancel():
+            self.status = "cancelled"
+            self.finished = time.perf_counter()
+
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.perf_counter()) - self.started
+
+    def fraction(self):
+        if self.status == "done":
+            return 1.0
+        if self.done is None or not self.total:
+            return None
+        return min(self.done / self.total, 1.0)
+
+    def eta(self):
+        fraction = self.fraction()
+        if self.status != "running" or not fraction:
+            return None
+        return self.elapsed() * (1 - fraction) / fraction
+
+    def describe(self):
+        parts = [self.status]
+        if self.rows:
+            parts.append(f"{self.rows:,} rows")
+        if self.chunks:
+            parts.append(f"{self.chunks} chunks")
+        fraction = self.fraction()
+        if fraction is not None and self.status == "running":
+            parts.append(f"{fraction:.0%}")
+        eta = self.eta()
+        if eta is not None:
+            parts.append(f"ETA {eta:.1f}s")
+        if self.started is not None:
+            parts.append(f"{self.elapsed():.1f}s")
+        return f"#{self.id} {self.description}: {', '.join(parts)}"
+
+
+def current_job():
+    """
+        Return the job running on this thread, or None outside of a job.
+    """
+    return getattr(_local, "job", None)
+
+
+def report(rows=0, chunks=0, done=None, total=None):
+    """
+        Report progress to the job running on this thread, if any, and stop it if it was cancelled.
+        Loaders and chunk iterators call this; it does nothing outside of a job.
+    """
+    job = getattr(_local, "job", None)
+    if job is not None:
+        job.progress(rows, chunks, done, total)
+
+
+class JobManager:
+    """
+        Runs jobs on a thread pool and keeps track of them. With one worker (the default) jobs run
+        in the order they were submitted, so a statistic queued after a load sees the loaded data.
+    """
+
+    def __init__(self, workers=1, on_finished=None):
+        """
+            Args:
+                workers (int): Number of jobs that may run at the same time.
+                on_finished (callable, optional): Called with each job when it finishes, from the worker thread.
+        """
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.on_finished = on_finished
+        self.jobs = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._ready = []
+
+    def submit(self, description, function, *args, then=None, **kwargs):
+        """
+            Queue a function as a background job.
+            Args:
+                description (str): Shown in the job list.
+                function (callable): The work to do.
+                *args, **kwargs: Passed on to the function.
+                then (callable, optional): Called with the result on the main thread, from
+                    `run_ready`, e.g. to show a plot rendered by the job. It should be quick.
+            Returns:
+                Job: The queued job.
+        """
+        with self._lock:
+            job = Job(next(self._ids), description, then)
+            self.jobs[job.id] = job
+        job.future = self.executor.submit(self._run, job, function, args, kwargs)
+        return job
+
+    def _run(self, job, function, args, kwargs):
+        if job._cancelled.is_set():
+            job.status = "cancelled"
+            return
+        _local.job = job
+        job.status = "running"
+        job.started = time.perf_counter()
+        try:
+            job.result = function(*args, **kwargs)
+            job.status = "done"
+        except JobCancelled:
+            job.status = "cancelled"
+        except Exception as e:
+            job.status = "failed"
+            job.error = f"{type(e).__name__}: {str(e)}"
+        finally:
+            _local.job = None
+            job.finished = time.perf_counter()
+        if job.status == "done" and job.then is not None:
+            with self._lock:
+                self._ready.append(job)
+        if self.on_finished is not None:
+            self.on_finished(job)
+
+    def cancel(self, job_id):
+        """
+            Cancel a job by id. Returns False when there is no such job.
+        """
+        job = self.jobs.get(job_id)
+        if job is None:
+            return False
+        job.cancel()
+        return True
+
+    def active(self):
+        return [job for job in self.jobs.values() if job.status in ("queued", "running")]
+
+    def run_ready(self):
+        """
+            Run the `then` continuations of finished jobs on the calling (main) thread.
+        """
+        with self._lock:
+            ready, self._ready = self._ready, []
+        for job in ready:
+            try:
+                job.then(job.result)
+            except Exception as e:
+                # Reported like a failure of the job itself, instead of reaching the caller's loop
+                job.status = "failed"
+                job.error = f"{type(e).__name__}: {str(e)}"
+                if self.on_finished is not None:
+                    self.on_finished(job)
+        return ready
+
+    def shutdown(self, cancel=True):
+        """
+            Stop the pool, cancelling the queued and running jobs unless `cancel` is False.
+        """
+        if cancel:
+            for job in self.active():
+                job.cancel()
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+
+def memory_usage(frame):
+    return int(frame.memory_usage(deep=True).sum())
+
+
+def optimize_dtypes(frame, categorical_threshold=0.5):
+    """
+        Return a copy of a frame with smaller column types.
+        Text columns holding numbers become numeric, integers are downcast to the smallest
+        width that holds their range, floats are downcast only when no value changes, and
+        text columns with few distinct values become categoricals.
+        Args:
+            frame (pd.DataFrame): The frame to optimize.
+            categorical_threshold (float): Largest ratio of distinct values to rows for a text
+                column to become categorical.
+    """
+    columns = {}
+    for name in frame.columns:
+        columns[name] = _optimize_column(frame[name], categorical_threshold)
+    return pd.DataFrame(columns, index=frame.index)
+
+
+def _optimize_column(column, categorical_threshold):
+    if pd.api.types.is_bool_dtype(column.dtype) or isinstance(column.dtype, pd.CategoricalDtype):
+        return column
+
+    if not pd.api.types.is_numeric_dtype(column.dtype):
+        numeric = _parse_numeric(column)
+        if numeric is None:
+            distinct = column.nunique(dropna=True)
+            if len(column) and distinct / len(column) <= categorical_threshold:
+                return column.astype("category")
+            return column
+        column = numeric
+
+    if pd.api.types.is_float_dtype(column.dtype):
+        values = column.to_numpy()
+        finite = values[~np.isnan(values)]
+        if len(finite) == len(values) and np.array_equal(finite, np.round(finite)):
+            if len(finite) == 0 or np.abs(finite).max() < 2 ** 53:
+                column = column.astype(np.int64)
+        else:
+            single = values.astype(np.float32)
+            if np.array_equal(single.astype(values.dtype), values, equal_nan=True):
+                return column.astype(np.float32)
+            return column
+
+    if pd.api.types.is_integer_dtype(column.dtype):
+        if len(column) and column.min() >= 0:
+            return pd.to_numeric(column, downcast="unsigned")
+        return pd.to_numeric(column, downcast="integer")
+    return column
+
+
+def _parse_numeric(column):
+    # Treat empty strings (as produced by OCR) as missing, and require every other value to parse
+    text = column.astype(object).where(column.astype(str).str.strip() != "", None)
+    numeric = pd.to_numeric(text, errors="coerce")
+    if numeric.isna().sum() != text.isna().sum() or text.isna().all():
+        return None
+    return numeric.astype(np.float64) if numeric.isna().any() else numeric
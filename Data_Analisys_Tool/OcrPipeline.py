@@ -0,0 +1,118 @@
+import csv
+import functools
+import hashlib
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import pytesseract
+from PIL import Image, ImageOps
+
+import Jobs
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "data_analysis_tool", "ocr")
+
+
+def preprocess(image, scale=None, binarize=False, threshold=128, region=None):
+    """
+        Prepare an image for OCR.
+        Args:
+            image (PIL.Image.Image): The image.
+            scale (float, optional): Resize factor, e.g. 0.5 to halve the resolution.
+            binarize (bool): Convert to black and white, which speeds up and often improves OCR.
+            threshold (int): Gray level (0-255) separating black from white when binarizing.
+            region (tuple, optional): (left, top, right, bottom) box to crop to.
+    """
+    if region is not None:
+        image = image.crop(region)
+    if scale and scale != 1:
+        width, height = image.size
+        image = image.resize((max(1, round(width * scale)), max(1, round(height * scale))), Image.LANCZOS)
+    if binarize:
+        image = ImageOps.grayscale(image).point(lambda level: 255 if level > threshold else 0)
+    return image
+
+
+def parse_tsv(text_data):
+    """
+        Build a typed DataFrame from the TSV output of `pytesseract.image_to_data`.
+        Layout and confidence columns come out numeric; the recognized text stays a string.
+        Args:
+            text_data (str): The TSV text.
+    """
+    return pd.read_csv(io.StringIO(text_data), sep="\t", quoting=csv.QUOTE_NONE,
+                       dtype={"text": str}, na_filter=False)
+
+
+def ocr_image(image_path, scale=None, binarize=False, threshold=128, regions=None, cache_dir=None):
+    """
+        Run OCR on one image and return the recognized words as a DataFrame.
+        Args:
+            image_path (str): The path to the image.
+            scale (float, optional): Resize factor applied before OCR.
+            binarize (bool): Convert to black and white before OCR.
+            threshold (int): Gray level used when binarizing.
+            regions (list of tuple, optional): (left, top, right, bottom) boxes to OCR instead of
+                the whole image; a "region" column then gives the index of each word's box.
+            cache_dir (str, optional): Directory for the OCR cache. The TSV output is stored under
+                the hash of the image bytes and options, so the same scan is only OCR'd once.
+    """
+    with open(image_path, "rb") as file:
+        content = file.read()
+
+    frames = []
+    for index, region in enumerate(regions or [None]):
+        options = (scale, binarize, threshold, region)
+        cache_path = None
+        text_data = None
+        if cache_dir:
+            key = hashlib.sha256(content + repr(options).encode()).hexdigest()
+            cache_path = os.path.join(cache_dir, f"{key}.tsv")
+            if os.path.exists(cache_path):
+                with open(cache_path, encoding="utf-8") as file:
+                    text_data = file.read()
+
+        if text_data is None:
+            image = preprocess(Image.open(io.BytesIO(content)), scale, binarize, threshold, region)
+            text_data = pytesseract.image_to_data(image)
+            if cache_path:
+                os.makedirs(cache_dir, exist_ok=True)
+                temporary_path = f"{cache_path}.{os.getpid()}.tmp"
+                with open(temporary_path, "w", encoding="utf-8") as file:
+                    file.write(text_data)
+                os.replace(temporary_path, cache_path)
+
+        frame = parse_tsv(text_data)
+        if regions:
+            frame["region"] = index
+        frames.append(frame)
+
+    return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+
+def _timed_ocr(image_path, **options):
+    start = time.perf_counter()
+    try:
+        return image_path, ocr_image(image_path, **options), time.perf_counter() - start, None
+    except Exception as e:
+        return image_path, None, time.perf_counter() - start, f"{type(e).__name__}: {str(e)}"
+
+
+def ocr_images(image_paths, workers=None, **options):
+    """
+        Run OCR on many images in a process pool.
+        Args:
+            image_paths (list of str): The image paths.
+            workers (int, optional): Number of worker processes. Defaults to the CPU count.
+            **options: Passed on to `ocr_image`.
+        Returns:
+            list of tuple: (path, DataFrame or None, seconds, error message or None) per image.
+    """
+    results = []
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        for result in executor.map(functools.partial(_timed_ocr, **options), image_paths):
+            results.append(result)
+            Jobs.report(done=len(results), total=len(image_paths))
+    return results
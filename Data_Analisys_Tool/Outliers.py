@@ -0,0 +1,147 @@
+import numpy as np
+import pandas as pd
+
+# Outlier tests and the threshold each uses by default:
+#   iqr      outside [q25 - t * IQR, q75 + t * IQR] (Tukey's fences)
+#   zscore   more than t standard deviations from the mean
+#   mad      modified z-score 0.6745 * |x - median| / MAD above t (Iglewicz and Hoaglin)
+#   rolling  more than t standard deviations from the mean of the preceding `window` rows
+DEFAULT_THRESHOLDS = {"iqr": 1.5, "zscore": 3.0, "mad": 3.5, "rolling": 3.0}
+METHODS = tuple(DEFAULT_THRESHOLDS)
+# Ways of reporting the flagged values (see OutlierCollector)
+OUTPUTS = ("indices", "rows", "mask", "counts")
+# MAD of the standard normal distribution, which makes the modified z-score comparable to a z-score
+MAD_SCALE = 0.6745
+
+
+def fences(method, threshold, first, second):
+    """
+        Lower and upper bounds of the normal values of each column.
+        Args:
+            method (str): "iqr", "zscore" or "mad".
+            threshold (float): The threshold of the method.
+            first (np.ndarray): Per column, q25 for "iqr", the mean for "zscore" and the median for "mad".
+            second (np.ndarray): Per column, q75, the standard deviation or the median absolute deviation.
+        Returns:
+            tuple: (lower, upper) arrays with one bound per column.
+    """
+    first, second = np.asarray(first, dtype=np.float64), np.asarray(second, dtype=np.float64)
+    if method == "iqr":
+        spread = second - first
+        return first - threshold * spread, second + threshold * spread
+    if method == "mad":
+        second = second / MAD_SCALE
+    return first - threshold * second, first + threshold * second
+
+
+def flag(block, lower, upper):
+    """
+        Flag the values of a rows x columns block outside the per-column bounds, all columns at once.
+        Missing values and columns without bounds are never flagged.
+    """
+    return (block < lower) | (block > upper)
+
+
+class RollingDetector:
+    """
+        Flags values far from the mean of the rows just before them, for series whose level drifts.
+        Each value is compared with the mean and standard deviation of the `window` preceding rows, taken
+        from cumulative sums over all columns at once. The last rows of a chunk are carried over, so
+        chunked data gives the same flags as a single pass.
+    """
+
+    def __init__(self, width, window, threshold=None, min_periods=None):
+        """
+            Args:
+                width (int): Number of columns.
+                window (int): Number of preceding rows a value is compared with.
+                threshold (float, optional): Standard deviations from the rolling mean. Defaults to 3.
+                min_periods (int, optional): Fewest preceding values needed to test a value.
+                    Defaults to `window`.
+        """
+        window = int(window)
+        if window < 2:
+            raise ValueError("The rolling window must cover at least 2 rows")
+        self.window = window
+        self.threshold = DEFAULT_THRESHOLDS["rolling"] if threshold is None else threshold
+        self.min_periods = window if min_periods is None else max(int(min_periods), 2)
+        self._tail = np.empty((0, width))
+
+    def update(self, block):
+        """
+            Flag the values of the next rows.
+            Args:
+                block (np.ndarray): Rows x columns float values.
+            Returns:
+                np.ndarray: Boolean mask of the same shape.
+        """
+        carried = self._tail.shape[0]
+        values = np.concatenate((self._tail, block))
+        valid = ~np.isnan(values)
+        counted = valid.sum(axis=0)
+        # Centred on the column means, which keeps the sums small and the variance accurate
+        shift = np.where(counted > 0, np.where(valid, values, 0.0).sum(axis=0) / np.maximum(counted, 1), 0.0)
+        centred = np.where(valid, values - shift, 0.0)
+        zero = np.zeros((1, values.shape[1]))
+        counts = np.concatenate((zero, np.cumsum(valid, axis=0)))
+        sums = np.concatenate((zero, np.cumsum(centred, axis=0)))
+        squares = np.concatenate((zero, np.cumsum(centred * centred, axis=0)))
+
+        # The window of row i is rows [i - window, i), so a value never hides itself
+        ends = np.arange(carried, values.shape[0])
+        starts = np.maximum(ends - self.window, 0)
+        count = counts[ends] - counts[starts]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = (sums[ends] - sums[starts]) / count
+            deviation = np.sqrt(np.maximum((squares[ends] - squares[starts]) / count - mean * mean, 0.0))
+            mask = (count >= self.min_periods) & (np.abs(values[carried:] - shift - mean) > self.threshold * deviation)
+
+        self._tail = values[-self.window:]
+        return mask
+
+
+class OutlierCollector:
+    """
+        Gathers the flags of successive chunks in a compact form:
+            indices   {column: index labels of its flagged rows}
+            rows      index labels of the rows with at least one flagged value
+            mask      boolean DataFrame shaped like the columns tested
+            counts    number of flagged values per column
+    """
+
+    def __init__(self, columns, output="indices"):
+        if output not in OUTPUTS:
+            raise ValueError(f"Unknown output '{output}'")
+        self.columns = list(columns)
+        self.output = output
+        self._parts = []
+        self._counts = np.zeros(len(self.columns), dtype=np.int64)
+
+    def add(self, mask, index):
+        """
+            Args:
+                mask (np.ndarray): Rows x columns flags of a chunk.
+                index (pd.Index): The index labels of the chunk's rows.
+        """
+        self._counts += mask.sum(axis=0)
+        if self.output == "indices":
+            self._parts.append([index[np.flatnonzero(column)] for column in mask.T])
+        elif self.output == "rows":
+            self._parts.append(index[mask.any(axis=1)])
+        elif self.output == "mask":
+            self._parts.append(pd.DataFrame(mask, index=index, columns=self.columns))
+
+    def result(self):
+        if self.output == "counts":
+            return pd.Series(self._counts, index=self.columns, name="outliers")
+        if self.output == "indices":
+            return {name: _join([part[i] for part in self._parts]) for i, name in enumerate(self.columns)}
+        if self.output == "rows":
+            return _join(self._parts)
+        if not self._parts:
+            return pd.DataFrame(columns=self.columns, dtype=bool)
+        return self._parts[0] if len(self._parts) == 1 else pd.concat(self._parts)
+
+
+def _join(labels):
+    return np.concatenate([np.asarray(part) for part in labels]) if labels else np.empty(0, dtype=np.int64)
@@ -0,0 +1,312 @@
+import contextlib
+import io
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import Profiler
+from DataSet import DataSet
+from Workspace import Workspace
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+# Keys of a statistic step that are not passed on to the DataAnalyzer method
+STEP_KEYS = ("statistic", "name", "column", "args")
+
+_local = threading.local()
+
+
+class PipelineRunner:
+    """
+        Runs load -> statistics -> plots pipelines without prompts and returns JSON-ready results.
+        Datasets (and their analyzers, with their statistics caches) are kept between pipelines in a
+        workspace, so pipelines loading the same file in one process share a single load while the file
+        is unchanged. With a memory budget, datasets not used by the running pipeline are spilled.
+    """
+
+    def __init__(self, memory_budget=None):
+        """
+            Args:
+                memory_budget (int, optional): Bytes the loaded datasets may use; see Workspace.
+        """
+        self.workspace = Workspace(memory_budget=memory_budget)
+        # Load bookkeeping per load section: workspace name, file stamp, uses and load time
+        self.datasets = {}
+        self._named = {}
+
+    def run(self, pipeline):
+        """
+            Run one pipeline.
+            Args:
+                pipeline (dict): {"name": ..., "load": {...} or "dataset": name of a loaded dataset,
+                    "stats": [{"statistic": "mean", "column": "price"}, ...],
+                    "plots": [{"plot": "histogram", "args": ["price"], "output": "price.png"}, ...]}.
+            Returns:
+                dict: The pipeline name, dataset summary, statistic values, plot files and errors.
+        """
+        start = time.perf_counter()
+        result = {"name": pipeline.get("name"), "stats": {}, "plots": [], "errors": {}}
+        try:
+            entry, load = self._dataset(pipeline)
+        except Exception as e:
+            result["errors"]["load"] = f"{type(e).__name__}: {str(e)}"
+            result["seconds"] = time.perf_counter() - start
+            return result
+        dataset, analyzer = entry.dataset, entry.analyzer
+        # Counting the rows of a streamed dataset would read the whole source again
+        rows = None if dataset.is_streaming() else dataset.num_rows()
+        result["dataset"] = {"rows": rows, "columns": dataset.get_column_names(),
+                             "streaming": dataset.is_streaming(), "reused": load["uses"] > 1,
+                             "load_seconds": load["seconds"]}
+
+        for index, step in enumerate(pipeline.get("stats", [])):
+            key = step.get("name") or _step_name(step)
+            if key in result["stats"] or key in result["errors"]:
+                key = f"{key}#{index}"
+            args, kwargs = step_args(step)
+            value, error = call(statistic_method(analyzer, step["statistic"]), *args, **kwargs)
+            if error is None:
+                result["stats"][key] = to_json(value)
+            else:
+                result["errors"][key] = error
+
+        plots = pipeline.get("plots", [])
+        if plots:
+            from ReportRenderer import PLOTS
+            visualizer = entry.visualizer
+            output_dir = pipeline.get("output_dir", ".")
+            os.makedirs(output_dir, exist_ok=True)
+            for index, spec in enumerate(plots):
+                prefix = os.path.splitext(os.path.basename(str(pipeline.get("name") or "pipeline")))[0]
+                default = f"{prefix}_{index:03d}_{spec['plot']}.png"
+                outputs = spec.get("output", os.path.join(output_dir, default))
+                outputs = [outputs] if isinstance(outputs, str) else list(outputs)
+                for path in outputs:
+                    if os.path.exists(path):
+                        os.remove(path)
+                visualizer.output_path = outputs
+                args = spec.get("args", [])
+                method = getattr(visualizer, PLOTS.get(spec["plot"], spec["plot"]))
+                _, error = call(method, *([] if isinstance(args, dict) else args),
+                                 **(args if isinstance(args, dict) else {}))
+                written = [path for path in outputs if os.path.exists(path)]
+                if error is None and len(written) < len(outputs):
+                    error = "No figure written"
+                result["plots"].append({"plot": spec["plot"], "files": written, "error": error})
+
+        result["seconds"] = time.perf_counter() - start
+        return result
+
+    def run_all(self, pipelines):
+        return [self.run(pipeline) for pipeline in pipelines]
+
+    def _dataset(self, pipeline):
+        if "dataset" in pipeline:
+            load = self._named[pipeline["dataset"]]
+            load["uses"] += 1
+            return self.workspace.use(load["name"]), load
+
+        load_section = dict(pipeline["load"])
+        key = json.dumps(load_section, sort_keys=True, default=str)
+        stamp = _stamp(load_section.get("path"))
+        load = self.datasets.get(key)
+        current = self.workspace.entries.get(load["name"]) if load is not None else None
+        # Reload when the file changed, or when another load section reused the name
+        if current is None or load["stamp"] != stamp or current.dataset.uid != load["uid"]:
+            start = time.perf_counter()
+            dataset = load_dataset(load_section)
+            load = {"name": load_section.get("name") or key, "uid": dataset.uid, "stamp": stamp, "uses": 0,
+                    "seconds": time.perf_counter() - start}
+            self.workspace.add(load["name"], dataset)
+            self.datasets[key] = load
+        load["uses"] += 1
+        if load_section.get("name"):
+            self._named[load_section["name"]] = load
+        return self.workspace.use(load["name"]), load
+
+
+def statistic_method(analyzer, name):
+    """
+        Return the analyzer method for a statistic name, with or without the "calculate_" prefix.
+    """
+    method = getattr(analyzer, f"calculate_{name}", None) or getattr(analyzer, name, None)
+    if method is None or name.startswith("_"):
+        return lambda *args, **kwargs: f"Error: Unknown statistic '{name}'"
+    return method
+
+
+def load_dataset(load):
+    """
+        Load a dataset as described by the "load" section of a pipeline.
+        Args:
+            load (dict): {"source": "csv" | "excel" | "png" | "directory", "path": ..., plus loader options
+                such as "columns", "use_cache", "chunksize", "sheet_name" or "pattern". Optional "select",
+                "filter" ([[column, operator, value], ...]) and "derive" ([[name, function, column, {params}], ...])
+                turn the load into a lazy query, so that only the needed rows and columns are kept.}
+    """
+    load = dict(load)
+    source, path = load.pop("source", None), load.pop("path")
+    load.pop("name", None)
+    select, filters, derive = load.pop("select", None), load.pop("filter", []), load.pop("derive", [])
+    if source is None:
+        extension = os.path.splitext(path)[1].lower()
+        source = {".csv": "csv", ".xlsx": "excel", ".xls": "excel", ".png": "png"}.get(extension, "directory")
+
+    if (select or filters or derive) and source in ("csv", "excel"):
+        query = DataSet.scan(path, sheet_name=load.get("sheet_name", 0), use_cache=load.get("use_cache", False))
+    else:
+        dataset = DataSet()
+        with capture_output() as messages:
+            if source == "csv":
+                dataset.load_data_from_csv(path, **load)
+            elif source == "excel":
+                load.setdefault("sheet_name", 0)
+                dataset.load_data_from_excel(path, **load)
+            elif source == "png":
+                dataset.load_data_from_png(path, **load)
+            elif source == "directory":
+                dataset.load_directory(path, **load)
+            else:
+                raise ValueError(f"Invalid data source '{source}'")
+        if dataset.data is None and not dataset.is_streaming():
+            raise ValueError(messages.getvalue().strip() or f"No data loaded from '{path}'")
+        if not (select or filters or derive):
+            return dataset
+        query = dataset.query()
+
+    for name, function, column, *params in derive:
+        query = query.derive(name, function, column, **(params[0] if params else {}))
+    for column, operator, *value in filters:
+        query = query.filter(column, operator, *value)
+    if select:
+        query = query.select(*select)
+    return query.to_dataset()
+
+
+def load_pipelines(path):
+    """
+        Read the pipelines of a JSON or YAML file: a single pipeline, a list of them,
+        or {"pipelines": [...]}.
+    """
+    with open(path, encoding="utf-8") as file:
+        if os.path.splitext(path)[1].lower() in (".yaml", ".yml"):
+            if yaml is None:
+                raise ImportError("PyYAML is required for YAML pipeline files")
+            content = yaml.safe_load(file)
+        else:
+            content = json.load(file)
+    if isinstance(content, dict):
+        content = content.get("pipelines", [content])
+    return content
+
+
+def to_json(value):
+    """
+        Convert a statistic result (numpy scalars and arrays, pandas objects, NaN) to plain JSON values.
+    """
+    if isinstance(value, pd.DataFrame):
+        return {str(index): to_json(row.to_dict()) for index, row in value.iterrows()}
+    if isinstance(value, pd.Series):
+        return {str(index): to_json(item) for index, item in value.items()}
+    if isinstance(value, dict):
+        return {str(key) if not isinstance(key, tuple) else "/".join(map(str, key)): to_json(item)
+                for key, item in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [to_json(item) for item in value]
+    if isinstance(value, (np.integer, np.bool_)):
+        return value.item()
+    if isinstance(value, (float, np.floating)):
+        return None if not np.isfinite(value) else float(value)
+    if isinstance(value, (str, int, bool)) or value is None:
+        return value
+    if hasattr(value, "to_dict"):
+        return to_json(value.to_dict())
+    return str(value)
+
+
+class _ThreadOutput:
+    """
+        Stands in for sys.stdout once output has been captured: text printed by a thread inside
+        `capture_output` goes to that thread's buffer, everything else to the real stream. It also
+        passes the text to the profiler, which then does not install a stand-in of its own.
+    """
+    notes_output = True
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, text):
+        Profiler.note_output(text)
+        buffer = getattr(_local, "buffer", None)
+        return (buffer if buffer is not None else self.stream).write(text)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+@contextlib.contextmanager
+def capture_output():
+    """
+        Capture what the calling thread prints. Unlike contextlib.redirect_stdout, the output of other
+        threads is left alone, so statistics running on a thread pool can each capture their errors.
+    """
+    if not isinstance(sys.stdout, _ThreadOutput):
+        # Takes the place of the profiler's stand-in too, so there is only ever one
+        sys.stdout = _ThreadOutput(Profiler.unwrap_output(sys.stdout))
+    previous = getattr(_local, "buffer", None)
+    _local.buffer = io.StringIO()
+    try:
+        yield _local.buffer
+    finally:
+        _local.buffer = previous
+
+
+def call(function, *args, **kwargs):
+    """
+        Call a DataAnalyzer or Visualization method and separate its result from its error.
+        Those methods report most problems by printing or returning an "Error: ..." string.
+        Returns:
+            tuple: (value, None) on success, or (None, error text).
+    """
+    try:
+        with capture_output() as messages:
+            value = function(*args, **kwargs)
+    except Exception as e:
+        return None, f"{type(e).__name__}: {str(e)}"
+    if isinstance(value, str) and value.startswith("Error"):
+        return None, value
+    if value is None and messages.getvalue().strip():
+        return None, messages.getvalue().strip()
+    return value, None
+
+
+def step_args(step):
+    """
+        Split a statistic step into the positional and keyword arguments of the analyzer method.
+    """
+    args = list(step.get("args", []))
+    if "column" in step:
+        args.insert(0, step["column"])
+    kwargs = {key: value for key, value in step.items() if key not in STEP_KEYS}
+    return args, kwargs
+
+
+def _step_name(step):
+    columns = ", ".join(map(str, ([step["column"]] if "column" in step else []) + list(step.get("args", []))))
+    return f"{step['statistic']}({columns})" if columns else step["statistic"]
+
+
+def _stamp(path):
+    # Reload a reused dataset when its source file changed since it was loaded
+    if path is None or not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
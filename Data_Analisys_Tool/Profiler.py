@@ -0,0 +1,309 @@
+import contextlib
+import functools
+import json
+import math
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+_local = threading.local()
+_lock = threading.Lock()
+_enabled = False
+_trace_memory = False
+_origin = time.perf_counter_ns()
+_spans = []
+
+
+class Span:
+    """
+        One timed call: its name and category, wall time, rows and bytes processed, peak memory
+        allocated above the starting point (when memory tracing is on) and any error.
+    """
+
+    def __init__(self, name, category, attributes):
+        self.name = name
+        self.category = category
+        self.attributes = attributes
+        self.start = time.perf_counter_ns()
+        self.duration = 0
+        self.rows = 0
+        self.bytes = 0
+        self.peak_memory = None
+        self.error = None
+        self.thread = threading.get_ident()
+        self.depth = 0
+        self._memory_start = 0
+        self._child_peak = 0
+
+    def to_dict(self):
+        return {"name": self.name, "category": self.category, "start_us": (self.start - _origin) / 1000,
+                "duration_ms": self.duration / 1e6, "rows": self.rows, "bytes": self.bytes,
+                "peak_memory": self.peak_memory, "error": self.error, "thread": self.thread,
+                "depth": self.depth, **self.attributes}
+
+
+class _ErrorTee:
+    """
+        Stands in for sys.stdout while profiling: output still goes to the terminal, and lines
+        starting with "Error" (how most methods report failures) become the error of the current span.
+        A stand-in that already passes its output to `note_output` (Pipeline.capture_output) is not
+        wrapped again.
+    """
+    notes_output = True
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, text):
+        note_output(text)
+        return self.stream.write(text)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+def note_output(text):
+    """
+        Record text printed on this thread: while profiling, a line starting with "Error" becomes the
+        error of the current span.
+    """
+    if _enabled and text.startswith("Error"):
+        stack = getattr(_local, "stack", None)
+        if stack and stack[-1].error is None:
+            stack[-1].error = text.strip()
+
+
+def unwrap_output(stream):
+    """
+        The stream under the profiler's stand-in for sys.stdout, for code that replaces sys.stdout itself.
+    """
+    return stream.stream if isinstance(stream, _ErrorTee) else stream
+
+
+def enable(trace_memory=False):
+    """
+        Start recording spans.
+        Args:
+            trace_memory (bool): Also record the peak memory of each span with tracemalloc.
+                This slows Python allocations down noticeably, so it is off by default.
+    """
+    global _enabled, _trace_memory
+    _trace_memory = trace_memory
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    if not getattr(sys.stdout, "notes_output", False):
+        sys.stdout = _ErrorTee(sys.stdout)
+    _enabled = True
+
+
+def disable():
+    global _enabled, _trace_memory
+    _enabled = False
+    if isinstance(sys.stdout, _ErrorTee):
+        sys.stdout = sys.stdout.stream
+    if _trace_memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _trace_memory = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    with _lock:
+        _spans.clear()
+
+
+@contextlib.contextmanager
+def profiling(trace_memory=False):
+    """
+        Record spans for the duration of a `with` block:
+
+            with Profiler.profiling():
+                analyzer.summarize()
+            Profiler.write_chrome_trace("trace.json")
+    """
+    enable(trace_memory)
+    try:
+        yield
+    finally:
+        disable()
+
+
+@contextlib.contextmanager
+def span(name, category="span", **attributes):
+    """
+        Time a block of code as a span, nested under the span running on this thread.
+    """
+    if not _enabled:
+        yield None
+        return
+    current = _begin(name, category, attributes)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {str(e)}"
+        raise
+    finally:
+        _end(current)
+
+
+def profiled(category):
+    """
+        Decorator recording a span for every call of a method while profiling is enabled.
+        Methods that report failure by returning an "Error: ..." string have it recorded as the
+        span error. When profiling is off the only cost is one flag check.
+        Args:
+            category (str): Groups spans in reports, e.g. "load", "statistic" or "plot".
+    """
+
+    def decorate(function):
+        name = function.__qualname__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            current = _begin(name, category, {})
+            try:
+                result = function(*args, **kwargs)
+            except BaseException as e:
+                current.error = f"{type(e).__name__}: {str(e)}"
+                raise
+            finally:
+                _end(current)
+            if isinstance(result, str) and result.startswith("Error"):
+                current.error = result
+            _measure(current, args, category)
+            return result
+
+        return wrapper
+
+    return decorate
+
+
+def add(rows=0, bytes=0):
+    """
+        Add rows and bytes processed to the span running on this thread, if any.
+        Chunk iterators call this so that streamed work is attributed to the calling statistic.
+    """
+    if not _enabled:
+        return
+    stack = getattr(_local, "stack", None)
+    if stack:
+        stack[-1].rows += rows
+        stack[-1].bytes += bytes
+
+
+def spans():
+    with _lock:
+        return list(_spans)
+
+
+def summary():
+    """
+        Aggregate the recorded spans by name.
+        Returns:
+            dict: {name: {"category", "count", "errors", "total_ms", "mean_ms", "p50_ms", "p95_ms",
+                "max_ms", "rows", "bytes", "peak_memory", "histogram"}}; the histogram counts calls per
+                power-of-two bucket of milliseconds, keyed by the bucket's upper bound ("<=1ms", ...).
+    """
+    groups = {}
+    for item in spans():
+        groups.setdefault(item.name, []).append(item)
+    table = {}
+    for name, items in groups.items():
+        durations = np.array([item.duration for item in items]) / 1e6
+        buckets = {}
+        for duration in durations:
+            bound = 2.0 ** max(math.ceil(math.log2(duration)), -10) if duration > 0 else 2.0 ** -10
+            label = f"<={bound:g}ms"
+            buckets[label] = buckets.get(label, 0) + 1
+        peaks = [item.peak_memory for item in items if item.peak_memory is not None]
+        table[name] = {"category": items[0].category, "count": len(items),
+                       "errors": sum(1 for item in items if item.error),
+                       "total_ms": float(durations.sum()), "mean_ms": float(durations.mean()),
+                       "p50_ms": float(np.percentile(durations, 50)), "p95_ms": float(np.percentile(durations, 95)),
+                       "max_ms": float(durations.max()), "rows": sum(item.rows for item in items),
+                       "bytes": sum(item.bytes for item in items), "peak_memory": max(peaks) if peaks else None,
+                       "histogram": dict(sorted(buckets.items(), key=lambda pair: float(pair[0][2:-2])))}
+    return table
+
+
+def to_json():
+    return {"spans": [item.to_dict() for item in spans()], "summary": summary()}
+
+
+def write_json(path):
+    """
+        Write the spans and the per-name summary to a JSON file.
+    """
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(to_json(), file, indent=2, default=str)
+
+
+def to_chrome_trace():
+    events = []
+    for item in spans():
+        events.append({"name": item.name, "cat": item.category, "ph": "X", "pid": os.getpid(),
+                       "tid": item.thread, "ts": (item.start - _origin) / 1000, "dur": item.duration / 1000,
+                       "args": {key: value for key, value in item.to_dict().items()
+                                if key in ("rows", "bytes", "peak_memory", "error") or key in item.attributes}})
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def write_chrome_trace(path):
+    """
+        Write the spans in Chrome trace format, for chrome://tracing or https://ui.perfetto.dev.
+    """
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(to_chrome_trace(), file, default=str)
+
+
+def _begin(name, category, attributes):
+    current = Span(name, category, attributes)
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    current.depth = len(stack)
+    stack.append(current)
+    if _trace_memory and tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+        current._memory_start = tracemalloc.get_traced_memory()[0]
+    current.start = time.perf_counter_ns()
+    return current
+
+
+def _end(current):
+    current.duration = time.perf_counter_ns() - current.start
+    stack = _local.stack
+    stack.pop()
+    if _trace_memory and tracemalloc.is_tracing():
+        # Inner spans reset the peak, so the highest point seen by them is carried up to the parent
+        peak = max(tracemalloc.get_traced_memory()[1], current._child_peak)
+        current.peak_memory = max(peak - current._memory_start, 0)
+        if stack:
+            stack[-1]._child_peak = max(stack[-1]._child_peak, peak)
+    if stack:
+        stack[-1].rows += current.rows
+        stack[-1].bytes += current.bytes
+    with _lock:
+        _spans.append(current)
+
+
+def _measure(current, args, category):
+    # Fill in rows and bytes for calls that did not report them while streaming
+    owner = args[0] if args else None
+    dataset = getattr(owner, "dataset", owner)
+    if category == "load" and not current.bytes and len(args) > 1:
+        paths = args[1] if isinstance(args[1], (list, tuple)) else [args[1]]
+        if isinstance(args[1], str) and os.path.isdir(args[1]):
+            paths = [entry["file"] for entry in dataset.metadata.get("load_report", [])]
+        current.bytes = sum(os.path.getsize(path) for path in paths if isinstance(path, str) and os.path.isfile(path))
+    if not current.rows and getattr(dataset, "_chunks", None):
+        current.rows = sum(len(chunk) for chunk in dataset._chunks)
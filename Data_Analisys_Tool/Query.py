@@ -0,0 +1,356 @@
+import operator
+import os
+
+import numpy as np
+import pandas as pd
+
+import ColumnarCache
+import Transforms
+from Accumulators import MomentAccumulator
+
+# Row predicates accepted by Query.filter, as (column, operator, value)
+OPERATORS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "in": lambda column, value: column.isin(list(value)),
+    "not in": lambda column, value: ~column.isin(list(value)),
+    "notnull": lambda column, value: column.notna(),
+    "isnull": lambda column, value: column.isna(),
+}
+
+
+
+class Query:
+    """
+        Lazy query over a DataSet or a CSV/Excel file.
+        The builder methods only record steps in a plan; nothing is read until a terminal method
+        (collect, iter_chunks, calculate, plot, ...) runs it. The columns the plan needs are worked
+        out first, so only those are read, and row filters on source columns are applied while
+        reading (per CSV chunk, or on the Arrow table of the columnar cache) before anything else.
+    """
+
+    def __init__(self, dataset=None, file_path=None, sheet_name=0, chunksize=100_000, use_cache=False):
+        """
+            Args:
+                dataset (DataSet, optional): The dataset to query.
+                file_path (str, optional): A CSV or Excel file to query instead, without loading it first.
+                sheet_name (str or int): The sheet to read from an Excel file.
+                chunksize (int): Number of CSV rows read at a time.
+                use_cache (bool): Read the file through its columnar cache (see ColumnarCache).
+        """
+        self.dataset = dataset
+        self.file_path = file_path
+        self.sheet_name = sheet_name
+        self.chunksize = chunksize
+        self.use_cache = use_cache
+        self.steps = []
+        self.group_keys = None
+        self.metrics = {}
+
+    def _with(self, *steps, group_keys=None):
+        # Builder methods return a new query, so a partial plan can be reused
+        query = Query(self.dataset, self.file_path, self.sheet_name, self.chunksize, self.use_cache)
+        query.steps = self.steps + list(steps)
+        query.group_keys = group_keys if group_keys is not None else self.group_keys
+        return query
+
+    def select(self, *columns):
+        """
+            Keep only these columns (source or derived).
+        """
+        return self._with(("select", list(columns)))
+
+    def filter(self, column, operator, value=None):
+        """
+            Keep only the rows where `column operator value` holds.
+            Args:
+                column (str): The column to test.
+                operator (str): One of ==, !=, <, <=, >, >=, in, not in, notnull, isnull.
+                value: The value to compare with (a list for "in" and "not in").
+        """
+        if operator not in OPERATORS:
+            raise ValueError(f"Unknown operator '{operator}'")
+        return self._with(("filter", column, operator, value))
+
+    def derive(self, name, function, column, **params):
+        """
+            Add a column computed from another one, e.g. derive("log_price", "log", "price").
+            Args:
+                name (str): The name of the new column.
+                function (str or callable): A name from Transforms.TRANSFORMS, as for DataAnalyzer.derive,
+                    or a callable taking the column.
+                column (str): The column to compute it from.
+                **params: Parameters of the transform, e.g. lower and upper for "clip".
+        """
+        if not callable(function):
+            # standardize and bin are fitted on the rows the query keeps, before its result is built
+            function = Transforms.Transform(function, column, **params)
+        return self._with(("derive", name, function, column))
+
+    def group_by(self, *columns):
+        """
+            Group the rows by these columns; follow with `aggregate`.
+        """
+        return self._with(group_keys=list(columns))
+
+    def aggregate(self, value, stats=("count", "mean")):
+        """
+            Aggregate a numeric column per group, like DataAnalyzer.group_stats.
+            Args:
+                value (str): The column to aggregate.
+                stats (list of str): The statistics, e.g. ("count", "mean", "q90").
+        """
+        if not self.group_keys:
+            raise ValueError("aggregate needs group_by first")
+        return self._with(("aggregate", list(self.group_keys), value, list(stats)))
+
+    # Planning
+
+    def source_columns(self):
+        if self.dataset is not None:
+            return self.dataset.get_column_names()
+        if self._cache_ready():
+            return ColumnarCache.read_schema(self.file_path, self._cache_key())
+        if self._is_excel():
+            return pd.read_excel(self.file_path, sheet_name=self.sheet_name, nrows=0).columns.tolist()
+        return pd.read_csv(self.file_path, nrows=0).columns.tolist()
+
+    def plan(self):
+        """
+            Work out what the query reads: the source columns it needs, the filters that can be
+            applied while reading, and the remaining steps.
+            Returns:
+                dict: {"source": all source columns, "columns": columns read, "pushed": pushed-down
+                filters, "steps": steps run after reading}.
+        """
+        source = self.source_columns()
+        steps = list(self.steps)
+
+        # Walk the plan backwards to find the columns every later step needs
+        needed = None
+        for step in reversed(steps):
+            if step[0] == "aggregate":
+                needed = set(step[1]) | {step[2]}
+            elif step[0] == "select":
+                needed = set(step[1]) if needed is None else needed & set(step[1])
+            elif step[0] == "derive" and (needed is None or step[1] in needed):
+                if needed is not None:
+                    needed.discard(step[1])
+                    needed.add(step[3])
+            elif step[0] == "filter" and needed is not None:
+                needed.add(step[1])
+        if needed is None:
+            needed = set(source)
+        derived = {step[1] for step in steps if step[0] == "derive"}
+        unknown = sorted(needed - set(source) - derived)
+        if unknown:
+            raise KeyError(unknown[0])
+
+        # A filter can run while reading when no earlier step derived the column it tests
+        pushed, remaining, produced = [], [], set()
+        for step in steps:
+            if step[0] == "derive":
+                produced.add(step[1])
+            if step[0] == "filter" and step[1] not in produced:
+                pushed.append(step[1:])
+            else:
+                remaining.append(step)
+        read = [name for name in source if name in needed or name in {f[0] for f in pushed}]
+        return {"source": source, "columns": read, "pushed": pushed, "steps": remaining}
+
+    def explain(self):
+        """
+            Describe the plan: what is read, which columns are pruned and which filters are pushed down.
+            After the query has run, the rows read and kept are included.
+        """
+        plan = self.plan()
+        pruned = [name for name in plan["source"] if name not in plan["columns"]]
+        if self.dataset is not None:
+            how = "in chunks" if self.dataset.is_streaming() else "from memory"
+            lines = [f"Scan DataSet {how}"]
+        elif self._cache_ready():
+            lines = [f"Scan columnar cache of '{self.file_path}' (memory-mapped)"]
+        elif self._is_excel():
+            lines = [f"Scan Excel '{self.file_path}' sheet {self.sheet_name!r}"]
+        else:
+            lines = [f"Scan CSV '{self.file_path}' in chunks of {self.chunksize} rows"]
+        lines.append(f"  columns read: {', '.join(plan['columns']) or '-'} "
+                     f"({len(plan['columns'])} of {len(plan['source'])})")
+        lines.append(f"  columns pruned: {', '.join(pruned) or '-'}")
+        lines.append(f"  filters pushed down: {', '.join(_describe(f) for f in plan['pushed']) or '-'}")
+        for step in plan["steps"]:
+            if step[0] == "derive":
+                function = step[2] if isinstance(step[2], Transforms.Transform) \
+                    else f"{getattr(step[2], '__name__', 'function')}({step[3]})"
+                lines.append(f"Derive {step[1]} = {function}")
+            elif step[0] == "filter":
+                lines.append(f"Filter {_describe(step[1:])}")
+            elif step[0] == "select":
+                lines.append(f"Select {', '.join(step[1])}")
+            elif step[0] == "aggregate":
+                lines.append(f"Aggregate {', '.join(step[3])} of {step[2]} by {', '.join(step[1])}")
+        if self.metrics:
+            lines.append(f"Rows read: {self.metrics['rows_read']}, rows kept: {self.metrics['rows_kept']}")
+        return "\n".join(lines)
+
+    # Execution
+
+    def iter_chunks(self):
+        """
+            Run the plan one chunk at a time, without building the whole result.
+            Aggregations are not applied here, see `collect`.
+        """
+        plan = self.plan()
+        steps = [step for step in plan["steps"] if step[0] != "aggregate"]
+        self.metrics = {"rows_read": 0, "rows_kept": 0}
+        fits = {}
+        for position, step in enumerate(steps):
+            if step[0] == "derive" and isinstance(step[2], Transforms.Transform) and step[2].needs_fit():
+                # One extra pass over the rows that reach the step, for its mean and spread or range
+                accumulator = MomentAccumulator()
+                for chunk in self._run(plan, steps[:position], fits):
+                    accumulator.update(_numeric(chunk[step[3]], step[3]))
+                if accumulator.count == 0:
+                    accumulator.mean = np.nan
+                fits[position] = accumulator
+        if fits:
+            self.metrics = {"rows_read": 0, "rows_kept": 0}
+        for chunk in self._run(plan, steps, fits):
+            self.metrics["rows_kept"] += len(chunk)
+            yield chunk
+
+    def _run(self, plan, steps, fits):
+        for chunk in self._scan(plan["columns"], plan["pushed"]):
+            for position, step in enumerate(steps):
+                if step[0] == "derive":
+                    if isinstance(step[2], Transforms.Transform):
+                        values = _numeric(chunk[step[3]], step[3])
+                        values = step[2].apply(values, fits.get(position), np.empty(values.shape))
+                    else:
+                        values = step[2](chunk[step[3]])
+                    chunk = chunk.assign(**{step[1]: values})
+                elif step[0] == "filter":
+                    chunk = chunk[_mask(chunk, step[1:])]
+                elif step[0] == "select":
+                    chunk = chunk[step[1]]
+            yield chunk
+
+    def collect(self):
+        """
+            Run the plan and return the result as a DataFrame (the per-group table after `aggregate`).
+        """
+        chunks = list(self.iter_chunks())
+        frame = pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0] if chunks else pd.DataFrame()
+        aggregate = next((step for step in reversed(self.steps) if step[0] == "aggregate"), None)
+        if aggregate is None:
+            return frame
+        from DataAnalyzer import DataAnalyzer
+        return DataAnalyzer(self._dataset(frame)).group_stats(aggregate[1], aggregate[2], aggregate[3])
+
+    def to_dataset(self):
+        """
+            Run the plan and return the result as a new in-memory DataSet.
+        """
+        dataset = self._dataset(self.collect())
+        dataset.metadata["query"] = self.explain()
+        return dataset
+
+    def calculate(self, statistic, *args, **kwargs):
+        """
+            Run the plan and calculate a DataAnalyzer statistic on the result,
+            e.g. query.calculate("mean", "price") or query.calculate("summarize").
+            Args:
+                statistic (str): A DataAnalyzer method name, with or without the "calculate_" prefix.
+                *args, **kwargs: Passed on to the method.
+        """
+        from DataAnalyzer import DataAnalyzer
+        analyzer = DataAnalyzer(self.to_dataset())
+        method = getattr(analyzer, f"calculate_{statistic}", None) or getattr(analyzer, statistic)
+        return method(*args, **kwargs)
+
+    def plot(self, plot, *args, output_path=None, **kwargs):
+        """
+            Run the plan and draw a Visualization plot of the result, e.g. query.plot("histogram", "price").
+            Args:
+                plot (str): A short plot name (see ReportRenderer.PLOTS) or a Visualization method name.
+                *args, **kwargs: Passed on to the method.
+                output_path (str or list of str, optional): Save the figure here instead of showing it.
+        """
+        from DataVisualization import Visualization
+        from ReportRenderer import PLOTS
+        visualizer = Visualization(self.to_dataset())
+        visualizer.output_path = output_path
+        return getattr(visualizer, PLOTS.get(plot, plot))(*args, **kwargs)
+
+    def _scan(self, columns, filters):
+        if self.dataset is not None:
+            for chunk in self.dataset.iter_chunks(columns):
+                self.metrics["rows_read"] += len(chunk)
+                yield _apply(chunk, filters)
+        elif self.use_cache and ColumnarCache.is_available():
+            if not self._cache_ready():
+                ColumnarCache.cached_read(self.file_path, self._full_reader(), key=self._cache_key())
+            frame = ColumnarCache.read(self.file_path, self._cache_key(), columns, filters)
+            # Rows are filtered inside Arrow, so only the kept rows are ever converted
+            self.metrics["rows_read"] += len(frame)
+            yield frame
+        elif self._is_excel():
+            frame = pd.read_excel(self.file_path, sheet_name=self.sheet_name, usecols=columns)
+            self.metrics["rows_read"] += len(frame)
+            yield _apply(frame, filters)
+        else:
+            for chunk in pd.read_csv(self.file_path, usecols=columns, chunksize=self.chunksize):
+                self.metrics["rows_read"] += len(chunk)
+                yield _apply(chunk, filters)
+
+    def _dataset(self, frame):
+        from DataSet import DataSet
+        dataset = DataSet()
+        dataset.data = frame
+        dataset.metadata["source"] = "Query"
+        return dataset
+
+    def _is_excel(self):
+        return os.path.splitext(self.file_path)[1].lower() in (".xlsx", ".xls")
+
+    def _cache_key(self):
+        return f"sheet={self.sheet_name}" if self._is_excel() else ""
+
+    def _cache_ready(self):
+        return (self.dataset is None and self.use_cache and ColumnarCache.is_available()
+                and ColumnarCache.is_fresh(self.file_path, self._cache_key()))
+
+    def _full_reader(self):
+        if self._is_excel():
+            return lambda: pd.read_excel(self.file_path, sheet_name=self.sheet_name)
+        return lambda: pd.read_csv(self.file_path)
+
+
+def _mask(frame, predicate):
+    column, operator, value = predicate
+    return OPERATORS[operator](frame[column], value).to_numpy(dtype=bool)
+
+
+def _apply(frame, filters):
+    if not filters:
+        return frame
+    mask = np.ones(len(frame), dtype=bool)
+    for predicate in filters:
+        mask &= _mask(frame, predicate)
+    return frame[mask]
+
+
+def _describe(predicate):
+    column, operator, value = predicate
+    return f"{column} {operator}" if operator in ("notnull", "isnull") else f"{column} {operator} {value!r}"
+
+
+def _numeric(column, name):
+    # The float values a transform reads, with the error DataAnalyzer.derive gives for other columns
+    if not pd.api.types.is_numeric_dtype(column.dtype):
+        raise TypeError(f"Column '{name}' does not contain numeric data.")
+    return np.asarray(column, dtype=np.float64)
@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+
+
+def as_float(values):
+    """
+        Convert a numeric or datetime column to float64 for binning.
+        Args:
+            values (pd.Series or array-like): The values.
+    """
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(values.dtype):
+        return values.to_numpy(dtype="datetime64[ns]").astype(np.int64).astype(np.float64)
+    if not pd.api.types.is_numeric_dtype(values.dtype):
+        return pd.to_datetime(values).to_numpy(dtype="datetime64[ns]").astype(np.int64).astype(np.float64)
+    return values.to_numpy(dtype=np.float64)
+
+
+def density_raster(x, y, width=800, height=600):
+    """
+        Count points on a fixed-resolution grid, so that drawing costs the same for any number of rows.
+        Args:
+            x (array-like): The x coordinates.
+            y (array-like): The y coordinates.
+            width (int): Number of horizontal bins (pixels).
+            height (int): Number of vertical bins (pixels).
+        Returns:
+            tuple: (counts with shape (height, width), extent (xmin, xmax, ymin, ymax)).
+    """
+    x, y = as_float(x), as_float(y)
+    keep = ~(np.isnan(x) | np.isnan(y))
+    x, y = x[keep], y[keep]
+    if x.size == 0:
+        return np.zeros((height, width)), (0.0, 1.0, 0.0, 1.0)
+    extent = (x.min(), x.max() if x.max() > x.min() else x.min() + 1,
+              y.min(), y.max() if y.max() > y.min() else y.min() + 1)
+    counts, _, _ = np.histogram2d(y, x, bins=[height, width], range=[extent[2:], extent[:2]])
+    return counts, extent
+
+
+def minmax_indices(x, y, pixels=1000):
+    """
+        Select the rows with the smallest and largest y in every pixel column, in their original order.
+        A line through these rows looks the same as a line through all of them at this width.
+        Args:
+            x (array-like): The x values (numeric or datetime).
+            y (array-like): The y values.
+            pixels (int): Number of pixel columns.
+    """
+    x, y = as_float(x), as_float(y)
+    valid = np.flatnonzero(~(np.isnan(x) | np.isnan(y)))
+    if valid.size <= 2 * pixels:
+        return valid
+    x, y = x[valid], y[valid]
+    span = x.max() - x.min()
+    columns = np.minimum(((x - x.min()) / (span if span > 0 else 1) * pixels).astype(np.int64), pixels - 1)
+    order = np.lexsort((y, columns))
+    boundaries = np.flatnonzero(np.diff(columns[order])) + 1
+    firsts = np.concatenate(([0], boundaries))
+    lasts = np.concatenate((boundaries - 1, [order.size - 1]))
+    return valid[np.unique(np.concatenate((order[firsts], order[lasts])))]
+
+
+def lttb_indices(x, y, threshold=1000):
+    """
+        Largest-Triangle-Three-Buckets downsampling: keep `threshold` rows that preserve the
+        visual shape of the series.
+        Args:
+            x (array-like): The x values (numeric or datetime), in plotting order.
+            y (array-like): The y values.
+            threshold (int): Number of rows to keep.
+    """
+    x, y = as_float(x), as_float(y)
+    valid = np.flatnonzero(~(np.isnan(x) | np.isnan(y)))
+    if valid.size <= threshold or threshold < 3:
+        return valid
+    x, y = x[valid], y[valid]
+    edges = np.linspace(1, x.size - 1, threshold - 1).astype(np.int64)
+    selected = [0]
+    for bucket in range(threshold - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        following = slice(edges[bucket + 1], edges[bucket + 2] if bucket + 2 < len(edges) else x.size)
+        next_x, next_y = x[following].mean(), y[following].mean()
+        previous = selected[-1]
+        areas = np.abs((x[previous] - next_x) * (y[start:stop] - y[previous])
+                       - (x[previous] - x[start:stop]) * (next_y - y[previous]))
+        selected.append(start + int(np.argmax(areas)))
+    selected.append(x.size - 1)
+    return valid[np.array(selected)]
+
+
+def voxel_counts(x, y, z, bins=40):
+    """
+        Count points in a 3D grid and return the centres of the non-empty cells with their counts.
+        Args:
+            x, y, z (array-like): The coordinates.
+            bins (int): Number of cells along each axis.
+    """
+    points = np.column_stack((as_float(x), as_float(y), as_float(z)))
+    points = points[~np.isnan(points).any(axis=1)]
+    counts, edges = np.histogramdd(points, bins=bins)
+    centres = [(edge[:-1] + edge[1:]) / 2 for edge in edges]
+    i, j, k = np.nonzero(counts)
+    return centres[0][i], centres[1][j], centres[2][k], counts[i, j, k]
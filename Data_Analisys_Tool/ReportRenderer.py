@@ -0,0 +1,144 @@
+import contextlib
+import html
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_pdf import PdfPages
+
+from DataAnalyzer import DataAnalyzer
+from DataVisualization import Visualization
+
+# Short plot names accepted in report specs, next to the Visualization method names themselves
+PLOTS = {
+    "histogram": "plot_histogram",
+    "scatter": "scatter_plot",
+    "line": "line_plot",
+    "bar_chart": "bar_chart",
+    "pie": "pie_chart",
+    "heatmap": "heatmap",
+    "pair": "pair_plot",
+    "violin": "violin_plot",
+    "density": "density_plot",
+    "bar": "bar_plot",
+    "time_series": "time_series_plot",
+    "scatter_3d": "scatter_3d_plot",
+    "scatter_matrix": "pairwise_scatter_matrix",
+    "boxen": "boxen_plot",
+}
+
+_visualizer = None
+
+
+def _init_worker(dataset, cache):
+    # Each worker unpickles the dataset and the analyzer cache once and keeps them for all its plots
+    global _visualizer
+    matplotlib.use("Agg")
+    _visualizer = Visualization(dataset, DataAnalyzer(dataset, cache))
+
+
+def _render(task):
+    index, spec, output_dir, formats = task
+    plot = spec["plot"]
+    name = spec.get("name") or f"{index:03d}_{plot}"
+    paths = [os.path.join(output_dir, f"{name}.{extension}") for extension in formats]
+    start = time.perf_counter()
+    messages = io.StringIO()
+    try:
+        method = getattr(_visualizer, PLOTS.get(plot, plot))
+        args = spec.get("args", [])
+        plt.close("all")
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+        _visualizer.output_path = paths
+        # The plotting methods report problems by printing, so capture that as the error text
+        with contextlib.redirect_stdout(messages):
+            if isinstance(args, dict):
+                method(**args)
+            else:
+                method(*args)
+        error = None if all(os.path.exists(path) for path in paths) else messages.getvalue().strip() or "No figure written"
+    except Exception as e:
+        error = f"{type(e).__name__}: {str(e)}"
+    finally:
+        plt.close("all")
+    return {"name": name, "plot": plot, "title": spec.get("title", name), "files": paths if error is None else [],
+            "seconds": time.perf_counter() - start, "error": error}
+
+
+def render_report(dataset, specs, output_dir, formats=("png",), report="html", workers=None, analyzer=None,
+                  title="Report"):
+    """
+        Render a list of plots to image files without a display, in a process pool, and collect them
+        into a single HTML or PDF report.
+        Args:
+            dataset (DataSet): The dataset to plot.
+            specs (list of dict): One entry per plot: {"plot": "histogram", "args": ["price"]}.
+                "plot" is a short name from PLOTS or a Visualization method name; "args" is a list of
+                positional or a dict of keyword arguments; "name" and "title" are optional.
+            output_dir (str): Directory for the image files and the report.
+            formats (tuple of str): Image formats to write, e.g. ("png", "svg").
+            report (str, optional): "html", "pdf" or None for no report.
+            workers (int, optional): Number of worker processes. Defaults to the CPU count.
+            analyzer (DataAnalyzer, optional): Analyzer whose cached aggregates are shipped to the workers.
+            title (str): The report title.
+        Returns:
+            dict: {"report": report path or None, "plots": per-plot file paths, timings and errors}.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    formats = tuple(formats)
+    if report == "pdf" and "png" not in formats:
+        formats += ("png",)
+    cache = analyzer.cache if analyzer is not None else None
+    tasks = [(index, spec, output_dir, formats) for index, spec in enumerate(specs)]
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_init_worker,
+                             initargs=(dataset, cache)) as executor:
+        results = list(executor.map(_render, tasks))
+
+    path = None
+    if report == "html":
+        path = os.path.join(output_dir, "report.html")
+        _write_html(path, results, title, formats[0])
+    elif report == "pdf":
+        path = os.path.join(output_dir, "report.pdf")
+        _write_pdf(path, results, title)
+    return {"report": path, "plots": results}
+
+
+def _write_html(path, results, title, image_format):
+    sections = []
+    for result in results:
+        heading = f"<h2>{html.escape(result['title'])}</h2>"
+        if result["error"]:
+            body = f"<p class=\"error\">{html.escape(result['error'])}</p>"
+        else:
+            image = next(file for file in result["files"] if file.endswith(f".{image_format}"))
+            body = f"<img src=\"{html.escape(os.path.basename(image))}\" alt=\"{html.escape(result['title'])}\">"
+        sections.append(f"<section>{heading}{body}</section>")
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(f"<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>{html.escape(title)}</title>"
+                   "<style>img{max-width:100%}.error{color:#b00}</style></head>"
+                   f"<body><h1>{html.escape(title)}</h1>\n" + "\n".join(sections) + "\n</body></html>\n")
+
+
+def _write_pdf(path, results, title):
+    # One page per plot, built from the PNG files the workers wrote
+    with PdfPages(path) as pdf:
+        for result in results:
+            figure = plt.figure(figsize=(8.27, 11.69))
+            figure.suptitle(result["title"])
+            if result["error"]:
+                figure.text(0.5, 0.5, result["error"], ha="center", wrap=True, color="#b00")
+            else:
+                image = plt.imread(next(file for file in result["files"] if file.endswith(".png")))
+                axes = figure.add_axes((0.05, 0.05, 0.9, 0.85))
+                axes.imshow(image)
+                axes.axis("off")
+            pdf.savefig(figure)
+            plt.close(figure)
+        pdf.infodict()["Title"] = title
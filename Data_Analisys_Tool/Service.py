@@ -0,0 +1,325 @@
+import asyncio
+import hashlib
+import io
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+import matplotlib
+
+from Pipeline import call, load_dataset, statistic_method, step_args, to_json
+from DataAnalyzer import DataAnalyzer
+from StatisticsCache import StatisticsCache
+from Workspace import Workspace
+
+
+# Analyzer methods besides the calculate_* ones that GET requests may run; the others change the
+# analyzer's state (derive, log_transform, track, track_correlation) and are only accepted as POST
+READ_ONLY_STATISTICS = ("summarize", "histogram", "group_stats", "group_histograms", "top_correlations",
+                        "quantile_sketch", "frequency_sketch", "resample", "rolling", "ewma",
+                        "outlier_bounds", "detect_outliers", "derived_columns", "derived_values",
+                        "tracked_statistics", "cache_stats")
+
+
+class AnalysisService:
+    """
+        Local HTTP/JSON service answering statistics and plot requests from datasets kept warm in a
+        Workspace, so that a request costs the computation only, not the imports and the load.
+
+            GET    /health
+            GET    /datasets                                  the loaded datasets
+            POST   /datasets                                  {"name": ..., "path": ..., plus a pipeline "load" section}
+            GET    /datasets/<name>                           columns, rows and version
+            DELETE /datasets/<name>
+            GET    /datasets/<name>/statistics/<statistic>    ?column=price&args=...&<keyword>=<JSON value>
+            GET    /datasets/<name>/plots/<plot>              ?args=price&args=size -> PNG bytes
+            GET    /metrics                                   request, cache and coalescing counters
+
+        Statistics and plots can also be POSTed with the step as a JSON body, as in a pipeline file.
+        GET runs only read-only statistics (see READ_ONLY_STATISTICS); those changing the analyzer's
+        state, such as derive, must be POSTed.
+        Statistics run on a thread pool; plots run on a single render thread because pyplot keeps
+        global state. Computations on the same dataset take turns on its lock, since an analyzer and
+        its cache are not thread-safe, and a dataset in use is never spilled. Successful responses are
+        cached under the dataset version, so they are served without recomputation until the dataset
+        changes, and identical requests arriving while one is being computed wait for that computation
+        instead of starting their own.
+    """
+
+    def __init__(self, workspace=None, workers=None, cache=None, idle_timeout=60.0):
+        """
+            Args:
+                workspace (Workspace, optional): The datasets to serve. Defaults to an empty workspace.
+                workers (int, optional): Number of statistics threads. Defaults to the CPU count.
+                cache (StatisticsCache, optional): Cache for encoded responses. Defaults to 1024 entries
+                    within 256 MiB.
+                idle_timeout (float): Seconds an idle keep-alive connection is kept open.
+        """
+        matplotlib.use("Agg")
+        self.workspace = workspace if workspace is not None else Workspace()
+        self.statistics_pool = ThreadPoolExecutor(max_workers=workers or os.cpu_count())
+        self.render_pool = ThreadPoolExecutor(max_workers=1)
+        self.cache = cache if cache is not None else StatisticsCache(memory_budget=256 * 1024 * 1024)
+        self.idle_timeout = idle_timeout
+        self.counters = {"requests": 0, "connections": 0, "cache_hits": 0, "coalesced": 0, "computed": 0}
+        self._inflight = {}
+
+    async def start(self, host="127.0.0.1", port=8765):
+        """
+            Start listening and return the asyncio server.
+        """
+        return await asyncio.start_server(self._connection, host, port)
+
+    def run(self, host="127.0.0.1", port=8765):
+        """
+            Serve until interrupted.
+        """
+
+        async def serve():
+            server = await self.start(host, port)
+            address = server.sockets[0].getsockname()
+            print(f"Serving on http://{address[0]}:{address[1]}")
+            async with server:
+                await server.serve_forever()
+
+        try:
+            asyncio.run(serve())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+    def close(self):
+        self.statistics_pool.shutdown(cancel_futures=True)
+        self.render_pool.shutdown(cancel_futures=True)
+        self.workspace.close()
+
+    async def _connection(self, reader, writer):
+        # HTTP/1.1 keep-alive: one connection serves requests until the client closes it or goes idle
+        self.counters["connections"] += 1
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.idle_timeout)
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError,
+                        ConnectionError):
+                    break
+                request_line, *header_lines = head.decode("latin-1").rstrip("\r\n").split("\r\n")
+                parts = request_line.split(" ")
+                if len(parts) != 3:
+                    await self._respond(writer, *_json_response(HTTPStatus.BAD_REQUEST, "Malformed request line"),
+                                        keep_alive=False)
+                    break
+                method, target, version = parts
+                headers = {}
+                for line in header_lines:
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = headers.get("content-length") or "0"
+                if not length.isdigit():
+                    await self._respond(writer, *_json_response(HTTPStatus.BAD_REQUEST, "Malformed Content-Length"),
+                                        keep_alive=False)
+                    break
+                try:
+                    body = await reader.readexactly(int(length))
+                except asyncio.IncompleteReadError:
+                    break
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+
+                self.counters["requests"] += 1
+                try:
+                    response = await self.handle(method, target, body, headers)
+                except Exception as e:
+                    response = _json_response(HTTPStatus.INTERNAL_SERVER_ERROR, f"{type(e).__name__}: {str(e)}")
+                await self._respond(writer, *response, keep_alive=keep_alive)
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, content_type, payload, headers=None, keep_alive=True):
+        lines = [f"HTTP/1.1 {status.value} {status.phrase}", f"Content-Type: {content_type}",
+                 f"Content-Length: {len(payload)}", f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + payload)
+        await writer.drain()
+
+    async def handle(self, method, target, body=b"", headers=None):
+        """
+            Answer one request.
+            Returns:
+                tuple: (HTTPStatus, content type, payload bytes, extra headers).
+        """
+        url = urlsplit(target)
+        path = [unquote(part) for part in url.path.strip("/").split("/") if part]
+        try:
+            options = json.loads(body) if body else {}
+        except ValueError:
+            return _json_response(HTTPStatus.BAD_REQUEST, "The request body is not valid JSON")
+        for name, value in parse_qsl(url.query):
+            value = _parse_value(value)
+            if name == "args":
+                options.setdefault("args", []).append(value)
+            else:
+                options[name] = value
+
+        if path == ["health"] and method == "GET":
+            return _json_response(HTTPStatus.OK, {"status": "ok", "datasets": len(self.workspace.names())})
+        if path == ["metrics"] and method == "GET":
+            return _json_response(HTTPStatus.OK, {**self.counters, "cache": self.cache.stats()})
+        if path == ["datasets"]:
+            if method == "GET":
+                return _json_response(HTTPStatus.OK, [self._describe(name) for name in self.workspace.names()])
+            if method == "POST":
+                return await self._load(options)
+        if not path or path[0] != "datasets" or len(path) < 2:
+            return _json_response(HTTPStatus.NOT_FOUND, f"No route for {method} {url.path}")
+
+        name = path[1]
+        entry = self.workspace.entries.get(name)
+        if entry is None:
+            return _json_response(HTTPStatus.NOT_FOUND, f"Dataset '{name}' not found")
+        if len(path) == 2:
+            if method == "GET":
+                return _json_response(HTTPStatus.OK, self._describe(name))
+            if method == "DELETE":
+                self.workspace.remove(name)
+                return _json_response(HTTPStatus.OK, {"removed": name})
+        if len(path) == 4 and method in ("GET", "POST") and path[2] in ("statistics", "plots"):
+            kind, operation = path[2], path[3]
+            if kind == "statistics" and method == "GET" and not _read_only(operation):
+                # Methods that change the analyzer's state (derive, track, ...) must be POSTed
+                return _json_response(HTTPStatus.METHOD_NOT_ALLOWED,
+                                      f"'{operation}' changes the dataset state; use POST")
+            # The version and the derived columns are part of the key, so a changed dataset never gets
+            # an older answer
+            key = (name, entry.dataset.uid, entry.dataset.version,
+                   tuple(sorted(entry.analyzer.derived_columns().items())), kind, operation,
+                   json.dumps(options, sort_keys=True, default=str))
+            # A digest rather than hash(), which is salted per process, so that ETags survive a restart
+            etag = f"\"{hashlib.sha1(repr(key).encode('utf-8')).hexdigest()[:16]}\""
+            if headers and headers.get("if-none-match") == etag:
+                return HTTPStatus.NOT_MODIFIED, "application/json", b"", {"ETag": etag}
+            if kind == "statistics":
+                response = await self._cached(key, self.statistics_pool, self._statistic, name, operation, options)
+            else:
+                response = await self._cached(key, self.render_pool, self._plot, name, operation, options)
+            if response[0] == HTTPStatus.OK:
+                response = response[:3] + ({**response[3], "ETag": etag},)
+            return response
+        return _json_response(HTTPStatus.NOT_FOUND, f"No route for {method} {url.path}")
+
+    async def _cached(self, key, pool, function, *args):
+        found, response = self.cache.get(key)
+        if found:
+            self.counters["cache_hits"] += 1
+            return response
+        future = self._inflight.get(key)
+        if future is None:
+            self.counters["computed"] += 1
+            future = asyncio.get_running_loop().run_in_executor(pool, function, *args)
+            self._inflight[key] = future
+            future.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            self.counters["coalesced"] += 1
+        # Shielded, so that a client disconnecting does not cancel the work other requests wait for
+        return await asyncio.shield(future)
+
+    def _finished(self, key, future):
+        self._inflight.pop(key, None)
+        if not future.cancelled() and future.exception() is None and future.result()[0] == HTTPStatus.OK:
+            self.cache.put(key, future.result())
+
+    async def _load(self, load):
+        name = load.get("name")
+        if not name or "path" not in load:
+            return _json_response(HTTPStatus.BAD_REQUEST, "A dataset needs a name and a path")
+
+        def work():
+            start = time.perf_counter()
+            dataset = load_dataset(load)
+            self.workspace.add(name, dataset)
+            return {**self._describe(name), "load_seconds": time.perf_counter() - start}
+
+        try:
+            described = await asyncio.get_running_loop().run_in_executor(self.statistics_pool, work)
+        except Exception as e:
+            return _json_response(HTTPStatus.BAD_REQUEST, f"{type(e).__name__}: {str(e)}")
+        return _json_response(HTTPStatus.CREATED, described)
+
+    def _describe(self, name):
+        dataset = self.workspace.entries[name].dataset
+        return {"name": name, "columns": dataset.get_column_names(), "version": dataset.version,
+                "rows": None if dataset.is_streaming() else dataset.num_rows(),
+                "spilled": dataset.is_spilled(), "streaming": dataset.is_streaming()}
+
+    def _statistic(self, name, statistic, options):
+        entry = self.workspace.entries.get(name)
+        if entry is None:
+            return _json_response(HTTPStatus.NOT_FOUND, f"Dataset '{name}' not found")
+        # One computation at a time per dataset: the analyzer, its cache and the dataset are not thread-safe
+        with entry.lock:
+            if self.workspace.get(name) is not entry:
+                return _json_response(HTTPStatus.NOT_FOUND, f"Dataset '{name}' not found")
+            args, kwargs = step_args(options)
+            value, error = call(statistic_method(entry.analyzer, statistic), *args, **kwargs)
+            version = entry.dataset.version
+        # Datasets skipped by the budget while they were in use can be spilled now
+        self.workspace.enforce_budget()
+        if error is not None:
+            return _json_response(HTTPStatus.BAD_REQUEST, error)
+        return _json_response(HTTPStatus.OK, {"dataset": name, "version": version,
+                                              "statistic": statistic, "value": to_json(value)})
+
+    def _plot(self, name, plot, options):
+        # Runs on the single render thread: pyplot figures are global state
+        from ReportRenderer import PLOTS
+        entry = self.workspace.entries.get(name)
+        if entry is None:
+            return _json_response(HTTPStatus.NOT_FOUND, f"Dataset '{name}' not found")
+        visualizer = entry.visualizer
+        method = getattr(visualizer, PLOTS.get(plot, plot), None)
+        if method is None or (plot not in PLOTS and plot not in PLOTS.values()):
+            return _json_response(HTTPStatus.NOT_FOUND, f"Unknown plot '{plot}'")
+        args, kwargs = step_args(options)
+        image = io.BytesIO()
+        with entry.lock:
+            if self.workspace.get(name) is not entry:
+                return _json_response(HTTPStatus.NOT_FOUND, f"Dataset '{name}' not found")
+            visualizer.output_path = image
+            try:
+                _, error = call(method, *args, **kwargs)
+            finally:
+                visualizer.output_path = None
+        self.workspace.enforce_budget()
+        if error is None and not image.getvalue():
+            error = "No figure written"
+        if error is not None:
+            return _json_response(HTTPStatus.BAD_REQUEST, error)
+        return HTTPStatus.OK, "image/png", image.getvalue(), {}
+
+
+def _read_only(statistic):
+    # Statistics a GET may run: the calculate_* methods and the analyses that only read the data
+    return (statistic.startswith("calculate_") or hasattr(DataAnalyzer, f"calculate_{statistic}")
+            or statistic in READ_ONLY_STATISTICS)
+
+
+def _json_response(status, content):
+    if status.value >= 400:
+        content = {"error": content}
+    return status, "application/json", json.dumps(content).encode("utf-8"), {}
+
+
+def _parse_value(text):
+    # Query values are JSON when they parse as JSON (numbers, true/false, lists), text otherwise
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
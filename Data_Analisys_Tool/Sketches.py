@@ -0,0 +1,166 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+
+class QuantileSketch:
+    """
+        KLL quantile sketch over a numeric column.
+        Keeps O(k log(n / k)) values in weighted levels; each level is compacted by sorting it and
+        promoting every other value (with doubled weight) to the level above. Sketches built over
+        different chunks or files can be merged.
+    """
+
+    def __init__(self, epsilon=0.01, seed=None):
+        """
+            Args:
+                epsilon (float): Target normalized rank error, e.g. 0.01 for ranks within +/- 1%.
+                seed (int, optional): Seed for the compaction coin flips.
+        """
+        self.epsilon = epsilon
+        self.k = max(8, math.ceil(3.3 / epsilon))
+        self.count = 0
+        self.min = np.nan
+        self.max = np.nan
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        """
+            Add a batch of values to the sketch. Missing values are skipped.
+            Args:
+                values (array-like): The new values.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return self
+        self.count += values.size
+        self.min = np.nanmin([self.min, values.min()])
+        self.max = np.nanmax([self.max, values.max()])
+        self.levels[0] = np.concatenate((self.levels[0], values))
+        self._compress()
+        return self
+
+    def merge(self, other):
+        """
+            Merge another sketch into this one.
+            Args:
+                other (QuantileSketch): The sketch to merge.
+        """
+        if other.count == 0:
+            return self
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for height, level in enumerate(other.levels):
+            self.levels[height] = np.concatenate((self.levels[height], level))
+        self.count += other.count
+        self.min = np.nanmin([self.min, other.min])
+        self.max = np.nanmax([self.max, other.max])
+        self._compress()
+        return self
+
+    def _capacity(self, height):
+        depth = len(self.levels) - height - 1
+        return max(2, math.ceil(self.k * (2 / 3) ** depth))
+
+    def _compress(self):
+        while True:
+            height = next((height for height, level in enumerate(self.levels)
+                           if level.size > self._capacity(height)), None)
+            if height is None:
+                return
+            if height + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            level = np.sort(self.levels[height])
+            # An odd leftover stays behind so that the total weight is preserved exactly
+            keep = level[-1:] if level.size % 2 else level[:0]
+            pairs = level[:level.size - keep.size]
+            self.levels[height] = keep
+            self.levels[height + 1] = np.concatenate((self.levels[height + 1], pairs[self._rng.integers(2)::2]))
+
+    def quantile(self, q):
+        """
+            Estimate one or more quantiles.
+            Args:
+                q (float or list of float): Quantiles between 0 and 1.
+        """
+        q = np.asarray(q, dtype=np.float64)
+        if self.count == 0:
+            return np.full(q.shape, np.nan) if q.ndim else np.nan
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(level.size, 2 ** height, dtype=np.float64)
+                                  for height, level in enumerate(self.levels)])
+        order = np.argsort(values, kind="stable")
+        values, cumulative = values[order], np.cumsum(weights[order])
+        # Interpolated ranks, matching np.percentile's linear method for exact data
+        positions = q * (self.count - 1) + 1
+        result = np.interp(positions, cumulative, values)
+        result = np.where(q <= 0, self.min, np.where(q >= 1, self.max, result))
+        return result if q.ndim else float(result)
+
+    def size(self):
+        return sum(level.size for level in self.levels)
+
+
+class FrequentItemsSketch:
+    """
+        Misra-Gries heavy-hitters summary for estimating the mode of huge columns.
+        Keeps at most `capacity` counters; counts are underestimated by at most
+        count / (capacity + 1), and summaries over different chunks or files can be merged.
+    """
+
+    def __init__(self, epsilon=0.001):
+        """
+            Args:
+                epsilon (float): Largest error of an estimated count, as a fraction of all values.
+        """
+        self.epsilon = epsilon
+        self.capacity = math.ceil(1 / epsilon)
+        self.count = 0
+        self.counters = {}
+
+    def update(self, values):
+        """
+            Add a batch of values to the summary. Missing values are skipped.
+            Args:
+                values (pd.Series or array-like): The new values.
+        """
+        counts = pd.Series(values).value_counts(dropna=True)
+        if counts.empty:
+            return self
+        batch = FrequentItemsSketch(self.epsilon)
+        batch.count = int(counts.sum())
+        batch.counters = dict(zip(counts.index.tolist(), counts.tolist()))
+        return self.merge(batch)
+
+    def merge(self, other):
+        """
+            Merge another summary into this one.
+            Args:
+                other (FrequentItemsSketch): The summary to merge.
+        """
+        counters = dict(self.counters)
+        for item, count in other.counters.items():
+            counters[item] = counters.get(item, 0) + count
+        if len(counters) > self.capacity:
+            threshold = sorted(counters.values(), reverse=True)[self.capacity]
+            counters = {item: count - threshold for item, count in counters.items() if count > threshold}
+        self.counters = counters
+        self.count += other.count
+        return self
+
+    def most_frequent(self, n=1):
+        """
+            Return the `n` items with the highest estimated counts, as (item, count) pairs.
+            Ties are broken by the smaller item, like pandas' `mode`.
+        """
+        return sorted(self.counters.items(), key=lambda pair: (-pair[1], pair[0]))[:n]
+
+    def mode(self):
+        top = self.most_frequent(1)
+        return top[0][0] if top else np.nan
+
+    def error_bound(self):
+        return self.count / (self.capacity + 1)
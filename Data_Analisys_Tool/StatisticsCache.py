@@ -0,0 +1,150 @@
+import copy
+import functools
+import sys
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+class StatisticsCache:
+    """
+        LRU cache for computed statistics with an entry limit and an approximate memory budget.
+        Keys are built by the caller and should include the dataset version, so that stale
+        results are never returned after the data changes.
+    """
+
+    def __init__(self, max_entries=1024, memory_budget=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.memory_budget = memory_budget
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._memory = 0
+        self._generation = None
+
+    def get(self, key):
+        """
+            Look up a key.
+            Args:
+                key (tuple): The cache key.
+            Returns:
+                tuple: (found, value).
+        """
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, self._entries[key][0]
+        self.misses += 1
+        return False, None
+
+    def put(self, key, value):
+        """
+            Store a value, evicting the least recently used entries to stay within budget.
+            Values larger than the whole budget are not stored.
+            Args:
+                key (tuple): The cache key.
+                value: The value to store.
+        """
+        size = _sizeof(value)
+        if size > self.memory_budget:
+            return
+        if key in self._entries:
+            self._memory -= self._entries.pop(key)[1]
+        self._entries[key] = (value, size)
+        self._memory += size
+        while len(self._entries) > self.max_entries or self._memory > self.memory_budget:
+            self._memory -= self._entries.popitem(last=False)[1][1]
+
+    def bind(self, generation):
+        """
+            Drop every entry when the data the cache is bound to changes.
+            Args:
+                generation (tuple): Identifies the dataset and its version.
+        """
+        if generation != self._generation:
+            self.invalidate()
+            self._generation = generation
+
+    def invalidate(self):
+        """
+            Drop every cached entry. Entries of older dataset versions need no separate dropping:
+            `bind` clears them all as soon as the version changes.
+        """
+        self._entries.clear()
+        self._memory = 0
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "memory": self._memory,
+        }
+
+
+def cached_statistic(function):
+    """
+        Cache the result of a DataAnalyzer method under (arguments, statistic, dataset version).
+        Error messages and missing results are not cached, and neither are calls whose arguments cannot
+        be made hashable (e.g. arrays). Mutable results (frames, arrays, sketches, histogram bins) are
+        copied into the cache and out of it again on every hit, so a caller changing its result cannot
+        alter later answers.
+    """
+
+    @functools.wraps(function)
+    def wrapper(self, *args, **kwargs):
+        if self.dataset is None or self.cache is None:
+            return function(self, *args, **kwargs)
+
+        generation = (self.dataset.uid, self.dataset.version)
+        self.cache.bind(generation)
+        key = (_freeze(args), _freeze(sorted(kwargs.items())), function.__name__) + generation
+        try:
+            hash(key)
+        except TypeError:
+            return function(self, *args, **kwargs)
+        found, value = self.cache.get(key)
+        if found:
+            return _detached(value)
+        value = function(self, *args, **kwargs)
+        if value is not None and not isinstance(value, str):
+            self.cache.put(key, _detached(value))
+        return value
+
+    return wrapper
+
+
+def _detached(value):
+    # A copy of a mutable result; scalars, strings and read-only arrays are shared as they are
+    if value is None or isinstance(value, (str, bytes, int, float, complex, np.generic)):
+        return value
+    if isinstance(value, tuple):
+        return tuple(_detached(item) for item in value)
+    if isinstance(value, np.ndarray):
+        return value.copy() if value.flags.writeable else value
+    if isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+        return value.copy(deep=True)
+    return copy.deepcopy(value)
+
+
+def _freeze(value):
+    # A hashable stand-in for an argument; the type is kept so that e.g. a dict and its items differ
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return dict, frozenset((_freeze(name), _freeze(item)) for name, item in value.items())
+    if isinstance(value, (set, frozenset)):
+        return frozenset, frozenset(_freeze(item) for item in value)
+    return value
+
+
+def _sizeof(value):
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(_sizeof(item) for item in value)
+    if hasattr(value, "memory_usage") and callable(value.memory_usage):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum()) if hasattr(usage, "sum") else int(usage)
+    if hasattr(value, "nbytes"):
+        return int(value.nbytes)
+    return sys.getsizeof(value)
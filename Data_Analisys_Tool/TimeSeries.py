@@ -0,0 +1,296 @@
+import math
+
+import numpy as np
+import pandas as pd
+from pandas.api.indexers import BaseIndexer
+from scipy.signal import lfilter
+
+# Statistics of a rolling window answered from cumulative sums, in O(1) per row
+MOMENT_STATISTICS = ("count", "sum", "mean", "std_deviation", "variance")
+# Statistics of a rolling window answered by pandas' sliding-window kernels (monotonic deques and a skiplist)
+ORDER_STATISTICS = ("min", "max", "quantile")
+# Statistics of a resampled bucket
+RESAMPLE_STATISTICS = ("count", "sum", "mean", "std_deviation", "variance", "min", "max", "first", "last")
+
+
+def time_values(values):
+    """
+        Convert a time column to numbers that can be bucketed and searched.
+        Numeric columns become float64; datetime columns, and text columns holding dates, become int64
+        nanoseconds since the epoch.
+        Args:
+            values (pd.Series or array-like): The time column.
+        Returns:
+            tuple: (values, whether they are datetimes, mask of the missing times).
+    """
+    values = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(values.dtype) and not pd.api.types.is_bool_dtype(values.dtype):
+        numbers = values.to_numpy(dtype=np.float64)
+        return numbers, False, np.isnan(numbers)
+    if not pd.api.types.is_datetime64_any_dtype(values.dtype):
+        values = pd.to_datetime(values)
+    missing = values.isna().to_numpy()
+    return values.to_numpy(dtype="datetime64[ns]").astype(np.int64), True, missing
+
+
+def time_step(interval, is_datetime):
+    """
+        Convert an interval ("15min", pd.Timedelta, or a number for numeric time columns) to the units
+        returned by `time_values`.
+    """
+    if is_datetime:
+        return pd.Timedelta(interval).value
+    return float(interval)
+
+
+def smoothing_factor(span=None, alpha=None, halflife=None, com=None):
+    """
+        Return the EWMA smoothing factor from exactly one of its usual parametrisations (as in pandas.ewm).
+    """
+    given = [value is not None for value in (span, alpha, halflife, com)]
+    if sum(given) != 1:
+        raise ValueError("Give exactly one of span, alpha, halflife and com")
+    if span is not None:
+        return 2.0 / (span + 1.0)
+    if halflife is not None:
+        return 1.0 - math.exp(math.log(0.5) / halflife)
+    if com is not None:
+        return 1.0 / (1.0 + com)
+    if not 0 < alpha <= 1:
+        raise ValueError("alpha must be in (0, 1]")
+    return alpha
+
+
+class _Windows(BaseIndexer):
+    # Hands precomputed window bounds to pandas' rolling kernels
+    def get_window_bounds(self, num_values=0, min_periods=None, center=None, closed=None, step=None):
+        return self.start, self.end
+
+
+def window_starts(count, window, times=None):
+    """
+        Return the index of the first row in the window ending at each row.
+        Args:
+            count (int): Number of rows.
+            window (int or float): Number of rows, or with `times` the length of the window in time units;
+                the window of a row then covers the times in (t - window, t].
+            times (np.ndarray, optional): Non-decreasing times of the rows.
+    """
+    if times is None:
+        return np.maximum(np.arange(count, dtype=np.int64) - int(window) + 1, 0)
+    return np.searchsorted(times, times - window, side="right").astype(np.int64)
+
+
+def rolling_table(values, starts, stats, quantile=0.5, min_periods=1):
+    """
+        Rolling statistics of a float array over precomputed windows [starts[i], i].
+        Count, sum, mean, variance and standard deviation come from differences of cumulative sums, so each
+        row costs O(1) whatever the window length. The values are centred first, which keeps the sums small
+        and the variance accurate. Missing values are skipped.
+        Args:
+            values (np.ndarray): The float values.
+            starts (np.ndarray): The first row of each window (see window_starts).
+            stats (list of str): Statistics from MOMENT_STATISTICS and ORDER_STATISTICS.
+            quantile (float): The quantile computed for "quantile".
+            min_periods (int): Fewest values a window needs for a result; NaN otherwise.
+        Returns:
+            dict: {statistic: np.ndarray with one value per row}.
+    """
+    ends = np.arange(1, values.size + 1, dtype=np.int64)
+    table = {}
+    if any(stat in MOMENT_STATISTICS for stat in stats):
+        valid = ~np.isnan(values)
+        shift = values[valid].mean() if valid.any() else 0.0
+        centred = np.where(valid, values - shift, 0.0)
+        counts = np.concatenate(([0], np.cumsum(valid)))
+        sums = np.concatenate(([0.0], np.cumsum(centred)))
+        squares = np.concatenate(([0.0], np.cumsum(centred * centred)))
+        count = counts[ends] - counts[starts]
+        enough = count >= max(min_periods, 1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            total = sums[ends] - sums[starts]
+            mean = total / count
+            variance = np.maximum((squares[ends] - squares[starts]) / count - mean * mean, 0.0)
+        for stat in stats:
+            if stat == "count":
+                table[stat] = count.astype(np.float64)
+            elif stat == "sum":
+                table[stat] = np.where(enough, total + shift * count, np.nan)
+            elif stat == "mean":
+                table[stat] = np.where(enough, mean + shift, np.nan)
+            elif stat == "variance":
+                table[stat] = np.where(enough, variance, np.nan)
+            elif stat == "std_deviation":
+                table[stat] = np.where(enough, np.sqrt(variance), np.nan)
+
+    if any(stat in ORDER_STATISTICS for stat in stats):
+        rolling = pd.Series(values).rolling(_Windows(start=starts, end=ends), min_periods=max(min_periods, 1))
+        for stat in stats:
+            if stat == "min":
+                table[stat] = rolling.min().to_numpy()
+            elif stat == "max":
+                table[stat] = rolling.max().to_numpy()
+            elif stat == "quantile":
+                table[stat] = rolling.quantile(quantile).to_numpy()
+    return table
+
+
+class RollingWindow:
+    """
+        Rolling statistics over a series read chunk by chunk. The rows of earlier chunks that the windows
+        of later rows still reach are carried over, so the results equal a single pass over the whole series.
+    """
+
+    def __init__(self, window, stats=("mean",), quantile=0.5, min_periods=1):
+        """
+            Args:
+                window (int or float): Number of rows, or the length of the window in time units when
+                    times are passed to `update`.
+                stats (list of str): Statistics from MOMENT_STATISTICS and ORDER_STATISTICS.
+                quantile (float): The quantile computed for "quantile".
+                min_periods (int): Fewest values a window needs for a result.
+        """
+        unknown = [stat for stat in stats if stat not in MOMENT_STATISTICS + ORDER_STATISTICS]
+        if unknown:
+            raise ValueError(f"Unknown statistic '{unknown[0]}'")
+        self.window = window
+        self.stats = list(stats)
+        self.quantile = quantile
+        self.min_periods = min_periods
+        self._values = np.zeros(0)
+        self._times = None
+
+    def update(self, values, times=None):
+        """
+            Add the next rows and return their rolling statistics.
+            Args:
+                values (array-like): The values of the new rows.
+                times (np.ndarray, optional): Their times, for a time-based window.
+            Returns:
+                dict: {statistic: np.ndarray with one value per new row}.
+        """
+        carried = self._values.size
+        values = np.concatenate((self._values, np.asarray(values, dtype=np.float64)))
+        if times is not None:
+            times = np.concatenate((self._times, times)) if self._times is not None else np.asarray(times)
+            if np.any(np.diff(times) < 0):
+                raise ValueError("The time column must be sorted for a time-based window")
+        starts = window_starts(values.size, self.window, times)
+        table = rolling_table(values, starts, self.stats, self.quantile, self.min_periods)
+
+        keep = starts[-1] if values.size else 0
+        self._values = values[keep:]
+        self._times = times[keep:] if times is not None else None
+        return {stat: column[carried:] for stat, column in table.items()}
+
+
+class ExponentialAverage:
+    """
+        Exponentially weighted moving average, y[i] = alpha * x[i] + (1 - alpha) * y[i - 1], computed by a
+        linear filter over each chunk. The last average is carried to the next chunk. Missing values keep
+        the previous average.
+    """
+
+    def __init__(self, alpha):
+        self.alpha = alpha
+        self.last = None
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        valid = ~np.isnan(values)
+        result = np.full(values.shape, np.nan)
+        present = values[valid]
+        if present.size:
+            previous = present[0] if self.last is None else self.last
+            smoothed, _ = lfilter([self.alpha], [1.0, self.alpha - 1.0], present,
+                                  zi=[(1.0 - self.alpha) * previous])
+            result[valid] = smoothed
+        if self.last is not None and values.size and not valid[0]:
+            result[0] = self.last
+        result = pd.Series(result).ffill().to_numpy()
+        if result.size and not np.isnan(result[-1]):
+            self.last = result[-1]
+        return result
+
+
+class Resampler:
+    """
+        Aggregates of a value column per time bucket of fixed width, built chunk by chunk.
+        Each chunk is grouped on its own; the per-bucket count, sum, mean and sum of squared deviations
+        are then merged exactly, so buckets split between chunks come out as if read at once.
+    """
+
+    def __init__(self, step, is_datetime=False, origin=0, buckets=None):
+        """
+            Args:
+                step (int or float): Width of a bucket in the units of `time_values`.
+                is_datetime (bool): Whether the times are datetimes (int64 nanoseconds).
+                origin (int or float): Start of the first bucket; buckets are aligned to the epoch by default.
+                buckets (int, optional): Number of buckets from `origin`; times at the far end of the range
+                    go into the last one instead of starting another.
+        """
+        if step <= 0:
+            raise ValueError("The resampling interval must be positive")
+        self.step = step
+        self.is_datetime = is_datetime
+        self.origin = origin
+        self.buckets = buckets
+        self._parts = []
+
+    def update(self, times, values):
+        """
+            Add a chunk of rows; rows with a missing time or value are skipped.
+            Args:
+                times (np.ndarray): Times in the units of `time_values`.
+                values (array-like): The values.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        keep = ~np.isnan(values)
+        if not self.is_datetime:
+            keep &= ~np.isnan(times)
+        times, values = times[keep], values[keep]
+        if not values.size:
+            return self
+        if self.is_datetime:
+            buckets = (times - int(self.origin)) // int(self.step)
+        else:
+            buckets = np.floor((times - self.origin) / self.step).astype(np.int64)
+        if self.buckets is not None:
+            buckets = np.minimum(buckets, self.buckets - 1)
+        grouped = pd.Series(values).groupby(buckets, sort=False)
+        part = grouped.agg(["count", "sum", "min", "max", "first", "last"])
+        part["mean"] = part["sum"] / part["count"]
+        part["m2"] = grouped.var(ddof=0) * part["count"]
+        self._parts.append(part)
+        return self
+
+    def result(self, stats=("mean",)):
+        """
+            Return one row per non-empty bucket, indexed by the bucket start.
+            Args:
+                stats (list of str): Statistics from RESAMPLE_STATISTICS.
+        """
+        unknown = [stat for stat in stats if stat not in RESAMPLE_STATISTICS]
+        if unknown:
+            raise ValueError(f"Unknown statistic '{unknown[0]}'")
+        if not self._parts:
+            table = pd.DataFrame(columns=list(stats), dtype=np.float64)
+        else:
+            parts = pd.concat(self._parts)
+            grouped = parts.groupby(level=0, sort=True)
+            count = grouped["count"].sum()
+            total = grouped["sum"].sum()
+            mean = total / count
+            # Chan et al.: the spread of each part around its own mean, plus that of the part means
+            deviation = parts["mean"].to_numpy() - mean.reindex(parts.index).to_numpy()
+            m2 = (parts["m2"] + parts["count"] * deviation * deviation).groupby(level=0, sort=True).sum()
+            columns = {"count": count, "sum": total, "mean": mean, "variance": m2 / count,
+                       "std_deviation": np.sqrt(m2 / count), "min": grouped["min"].min(),
+                       "max": grouped["max"].max(), "first": grouped["first"].first(), "last": grouped["last"].last()}
+            table = pd.DataFrame({stat: columns[stat] for stat in stats})
+        buckets = table.index.to_numpy(dtype=np.int64)
+        if self.is_datetime:
+            table.index = pd.to_datetime(buckets * int(self.step) + int(self.origin), unit="ns")
+        else:
+            table.index = buckets * self.step + self.origin
+        return table
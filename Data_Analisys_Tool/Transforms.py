@@ -0,0 +1,260 @@
+import numpy as np
+import pandas as pd
+
+from Accumulators import MomentAccumulator
+
+# Transforms a derived column (DataAnalyzer.derive) or a query column (Query.derive) can apply,
+# with their parameters:
+#   log, log1p, sqrt, exp, abs
+#   standardize              (x - mean) / standard deviation, both taken over the whole column
+#   clip(lower, upper)       values limited to [lower, upper]; either bound may be omitted
+#   bin(bins=10)             bin number, from `bins` equal-width bins over the column's range or a list of edges
+TRANSFORMS = ("log", "log1p", "sqrt", "exp", "abs", "standardize", "clip", "bin")
+
+
+class Transform:
+    """
+        Expression of a derived column: a transform applied to a source column or to another expression.
+        Expressions are only descriptions; DerivedColumns evaluates them.
+    """
+
+    def __init__(self, function, source, **params):
+        """
+            Args:
+                function (str): A name from TRANSFORMS.
+                source (str or Transform): The column, or the expression, the transform applies to.
+                **params: Parameters of the transform (see TRANSFORMS).
+        """
+        if function not in TRANSFORMS:
+            raise ValueError(f"Unknown transform '{function}'")
+        if function == "clip" and params.get("lower") is None and params.get("upper") is None:
+            raise ValueError("clip needs a lower or an upper bound")
+        if function == "bin":
+            params.setdefault("bins", 10)
+            bins = params["bins"]
+            if (np.ndim(bins) == 0 and int(bins) < 1) or (np.ndim(bins) == 1 and len(bins) < 2):
+                raise ValueError("bin needs at least one bin")
+        self.function = function
+        self.source = source
+        self.params = params
+
+    @property
+    def column(self):
+        # The source column the whole expression reads
+        return self.source.column if isinstance(self.source, Transform) else self.source
+
+    def chain(self):
+        # The transforms from the innermost one out
+        inner = self.source.chain() if isinstance(self.source, Transform) else []
+        return inner + [self]
+
+    def key(self):
+        # Hashable identity of the expression, the same for equal expressions under different names
+        source = self.source.key() if isinstance(self.source, Transform) else self.source
+        params = tuple(sorted((name, tuple(value) if np.ndim(value) else value) for name, value in self.params.items()))
+        return self.function, source, params
+
+    def needs_fit(self):
+        # Whether the transform depends on statistics of its whole input
+        return self.function == "standardize" or (self.function == "bin" and np.ndim(self.params["bins"]) == 0)
+
+    def apply(self, values, fitted, out):
+        """
+            Apply this transform alone, writing into `out` (which may be `values` itself).
+            Args:
+                values (np.ndarray): The float input.
+                fitted (MomentAccumulator or None): Statistics of the whole input, for needs_fit transforms.
+                out (np.ndarray): The float output buffer.
+        """
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if self.function == "log":
+                np.log(values, out=out)
+            elif self.function == "log1p":
+                np.log1p(values, out=out)
+            elif self.function == "sqrt":
+                np.sqrt(values, out=out)
+            elif self.function == "exp":
+                np.exp(values, out=out)
+            elif self.function == "abs":
+                np.abs(values, out=out)
+            elif self.function == "standardize":
+                np.subtract(values, fitted.mean, out=out)
+                np.divide(out, fitted.standard_deviation, out=out)
+            elif self.function == "clip":
+                lower, upper = self.params.get("lower"), self.params.get("upper")
+                np.clip(values, -np.inf if lower is None else lower, np.inf if upper is None else upper, out=out)
+            elif self.function == "bin":
+                bins = self.params["bins"]
+                if np.ndim(bins) == 0:
+                    bins = int(bins)
+                    scale = bins / (fitted.max - fitted.min) if fitted.max > fitted.min else 0.0
+                    np.subtract(values, fitted.min, out=out)
+                    np.multiply(out, scale, out=out)
+                    np.floor(out, out=out)
+                    np.clip(out, 0, bins - 1, out=out)
+                else:
+                    edges = np.asarray(bins, dtype=np.float64)
+                    outside = ~((values >= edges[0]) & (values <= edges[-1]))
+                    out[:] = np.minimum(np.searchsorted(edges, values, side="right") - 1, edges.size - 2)
+                    out[outside] = np.nan
+        return out
+
+    def __repr__(self):
+        params = "".join(f", {name}={value!r}" for name, value in self.params.items())
+        return f"{self.function}({self.source!r}{params})" if isinstance(self.source, Transform) \
+            else f"{self.function}({self.source}{params})"
+
+
+class DerivedColumns:
+    """
+        Named derived columns of a dataset, stored as expressions and computed on demand.
+        A chain of transforms runs in a single float buffer: the first transform reads the raw column and
+        writes the buffer, the others update it in place through NumPy's `out=` parameters, so the raw data
+        is never modified and no intermediate arrays are allocated. A full column is kept in the statistics
+        cache once it is asked for a second time under the same dataset version; the statistics some
+        transforms need (mean and standard deviation, or range) are computed once per version.
+    """
+
+    def __init__(self, dataset, cache=None):
+        """
+            Args:
+                dataset (DataSet): The dataset holding the source columns.
+                cache (StatisticsCache, optional): Where reused columns are kept. Without it nothing is kept.
+        """
+        self.dataset = dataset
+        self.cache = cache
+        self.expressions = {}
+        self._uses = {}
+        self._fits = {}
+
+    def define(self, name, function, source, **params):
+        """
+            Define (or redefine) a derived column.
+            Args:
+                name (str): The name of the derived column; it cannot be the name of a source column.
+                function (str): A name from TRANSFORMS.
+                source (str): A source column or another derived column.
+                **params: Parameters of the transform.
+            Returns:
+                Transform: The expression of the column.
+        """
+        if name in self.dataset.get_column_names():
+            raise ValueError(f"'{name}' is already a column of the dataset")
+        transform = self.expression(function, source, **params)
+        previous = self.expressions.get(name)
+        self.expressions[name] = transform
+        if previous is not None and previous.key() != transform.key() and self.cache is not None:
+            # Statistics cached under this name were computed from the old expression
+            self.cache.invalidate()
+        return transform
+
+    def remove(self, name):
+        if self.expressions.pop(name, None) is None:
+            return False
+        if self.cache is not None:
+            self.cache.invalidate()
+        return True
+
+    def expression(self, function, source, **params):
+        """
+            Build an expression over a source column or over a derived column's expression.
+        """
+        if source in self.expressions:
+            source = self.expressions[source]
+        elif source not in self.dataset.get_column_names():
+            raise KeyError(source)
+        return Transform(function, source, **params)
+
+    def evaluate(self, transform, values, out=None):
+        """
+            Evaluate an expression over the source values of some rows.
+            Args:
+                transform (Transform): The expression.
+                values (array-like): The rows of its source column.
+                out (np.ndarray, optional): The float buffer to write; a new one by default.
+        """
+        if isinstance(values, pd.Series) and not pd.api.types.is_numeric_dtype(values.dtype):
+            raise TypeError(f"Column '{transform.column}' does not contain numeric data.")
+        # A view for float columns; the transforms only ever write to `out`
+        values = np.asarray(values, dtype=np.float64)
+        out = np.empty(values.shape) if out is None else out
+        current = values
+        for step in transform.chain():
+            step.apply(current, self._fit(step) if step.needs_fit() else None, out)
+            current = out
+        return out
+
+    def values(self, target):
+        """
+            Return all the values of a derived column (by name) or of an expression, as a read-only array.
+        """
+        transform = self.expressions[target] if isinstance(target, str) else target
+        key = ("derived", transform.key()) + self._generation()
+        if self.cache is not None:
+            self.cache.bind(self._generation())
+            found, values = self.cache.get(key)
+            if found:
+                return values
+
+        count = None if self.dataset.is_streaming() else self.dataset.num_rows()
+        if count is not None:
+            # One buffer for the whole column, filled chunk by chunk
+            values = np.empty(count)
+            start = 0
+            for chunk in self.dataset.iter_chunks([transform.column]):
+                self.evaluate(transform, chunk[transform.column], values[start:start + len(chunk)])
+                start += len(chunk)
+        else:
+            parts = [self.evaluate(transform, chunk[transform.column])
+                     for chunk in self.dataset.iter_chunks([transform.column])]
+            values = np.concatenate(parts) if parts else np.empty(0)
+        values.flags.writeable = False
+
+        self._uses = {use: count for use, count in self._uses.items() if use[2:] == self._generation()}
+        self._uses[key] = self._uses.get(key, 0) + 1
+        if self._uses[key] > 1 and self.cache is not None:
+            self.cache.put(key, values)
+        return values
+
+    def iter_chunks(self, columns=None):
+        """
+            Iterate over the dataset like DataSet.iter_chunks, with derived columns computed alongside
+            the source columns. In-memory datasets take them from `values`, so reused ones come from the cache.
+        """
+        names = [name for name in columns if name in self.expressions] if columns is not None else []
+        if not names:
+            yield from self.dataset.iter_chunks(columns)
+            return
+        source = list(dict.fromkeys([name for name in columns if name not in self.expressions] +
+                                    [self.expressions[name].column for name in names]))
+        whole = {} if self.dataset.is_streaming() else {name: self.values(name) for name in names}
+        start = 0
+        for chunk in self.dataset.iter_chunks(source):
+            derived = {}
+            for name in names:
+                if name in whole:
+                    derived[name] = whole[name][start:start + len(chunk)]
+                else:
+                    transform = self.expressions[name]
+                    derived[name] = self.evaluate(transform, chunk[transform.column])
+            start += len(chunk)
+            yield chunk.assign(**derived)[list(columns)]
+
+    def _fit(self, transform):
+        # Moments and range of the input of a transform over the whole dataset
+        inner = transform.source
+        key = (transform.key(),) + self._generation()
+        if key not in self._fits:
+            accumulator = MomentAccumulator()
+            for chunk in self.dataset.iter_chunks([transform.column]):
+                values = chunk[transform.column]
+                accumulator.update(self.evaluate(inner, values) if isinstance(inner, Transform) else values)
+            # Unset range and spread leave every value missing
+            if accumulator.count == 0:
+                accumulator.mean = np.nan
+            self._fits = {fit: value for fit, value in self._fits.items() if fit[1:] == self._generation()}
+            self._fits[key] = accumulator
+        return self._fits[key]
+
+    def _generation(self):
+        return self.dataset.uid, self.dataset.version
@@ -0,0 +1,237 @@
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+import ColumnarCache
+from DataSet import DataSet
+from DataAnalyzer import DataAnalyzer
+
+# Memory the interactive command-line interface lets its datasets use before spilling them
+DEFAULT_MEMORY_BUDGET = 2 * 1024 ** 3
+
+
+class WorkspaceEntry:
+    """
+        A named dataset of a workspace, with the analyzer and visualizer bound to it.
+        The analyzer keeps its statistics cache and tracked statistics while the dataset is spilled,
+        so switching back to a dataset does not recompute anything.
+    """
+
+    def __init__(self, name, dataset):
+        self.name = name
+        self.dataset = dataset
+        self.analyzer = DataAnalyzer(dataset)
+        self._visualizer = None
+        # Held while the dataset is being read or computed on; a dataset whose lock is held is not spilled
+        self.lock = threading.RLock()
+        # False once spilling failed, e.g. for object columns Arrow cannot store
+        self.spillable = True
+        self._memory = None
+
+    @property
+    def visualizer(self):
+        # Created on first use, so that statistics-only work does not import the plotting libraries
+        if self._visualizer is None:
+            from DataVisualization import Visualization
+            self._visualizer = Visualization(self.dataset, self.analyzer)
+        return self._visualizer
+
+    def memory_usage(self):
+        # Measuring object columns walks every value, so the result is kept until the data changes
+        state = (self.dataset.version, self.dataset.is_spilled())
+        if self._memory is None or self._memory[0] != state:
+            self._memory = (state, self.dataset.memory_usage())
+        return self._memory[1]
+
+    def describe(self):
+        columns = self.dataset.get_column_names()
+        if self.dataset.is_streaming():
+            # Counting the rows of a streamed dataset would read the whole source
+            return f"{self.name}: {len(columns)} columns (streaming)"
+        if not columns:
+            return f"{self.name}: empty"
+        state = "spilled" if self.dataset.is_spilled() else f"{self.memory_usage() / 1024 ** 2:.1f} MiB"
+        return f"{self.name}: {self.dataset.num_rows():,} rows, {len(columns)} columns ({state})"
+
+
+class Workspace:
+    """
+        Holds many named datasets at once under a memory budget.
+        When the datasets in memory exceed the budget, the least recently used ones are spilled to
+        columnar files in a spill directory and read back when they are next used (see DataSet.spill).
+    """
+
+    def __init__(self, memory_budget=None, spill_dir=None):
+        """
+            Args:
+                memory_budget (int, optional): Bytes the in-memory datasets may use; None for no limit.
+                spill_dir (str, optional): Directory for spilled datasets. Defaults to a temporary
+                    directory that is removed by `close`.
+        """
+        self.memory_budget = memory_budget
+        self.spill_dir = spill_dir
+        self.current = None
+        # Least recently used first
+        self.entries = OrderedDict()
+        self._lock = threading.RLock()
+        self._temporary_dir = None
+        self._warned = False
+
+    def add(self, name, dataset=None):
+        """
+            Add a dataset under a name, replacing any dataset of that name, and make it current.
+            Args:
+                name (str): The name of the dataset.
+                dataset (DataSet, optional): The dataset; a new empty one (to load into) when omitted.
+            Returns:
+                WorkspaceEntry: The entry holding the dataset, its analyzer and its visualizer.
+        """
+        with self._lock:
+            if name in self.entries:
+                self._delete_spill(self.entries.pop(name), restore=False)
+            entry = WorkspaceEntry(name, dataset if dataset is not None else DataSet())
+            self.entries[name] = entry
+            self.current = name
+        self.enforce_budget()
+        return entry
+
+    def get(self, name=None):
+        """
+            Return the entry of a dataset, reading it back into memory if it was spilled.
+            Args:
+                name (str, optional): The name of the dataset. Defaults to the current dataset.
+            Returns:
+                WorkspaceEntry or None: None when there is no such dataset.
+        """
+        with self._lock:
+            name = self.current if name is None else name
+            entry = self.entries.get(name)
+            if entry is None:
+                return None
+            self.entries.move_to_end(name)
+            entry.dataset.restore()
+        self.enforce_budget(keep=name)
+        return entry
+
+    def use(self, name):
+        """
+            Make a dataset the current one.
+            Returns:
+                WorkspaceEntry or None: None when there is no such dataset.
+        """
+        with self._lock:
+            if name not in self.entries:
+                return None
+            # Made current first, so that the previous current dataset may be spilled to make room
+            self.current = name
+        return self.get(name)
+
+    def remove(self, name):
+        with self._lock:
+            entry = self.entries.pop(name, None)
+            if entry is None:
+                return False
+            self._delete_spill(entry, restore=False)
+            if self.current == name:
+                self.current = next(reversed(self.entries), None)
+            return True
+
+    def names(self):
+        return list(self.entries)
+
+    def memory_usage(self):
+        with self._lock:
+            return sum(entry.memory_usage() for entry in self.entries.values())
+
+    def enforce_budget(self, keep=None):
+        """
+            Spill the least recently used datasets until the in-memory ones fit the memory budget.
+            The current dataset and `keep` stay in memory even when they alone exceed the budget.
+            Args:
+                keep (str, optional): The name of a dataset that must not be spilled.
+            Returns:
+                list of str: The names of the spilled datasets.
+        """
+        if self.memory_budget is None:
+            return []
+        spilled = []
+        with self._lock:
+            usage = self.memory_usage()
+            for name, entry in list(self.entries.items()):
+                if usage <= self.memory_budget:
+                    break
+                if name in (keep, self.current) or not entry.spillable:
+                    continue
+                size = entry.memory_usage()
+                if size and self.spill(name):
+                    usage -= size
+                    spilled.append(name)
+        return spilled
+
+    def spill(self, name):
+        """
+            Move a dataset out of memory into the spill directory.
+            Returns:
+                bool: Whether it was spilled; streaming, empty and already spilled datasets are not,
+                and neither are datasets another thread holds the lock of.
+        """
+        with self._lock:
+            entry = self.entries[name]
+            if not ColumnarCache.is_available():
+                if not self._warned:
+                    print("Warning: pyarrow is not installed, datasets stay in memory over the budget")
+                    self._warned = True
+                return False
+            if not entry.lock.acquire(blocking=False):
+                # In use on another thread; it stays in memory until the next budget check
+                return False
+            try:
+                return entry.dataset.spill(self._spill_path(entry))
+            except Exception as e:
+                print(f"Warning: Could not spill dataset '{name}': {str(e)}")
+                entry.spillable = False
+                return False
+            finally:
+                entry.lock.release()
+
+    def describe(self):
+        lines = [("* " if name == self.current else "  ") + entry.describe() for name, entry in self.entries.items()]
+        if self.memory_budget is not None:
+            lines.append(f"Memory: {self.memory_usage() / 1024 ** 2:.1f} of {self.memory_budget / 1024 ** 2:.1f} MiB")
+        return "\n".join(lines)
+
+    def close(self):
+        """
+            Delete the spill files. Spilled datasets are read back into memory first, so entries
+            still in use keep working.
+        """
+        with self._lock:
+            for entry in self.entries.values():
+                self._delete_spill(entry)
+            if self._temporary_dir is not None:
+                shutil.rmtree(self._temporary_dir, ignore_errors=True)
+                self._temporary_dir = None
+
+    def _spill_path(self, entry):
+        directory = self.spill_dir
+        if directory is None:
+            if self._temporary_dir is None:
+                self._temporary_dir = tempfile.mkdtemp(prefix="workspace-")
+            directory = self._temporary_dir
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, f"{entry.dataset.uid}.feather")
+
+    def _delete_spill(self, entry, restore=True):
+        # Datasets dropped from the workspace are emptied instead of being read back
+        if entry.dataset.is_spilled():
+            if restore:
+                entry.dataset.restore()
+            else:
+                entry.dataset.data = None
+        if entry.dataset._spilled_copy is not None:
+            path = entry.dataset._spilled_copy[0]
+            entry.dataset._spilled_copy = None
+            if os.path.exists(path):
+                os.remove(path)
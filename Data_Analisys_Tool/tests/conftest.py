@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The modules of the tool are imported by their bare names, as the tool itself does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
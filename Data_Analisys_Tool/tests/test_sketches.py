@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from DataAnalyzer import DataAnalyzer
+from DataSet import DataSet
+from Sketches import FrequentItemsSketch, QuantileSketch
+
+QUANTILES = np.linspace(0.01, 0.99, 99)
+
+
+def rank_errors(values, sketch):
+    # Normalized rank of each estimated quantile in the exact data, minus the quantile asked for
+    ordered = np.sort(values)
+    estimates = sketch.quantile(QUANTILES)
+    low = np.searchsorted(ordered, estimates, side="left") / ordered.size
+    high = np.searchsorted(ordered, estimates, side="right") / ordered.size
+    # A value repeated in the data covers a range of ranks; the error is the distance to that range
+    return np.maximum(np.maximum(low - QUANTILES, QUANTILES - high), 0.0)
+
+
+@pytest.mark.parametrize("epsilon", [0.05, 0.01])
+@pytest.mark.parametrize("distribution", ["normal", "lognormal", "integers"])
+def test_quantile_sketch_rank_error(epsilon, distribution):
+    rng = np.random.default_rng(42)
+    values = {"normal": lambda: rng.normal(size=200_000),
+              "lognormal": lambda: rng.lognormal(sigma=2.0, size=200_000),
+              "integers": lambda: rng.integers(0, 50, size=200_000).astype(float)}[distribution]()
+    sketch = QuantileSketch(epsilon, seed=0).update(values)
+
+    assert sketch.count == values.size
+    assert sketch.size() < values.size / 10
+    assert rank_errors(values, sketch).max() <= epsilon
+    assert sketch.quantile(0.0) == values.min()
+    assert sketch.quantile(1.0) == values.max()
+
+
+def test_merged_quantile_sketches_keep_rank_error():
+    rng = np.random.default_rng(7)
+    values = rng.gamma(2.0, size=300_000)
+    epsilon = 0.01
+    merged = QuantileSketch(epsilon, seed=0)
+    for chunk in np.array_split(values, 37):
+        merged.merge(QuantileSketch(epsilon, seed=0).update(chunk))
+
+    assert merged.count == values.size
+    assert rank_errors(values, merged).max() <= epsilon
+
+
+def test_quantile_sketch_skips_missing_values():
+    values = np.array([1.0, np.nan, 2.0, 3.0, np.nan])
+    sketch = QuantileSketch(0.01, seed=0).update(values)
+    assert sketch.count == 3
+    assert sketch.quantile(0.5) == pytest.approx(np.nanmedian(values))
+
+
+def zipf_values(rng, size):
+    return pd.Series(rng.zipf(1.5, size=size) % 5000)
+
+
+@pytest.mark.parametrize("epsilon", [0.01, 0.001])
+def test_frequent_items_sketch_count_bounds(epsilon):
+    rng = np.random.default_rng(3)
+    values = zipf_values(rng, 200_000)
+    exact = values.value_counts()
+    sketch = FrequentItemsSketch(epsilon)
+    for chunk in np.array_split(values.to_numpy(), 23):
+        sketch.merge(FrequentItemsSketch(epsilon).update(chunk))
+
+    assert sketch.count == values.size
+    assert len(sketch.counters) <= sketch.capacity
+    bound = sketch.error_bound()
+    assert bound <= epsilon * values.size
+    for item, count in sketch.counters.items():
+        # Counts are never overestimated and are low by at most the bound
+        assert count <= exact[item]
+        assert exact[item] - count <= bound
+    # Every item more frequent than the bound is kept
+    heavy = exact[exact > bound]
+    assert set(heavy.index) <= set(sketch.counters)
+
+
+def test_frequent_items_sketch_mode_matches_pandas():
+    rng = np.random.default_rng(11)
+    values = zipf_values(rng, 100_000)
+    sketch = FrequentItemsSketch(0.001).update(values)
+    assert sketch.mode() == values.mode()[0]
+    assert [item for item, _ in sketch.most_frequent(3)] == values.value_counts().index[:3].tolist()
+
+
+def test_streaming_statistics_are_within_the_sketch_bounds(tmp_path):
+    rng = np.random.default_rng(5)
+    frame = pd.DataFrame({"x": rng.normal(size=50_000), "k": rng.integers(0, 20, size=50_000)})
+    path = tmp_path / "values.csv"
+    frame.to_csv(path, index=False)
+    dataset = DataSet()
+    dataset.load_data_from_csv(str(path), chunksize=4_000)
+    analyzer = DataAnalyzer(dataset)
+
+    epsilon = 0.01
+    ordered = np.sort(frame["x"].to_numpy())
+    for q, estimate in zip([0.25, 0.5, 0.75], analyzer.calculate_quartiles("x", epsilon=epsilon)):
+        assert abs(np.searchsorted(ordered, estimate) / ordered.size - q) <= epsilon
+    assert analyzer.calculate_mode("k") == frame["k"].mode()[0]
@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import gmean
+
+from DataAnalyzer import DataAnalyzer
+from DataSet import DataSet
+
+
+def analyzer_for(frame, chunksize=None, tmp_path=None):
+    dataset = DataSet()
+    if chunksize:
+        path = tmp_path / "data.csv"
+        frame.to_csv(path, index=False)
+        dataset.load_data_from_csv(str(path), chunksize=chunksize)
+    else:
+        dataset.data = frame
+    return DataAnalyzer(dataset)
+
+
+@pytest.mark.parametrize("chunksize", [None, 2])
+@pytest.mark.parametrize("values", [[1.0, 4.0, 2.0, 8.0], [1.0, 4.0, -1.0, 2.0], [1.0, 0.0, 3.0],
+                                    [2.0, np.nan, 8.0]])
+def test_geometric_mean_matches_scipy_and_summarize(values, chunksize, tmp_path):
+    analyzer = analyzer_for(pd.DataFrame({"x": values}), chunksize, tmp_path)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        expected = gmean(np.array(values)[~np.isnan(values)])
+    result = analyzer.calculate_geometric_mean("x")
+    summarized = analyzer.summarize(["x"], stats=["geometric_mean"]).loc["x", "geometric_mean"]
+    np.testing.assert_allclose([result, summarized], [expected, expected], equal_nan=True)